@@ -1,16 +1,26 @@
+import time
 import streamlit as st
 import sys
 import os
 
+SCRIPT_START = time.perf_counter()
+
 # Agregar el directorio actual al path de Python
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from pages import data_upload, dashboard, models, visualizations, documentation
+# Las páginas (y sus dependencias pesadas) se importan al abrirlas por primera vez
+from pages.startup import PAGE_MODULES, PRELOAD_PAGES, load_page, start_warm_up, record_script_time, show_startup_report
+from pages.datasets import show_dataset_status
+from pages.memory_governor import show_memory_admin
+from pages.instrumentation import start_rerun, timed, show_debug_panel, start_metrics_exporter, SHOW_DEBUG_PANEL
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Las operaciones medidas a partir de aquí se muestran en el panel de depuración
+start_rerun()
+
 # Configuración de la página
 st.set_page_config(
     page_title="Análisis Predictivo",
@@ -78,9 +88,12 @@ with st.sidebar:
     # Navegación
     page = st.radio(
         "Navegación",
-        ["Inicio", "Cargar Datos", "Dashboard", "Modelos", "Visualizaciones", "Documentación"]
+        ["Inicio"] + list(PAGE_MODULES)
     )
     
+    show_dataset_status()
+    show_memory_admin()
+    
     st.markdown("---")
     st.markdown("### Desarrollado por:")
     st.markdown("""
@@ -101,6 +114,8 @@ if page == "Inicio":
     Para comenzar, selecciona una opción en el menú lateral.
     """)
     
+    show_startup_report()
+    
     # Footer
     st.markdown("""
     <div class="footer">
@@ -108,13 +123,18 @@ if page == "Inicio":
     </div>
     """, unsafe_allow_html=True)
     
-elif page == "Cargar Datos":
-    data_upload.show()
-elif page == "Dashboard":
-    dashboard.show()
-elif page == "Modelos":
-    models.show()
-elif page == "Visualizaciones":
-    visualizations.show()
-elif page == "Documentación":
-    documentation.show()
+else:
+    page_module = load_page(page)
+    with timed('app_page_render_seconds', "Página", page, page=page):
+        page_module.show()
+
+record_script_time(page, time.perf_counter() - SCRIPT_START)
+
+# Métricas de Prometheus (endpoint y/o archivo) y panel con las operaciones más lentas
+start_metrics_exporter()
+if SHOW_DEBUG_PANEL:
+    show_debug_panel()
+
+# Precarga del resto de páginas en segundo plano, después de mostrar la página actual
+if PRELOAD_PAGES:
+    start_warm_up()
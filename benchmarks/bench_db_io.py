@@ -0,0 +1,285 @@
+"""Benchmark de lectura y escritura de tablas en PostgreSQL.
+
+Mide el rendimiento de upload_to_db, load_from_db y get_available_tables sobre una
+base de datos desechable, para una malla de filas, columnas, mezcla de tipos y
+proporción de nulos. Compara el camino actual de escritura (INSERT con los valores en
+el texto de la consulta) con COPY y execute_values, y el de lectura (pd.read_sql) con
+la lectura ordenada por columnas, por bloques con cursor de servidor y COPY TO STDOUT.
+
+Uso:
+    python benchmarks/bench_db_io.py --output io.json
+    python benchmarks/bench_db_io.py --baseline io_base.json --output io.json --tolerance 0.25
+    python benchmarks/bench_db_io.py --database-url postgresql://postgres@localhost/postgres --rows 1000 100000
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from disposable_postgres import disposable_postgres, describe_url
+
+DTYPE_MIXES = {
+    # Tipos de columna que se repiten en orden hasta completar el número de columnas
+    'numerico': ['float', 'int'],
+    'mixto': ['int', 'float', 'text', 'datetime'],
+    'texto': ['text']
+}
+WRITE_METHODS = ['insert', 'copy', 'execute_values']
+READ_METHODS = ['read_sql', 'load_columns', 'chunks', 'copy_to']
+COMPARED_METRICS = ['seconds']
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_SECONDS = 0.02
+TABLE_NAME = 'bench_io'
+
+def make_frame(n_rows, n_columns, dtype_mix, null_ratio, seed=42):
+    """DataFrame sintético; los nulos se reparten en las columnas que no son enteras"""
+    rng = np.random.default_rng(seed)
+    kinds = DTYPE_MIXES[dtype_mix]
+    data = {}
+    for i in range(n_columns):
+        kind = kinds[i % len(kinds)]
+        name = f"{kind}_{i}"
+        if kind == 'int':
+            data[name] = rng.integers(0, 1_000_000, n_rows)
+            continue
+        if kind == 'float':
+            values = pd.Series(rng.normal(size=n_rows))
+        elif kind == 'text':
+            values = pd.Series(rng.integers(0, 5000, n_rows)).map(lambda v: f"valor_{v}").astype(object)
+        else:
+            values = pd.Series(pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 86400 * 365, n_rows), unit='s'))
+        if null_ratio > 0:
+            values[rng.random(n_rows) < null_ratio] = None
+        data[name] = values
+    return pd.DataFrame(data)
+
+def _create_table(conn, df, table_name):
+    from pages.utils import get_postgres_type
+
+    columns = ', '.join(f'"{col}" {get_postgres_type(df[col].dtype)}' for col in df.columns)
+    cursor = conn.cursor()
+    cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+    cursor.execute(f'CREATE TABLE "{table_name}" ({columns})')
+
+def write_insert(database_url, df, table_name):
+    """Camino actual de la aplicación"""
+    from pages.utils import upload_to_db
+
+    upload_to_db(df.copy(), table_name)
+
+def write_copy(database_url, df, table_name):
+    from pages.utils import copy_dataframe_to_table
+
+    conn = psycopg2.connect(database_url)
+    try:
+        _create_table(conn, df, table_name)
+        copy_dataframe_to_table(conn, df, table_name)
+        conn.commit()
+    finally:
+        conn.close()
+
+def write_execute_values(database_url, df, table_name):
+    conn = psycopg2.connect(database_url)
+    try:
+        _create_table(conn, df, table_name)
+        column_list = ', '.join(f'"{col}"' for col in df.columns)
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        execute_values(
+            conn.cursor(), f'INSERT INTO "{table_name}" ({column_list}) VALUES %s', rows, page_size=1000
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def read_sql(database_url, table_name, columns):
+    """Camino actual de la aplicación"""
+    from pages.utils import load_from_db
+
+    return load_from_db(table_name)
+
+def read_load_columns(database_url, table_name, columns):
+    from pages.utils import load_columns
+
+    return load_columns(table_name, columns)
+
+def read_chunks(database_url, table_name, columns):
+    from pages.utils import iter_table_chunks
+
+    return pd.concat(list(iter_table_chunks(table_name)), ignore_index=True)
+
+def read_copy_to(database_url, table_name, columns):
+    conn = psycopg2.connect(database_url)
+    try:
+        buffer = io.StringIO()
+        conn.cursor().copy_expert(f'COPY "{table_name}" TO STDOUT WITH (FORMAT csv, HEADER)', buffer)
+        buffer.seek(0)
+        return pd.read_csv(buffer)
+    finally:
+        conn.close()
+
+WRITERS = {'insert': write_insert, 'copy': write_copy, 'execute_values': write_execute_values}
+READERS = {'read_sql': read_sql, 'load_columns': read_load_columns, 'chunks': read_chunks, 'copy_to': read_copy_to}
+
+def count_rows(database_url, table_name):
+    conn = psycopg2.connect(database_url)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"')
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+def _summary(record, times, n_rows, nbytes):
+    seconds = float(np.median(times))
+    record.update({
+        'seconds': seconds,
+        'min_seconds': float(np.min(times)),
+        'rows_per_second': n_rows / seconds if seconds > 0 else None,
+        'mb_per_second': nbytes / 1024 / 1024 / seconds if seconds > 0 else None
+    })
+    return record
+
+def run_case(database_url, n_rows, n_columns, dtype_mix, null_ratio, repeats, write_methods, read_methods):
+    """Mide cada método de escritura y de lectura sobre el mismo DataFrame"""
+    df = make_frame(n_rows, n_columns, dtype_mix, null_ratio)
+    nbytes = int(df.memory_usage(deep=True).sum())
+    case = {'rows': n_rows, 'columns': n_columns, 'dtype_mix': dtype_mix, 'null_ratio': null_ratio, 'repeats': repeats}
+    records = []
+    for method in write_methods:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            WRITERS[method](database_url, df, TABLE_NAME)
+            times.append(time.perf_counter() - start)
+        written = count_rows(database_url, TABLE_NAME)
+        if written != n_rows:
+            raise RuntimeError(f"{method}: se escribieron {written} filas de {n_rows}")
+        records.append(_summary(dict(case, operation='write', method=method), times, n_rows, nbytes))
+
+    # Las lecturas usan la tabla escrita por el camino actual de la aplicación
+    write_insert(database_url, df, TABLE_NAME)
+    for method in read_methods:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = READERS[method](database_url, TABLE_NAME, list(df.columns))
+            times.append(time.perf_counter() - start)
+        if result is None or len(result) != n_rows:
+            raise RuntimeError(f"{method}: se leyeron {0 if result is None else len(result)} filas de {n_rows}")
+        records.append(_summary(dict(case, operation='read', method=method), times, n_rows, nbytes))
+    return records
+
+def run_catalog_case(database_url, n_tables, repeats):
+    """Latencia de get_available_tables con `n_tables` tablas en el esquema public"""
+    from pages.utils import get_available_tables
+
+    conn = psycopg2.connect(database_url)
+    try:
+        cursor = conn.cursor()
+        for i in range(n_tables):
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS "bench_catalogo_{i}" (id INTEGER)')
+        conn.commit()
+    finally:
+        conn.close()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        tables = get_available_tables()
+        times.append(time.perf_counter() - start)
+    record = {'operation': 'catalog', 'method': 'get_available_tables', 'tables': n_tables, 'listed': len(tables), 'repeats': repeats}
+    return _summary(record, times, len(tables), 0)
+
+def case_id(record):
+    """Identificador de un caso para compararlo con la línea base"""
+    return tuple(record.get(field) for field in (
+        'operation', 'method', 'rows', 'columns', 'dtype_mix', 'null_ratio', 'tables'
+    ))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de lectura y escritura en PostgreSQL")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--columns', type=int, nargs='+', default=[5, 20])
+    parser.add_argument('--dtype-mix', nargs='+', default=list(DTYPE_MIXES), choices=list(DTYPE_MIXES))
+    parser.add_argument('--null-ratio', type=float, nargs='+', default=[0.0, 0.2])
+    parser.add_argument('--write-methods', nargs='+', default=WRITE_METHODS, choices=WRITE_METHODS)
+    parser.add_argument('--read-methods', nargs='+', default=READ_METHODS, choices=READ_METHODS)
+    parser.add_argument('--catalog-tables', type=int, nargs='+', default=[10, 200],
+                        help="Número de tablas con las que medir get_available_tables")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--database-url', default=None,
+                        help="Servidor donde crear la base de datos desechable (por defecto, un clúster temporal)")
+    parser.add_argument('--output', default=None, help="Archivo JSON de resultados")
+    parser.add_argument('--baseline', default=None, help="Resultados de referencia a comparar")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Empeoramiento relativo máximo permitido")
+    parser.add_argument('--min-seconds', type=float, default=DEFAULT_MIN_SECONDS,
+                        help="Diferencia absoluta mínima para considerar una regresión")
+    args = parser.parse_args()
+
+    from bench_models import get_environment, compare_with_baseline
+
+    # pd.read_sql avisa en cada lectura de que la conexión de psycopg2 no es de SQLAlchemy
+    warnings.filterwarnings('ignore', message='pandas only supports SQLAlchemy')
+
+    results = []
+    with disposable_postgres(args.database_url) as database_url:
+        # Las funciones de pages.utils se conectan con DATABASE_URL
+        os.environ['DATABASE_URL'] = database_url
+        # Calentamiento sin medir: importaciones, primera conexión y caché del catálogo del servidor
+        run_case(database_url, 100, 2, 'mixto', 0.0, 1, args.write_methods, args.read_methods)
+        for n_rows in args.rows:
+            for n_columns in args.columns:
+                for dtype_mix in args.dtype_mix:
+                    for null_ratio in args.null_ratio:
+                        records = run_case(
+                            database_url, n_rows, n_columns, dtype_mix, null_ratio, args.repeats,
+                            args.write_methods, args.read_methods
+                        )
+                        results.extend(records)
+                        for record in records:
+                            print(
+                                f"{record['operation']:6} {record['method']:15} filas={n_rows:<7} columnas={n_columns:<3} "
+                                f"tipos={dtype_mix:9} nulos={null_ratio:<4} {record['seconds']:.3f}s "
+                                f"{record['rows_per_second']:,.0f} filas/s {record['mb_per_second']:.1f} MB/s",
+                                flush=True
+                            )
+        for n_tables in sorted(args.catalog_tables):
+            record = run_catalog_case(database_url, n_tables, args.repeats)
+            results.append(record)
+            print(f"catalog get_available_tables tablas={record['listed']:<5} {record['seconds'] * 1000:.1f} ms", flush=True)
+
+    environment = get_environment()
+    environment['database'] = describe_url(database_url)
+    output = {'environment': environment, 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(output, indent=2, ensure_ascii=False))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(
+            results, baseline, args.tolerance, args.min_seconds, key=case_id, metrics=COMPARED_METRICS
+        )
+        for regression in regressions:
+            print(
+                f"REGRESIÓN {regression['case']} {regression['metric']}: "
+                f"{regression['baseline']:.3f}s -> {regression['current']:.3f}s",
+                file=sys.stderr
+            )
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
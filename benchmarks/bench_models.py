@@ -0,0 +1,200 @@
+"""Benchmark reproducible del entrenamiento de los modelos de la página 'Modelos'.
+
+Genera conjuntos sintéticos de clasificación y regresión sobre una malla de filas,
+variables y proporción de variables categóricas, y ejecuta el mismo camino que
+models.show (preprocesamiento, selección de variante y train_and_evaluate).
+
+Uso:
+    python benchmarks/bench_models.py --output resultados.json
+    python benchmarks/bench_models.py --baseline benchmarks/baseline.json --output resultados.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import numpy as np
+import pandas as pd
+from sklearn.datasets import make_classification, make_regression
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pages.models import (
+    get_scalable_model, train_and_evaluate, train_test_split, TEST_SIZE, RANDOM_STATE
+)
+from pages.preprocessing import build_feature_matrices
+
+MODELS = {
+    "Clasificación": ["Árbol de Decisión", "Random Forest", "XGBoost", "Regresión Logística", "SVM", "KNN"],
+    "Regresión": ["Árbol de Decisión", "Random Forest", "XGBoost", "Regresión Lineal", "SVM", "KNN"]
+}
+# Métricas comparadas contra la línea base y tolerancia relativa por defecto
+COMPARED_METRICS = ['fit_time', 'predict_time']
+DEFAULT_TOLERANCE = 0.25
+# Diferencias absolutas menores a este valor se consideran ruido
+DEFAULT_MIN_SECONDS = 0.05
+
+def make_dataset(task, n_rows, n_features, categorical_fraction, seed=RANDOM_STATE):
+    """Genera un conjunto sintético con una mezcla de variables numéricas y categóricas"""
+    if task == "Clasificación":
+        X, y = make_classification(
+            n_samples=n_rows, n_features=n_features, n_informative=max(2, n_features // 2),
+            random_state=seed
+        )
+    else:
+        X, y = make_regression(
+            n_samples=n_rows, n_features=n_features, n_informative=max(2, n_features // 2),
+            noise=10.0, random_state=seed
+        )
+    df = pd.DataFrame(X, columns=[f"x{i}" for i in range(n_features)])
+
+    # Convertir parte de las variables en categóricas: la mitad de baja y la mitad de alta cardinalidad
+    n_categorical = int(round(n_features * categorical_fraction))
+    for i in range(n_categorical):
+        n_categories = 5 if i % 2 == 0 else 200
+        col = f"x{i}"
+        codes = pd.qcut(df[col], q=n_categories, labels=False, duplicates='drop')
+        df[col] = 'c' + codes.astype(str)
+    return df, pd.Series(y, name='objetivo')
+
+def run_case(task, model_name, n_rows, n_features, categorical_fraction, repeats):
+    """Ejecuta un caso del benchmark y retorna sus tiempos (mediana de las repeticiones)"""
+    df, y = make_dataset(task, n_rows, n_features, categorical_fraction)
+    X_train, X_test, y_train, y_test = train_test_split(
+        df, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+    )
+
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        matrices = build_feature_matrices(X_train, X_test)
+        preprocess_time = time.perf_counter() - start
+        model, variant = get_scalable_model(
+            model_name, task, matrices['X_train'].shape[0], matrices['X_train'].shape[1],
+            sparse=hasattr(matrices['X_train'], 'tocsr')
+        )
+        result, timings = train_and_evaluate(
+            model, task, matrices['X_train'], matrices['X_test'], y_train, y_test
+        )
+        timings['preprocess_time'] = preprocess_time
+        timings['score'] = float(result['score'])
+        runs.append(timings)
+
+    summary = {
+        'task': task,
+        'model': model_name,
+        'variant': variant,
+        'rows': n_rows,
+        'features': n_features,
+        'categorical_fraction': categorical_fraction,
+        'repeats': repeats
+    }
+    for metric in runs[0]:
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        summary[metric] = float(np.median(values)) if values else None
+    return summary
+
+def case_id(record):
+    """Identificador de un caso para compararlo con la línea base"""
+    return (record['task'], record['model'], record['rows'], record['features'], record['categorical_fraction'])
+
+def compare_with_baseline(results, baseline, tolerance, min_seconds, key=case_id, metrics=COMPARED_METRICS):
+    """Retorna los casos cuyo tiempo empeora más que la tolerancia respecto a la línea base"""
+    baseline_cases = {key(record): record for record in baseline['results']}
+    regressions = []
+    for record in results:
+        reference = baseline_cases.get(key(record))
+        if reference is None:
+            continue
+        for metric in metrics:
+            new, old = record.get(metric), reference.get(metric)
+            if new is None or old is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > min_seconds:
+                regressions.append({
+                    'case': key(record),
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                    'ratio': new / old if old > 0 else None
+                })
+    return regressions
+
+def get_environment():
+    """Describe el entorno de ejecución para poder comparar resultados entre commits"""
+    import sklearn
+    import xgboost
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__,
+        'commit': commit
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de entrenamiento de modelos")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--features', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--categorical-fraction', type=float, nargs='+', default=[0.0, 0.3])
+    parser.add_argument('--tasks', nargs='+', default=list(MODELS.keys()), choices=list(MODELS.keys()))
+    parser.add_argument('--models', nargs='+', default=None, help="Subconjunto de modelos a medir")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default=None, help="Archivo JSON de resultados")
+    parser.add_argument('--baseline', default=None, help="Resultados de referencia a comparar")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Empeoramiento relativo máximo permitido")
+    parser.add_argument('--min-seconds', type=float, default=DEFAULT_MIN_SECONDS,
+                        help="Diferencia absoluta mínima para considerar una regresión")
+    args = parser.parse_args()
+
+    results = []
+    for task in args.tasks:
+        for model_name in MODELS[task]:
+            if args.models and model_name not in args.models:
+                continue
+            for n_rows in args.rows:
+                for n_features in args.features:
+                    for categorical_fraction in args.categorical_fraction:
+                        record = run_case(task, model_name, n_rows, n_features, categorical_fraction, args.repeats)
+                        results.append(record)
+                        print(
+                            f"{task:14} {model_name:20} filas={n_rows:<7} variables={n_features:<4} "
+                            f"cat={categorical_fraction:<4} fit={record['fit_time']:.3f}s "
+                            f"predict={record['predict_time']:.3f}s score={record['score']:.4f}",
+                            flush=True
+                        )
+
+    output = {'environment': get_environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(output, indent=2, ensure_ascii=False))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance, args.min_seconds)
+        for regression in regressions:
+            print(
+                f"REGRESIÓN {regression['case']} {regression['metric']}: "
+                f"{regression['baseline']:.3f}s -> {regression['current']:.3f}s",
+                file=sys.stderr
+            )
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Base de datos PostgreSQL desechable para los benchmarks.
+
+Con la URL de un servidor (--database-url o BENCH_DATABASE_URL) se crea en él una base de
+datos temporal que se elimina al terminar. Sin ella se inicia un clúster temporal con
+initdb y pg_ctl (deben estar en el PATH), que se detiene y se borra al terminar.
+"""
+import os
+import uuid
+import shutil
+import socket
+import tempfile
+import subprocess
+from contextlib import contextmanager
+import psycopg2
+from psycopg2.extensions import make_dsn, parse_dsn
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def _temporary_database(server_url):
+    """Crea una base de datos vacía en un servidor existente y la elimina al salir"""
+    name = f"bench_{uuid.uuid4().hex[:12]}"
+    conn = psycopg2.connect(server_url)
+    conn.autocommit = True
+    try:
+        conn.cursor().execute(f'CREATE DATABASE "{name}"')
+        try:
+            yield make_dsn(server_url, dbname=name)
+        finally:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = %s AND pid <> pg_backend_pid()",
+                (name,)
+            )
+            cursor.execute(f'DROP DATABASE IF EXISTS "{name}"')
+    finally:
+        conn.close()
+
+@contextmanager
+def _temporary_cluster():
+    """Inicia un clúster local en un directorio temporal (solo escucha en 127.0.0.1)"""
+    if shutil.which('initdb') is None or shutil.which('pg_ctl') is None:
+        raise RuntimeError(
+            "No se encontraron initdb y pg_ctl en el PATH: instala PostgreSQL o indica un servidor "
+            "con --database-url / BENCH_DATABASE_URL"
+        )
+    data_dir = tempfile.mkdtemp(prefix='bench_pg_')
+    port = _free_port()
+    try:
+        subprocess.run(
+            ['initdb', '-D', data_dir, '-U', 'postgres', '-A', 'trust', '-E', 'UTF8', '--no-sync'],
+            check=True, capture_output=True
+        )
+        subprocess.run(
+            ['pg_ctl', '-D', data_dir, '-w', '-l', os.path.join(data_dir, 'postgres.log'),
+             '-o', f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1", 'start'],
+            check=True, capture_output=True
+        )
+        try:
+            yield f"postgresql://postgres@127.0.0.1:{port}/postgres"
+        finally:
+            subprocess.run(['pg_ctl', '-D', data_dir, '-m', 'fast', '-w', 'stop'], capture_output=True)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+@contextmanager
+def disposable_postgres(server_url=None):
+    """Retorna la URL de una base de datos vacía que se elimina al salir del bloque"""
+    server_url = server_url or os.getenv('BENCH_DATABASE_URL')
+    if server_url:
+        with _temporary_database(server_url) as url:
+            yield url
+    else:
+        with _temporary_cluster() as url:
+            yield url
+
+def describe_url(url):
+    """URL sin contraseña, para incluirla en los resultados"""
+    params = parse_dsn(url)
+    params.pop('password', None)
+    return ' '.join(f"{key}={value}" for key, value in sorted(params.items()))
@@ -0,0 +1,281 @@
+"""Prueba de carga con sesiones concurrentes de la aplicación.
+
+Cada sesión es un AppTest de Streamlit que ejecuta app.py dentro de este proceso, igual
+que las sesiones de un servidor real (comparten cachés, gestor de trabajos y gobernador
+de memoria). Cada sesión sube su propia tabla y recorre Cargar Datos, Dashboard, Modelos
+(con entrenamiento) y Visualizaciones sobre una base de datos PostgreSQL desechable. Se
+mide la latencia de cada página, las conexiones abiertas en la base de datos y el
+crecimiento de la memoria del proceso.
+
+Uso:
+    python benchmarks/load_test.py --sessions 1 4 8 --output carga.json
+    python benchmarks/load_test.py --database-url postgresql://postgres@localhost/postgres --sessions 16
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT_DIR, 'app.py')
+sys.path.append(ROOT_DIR)
+
+from disposable_postgres import disposable_postgres, describe_url
+
+DEFAULT_TIMEOUT = 600
+MONITOR_INTERVAL = 0.25
+PERCENTILES = (50, 90, 99)
+
+def get_rss_bytes():
+    """Memoria residente actual del proceso (Linux); None si no está disponible"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+class Monitor:
+    """Muestrea en segundo plano las conexiones a la base de datos y la memoria del proceso"""
+
+    def __init__(self, database_url, interval=MONITOR_INTERVAL):
+        self.database_url = database_url
+        self.interval = interval
+        self.connections = []
+        self.rss = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="monitor", daemon=True)
+
+    def _run(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.database_url)
+        conn.autocommit = True
+        try:
+            cursor = conn.cursor()
+            while not self._stop.is_set():
+                cursor.execute(
+                    "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid()"
+                )
+                self.connections.append(cursor.fetchone()[0])
+                rss = get_rss_bytes()
+                if rss is not None:
+                    self.rss.append(rss)
+                self._stop.wait(self.interval)
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def _find(elements, label):
+    return next(element for element in elements if element.label == label)
+
+def _errors(at):
+    return [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+
+class Session:
+    """Un analista simulado: una sesión de la aplicación que recorre las páginas"""
+
+    def __init__(self, index, table_name, df, timeout, train):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.table_name = table_name
+        self.df = df
+        self.train = train
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.latencies = []
+        self.errors = []
+
+    def _run(self, page, action=None):
+        """Ejecuta el script (tras aplicar `action` a los widgets) y registra su latencia"""
+        if action is not None:
+            action()
+        start = time.perf_counter()
+        self.at.run()
+        self.latencies.append((page, time.perf_counter() - start))
+        self.errors.extend(f"{page}: {error}" for error in _errors(self.at))
+
+    def _navigate(self, page):
+        self._run(page, lambda: self.at.sidebar.radio[0].set_value(page))
+
+    def upload(self):
+        from pages.utils import upload_to_db
+
+        start = time.perf_counter()
+        upload_to_db(self.df.copy(), self.table_name)
+        self.latencies.append(("Cargar Datos (subida)", time.perf_counter() - start))
+        self._navigate("Cargar Datos")
+        self._run("Cargar Datos", lambda: _find(self.at.selectbox, "Selecciona una tabla").set_value(self.table_name))
+        self._run("Cargar Datos", lambda: self.at.button(key="load_from_db").click())
+
+    def train_models(self):
+        from pages.jobs import get_job_manager, FINISHED_STATES
+
+        self._run("Modelos", lambda: _find(self.at.selectbox, "Selecciona la variable objetivo").set_value('objetivo'))
+        features = [col for col in self.df.columns if col != 'objetivo']
+        self._run("Modelos", lambda: _find(self.at.multiselect, "Selecciona las variables predictoras").set_value(features))
+        if not self.train:
+            return
+        start = time.perf_counter()
+        self._run("Modelos", lambda: _find(self.at.button, "Entrenar Modelos").click())
+        job_id = self.at.session_state['training_job_id'] if 'training_job_id' in self.at.session_state else None
+        manager = get_job_manager()
+        while job_id is not None and manager.get(job_id) is not None and manager.get(job_id).status not in FINISHED_STATES:
+            time.sleep(0.2)
+        # Ejecución que muestra los resultados del entrenamiento
+        self._run("Modelos")
+        self.latencies.append(("Modelos (entrenamiento completo)", time.perf_counter() - start))
+
+    def walk(self, iterations):
+        self._run("Inicio")
+        for _ in range(iterations):
+            self.upload()
+            self._navigate("Dashboard")
+            self._navigate("Modelos")
+            self.train_models()
+            self._navigate("Visualizaciones")
+
+def summarize_latencies(latencies):
+    """Percentiles de latencia por página"""
+    summary = {}
+    for page in dict.fromkeys(page for page, _ in latencies):
+        values = np.array([seconds for name, seconds in latencies if name == page])
+        summary[page] = dict(
+            {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES},
+            count=int(len(values)), mean=float(values.mean()), max=float(values.max())
+        )
+    return summary
+
+def run_level(n_sessions, database_url, df, iterations, timeout, train):
+    """Ejecuta `n_sessions` sesiones concurrentes y retorna sus métricas"""
+    from pages.instrumentation import get_observation_count
+    from pages.memory_governor import get_memory_governor
+
+    sessions = [
+        Session(i, f"carga_{n_sessions}_{i}", df, timeout, train) for i in range(n_sessions)
+    ]
+    failures = []
+
+    def worker(session):
+        try:
+            session.walk(iterations)
+        except Exception as e:
+            failures.append(f"sesión {session.index}: {type(e).__name__}: {e}")
+
+    connections_before = get_observation_count('app_db_call_seconds', function='get_db_connection')
+    rss_start = get_rss_bytes()
+    start = time.perf_counter()
+    with Monitor(database_url) as monitor:
+        threads = [threading.Thread(target=worker, args=(session,)) for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    rss_end = get_rss_bytes()
+
+    latencies = [item for session in sessions for item in session.latencies]
+    governor = get_memory_governor().get_usage()
+    return {
+        'sessions': n_sessions,
+        'iterations': iterations,
+        'rows': len(df),
+        'columns': df.shape[1],
+        'elapsed': elapsed,
+        'pages': summarize_latencies(latencies),
+        'db_connections': {
+            'opened': get_observation_count('app_db_call_seconds', function='get_db_connection') - connections_before,
+            'peak': max(monitor.connections, default=0),
+            'mean': float(np.mean(monitor.connections)) if monitor.connections else 0.0
+        },
+        'memory': {
+            'rss_start': rss_start,
+            'rss_peak': max(monitor.rss, default=rss_start),
+            'rss_end': rss_end,
+            'growth': rss_end - rss_start if rss_start is not None and rss_end is not None else None,
+            'growth_per_session': (rss_end - rss_start) / n_sessions if rss_start is not None and rss_end is not None else None,
+            'governed_bytes': governor['memory_bytes'],
+            'spilled_bytes': governor['disk_bytes']
+        },
+        'errors': failures + [error for session in sessions for error in session.errors]
+    }
+
+def print_level(result):
+    print(f"\n== {result['sessions']} sesiones · {result['elapsed']:.1f} s ==")
+    for page, stats in result['pages'].items():
+        print(
+            f"  {page:34} n={stats['count']:<4} p50={stats['p50']:.3f}s p90={stats['p90']:.3f}s "
+            f"p99={stats['p99']:.3f}s máx={stats['max']:.3f}s"
+        )
+    connections, memory = result['db_connections'], result['memory']
+    print(
+        f"  Conexiones: {connections['opened']} abiertas · pico {connections['peak']} simultáneas · "
+        f"media {connections['mean']:.1f}"
+    )
+    if memory['growth'] is not None:
+        print(
+            f"  Memoria: {memory['rss_start'] / 1024 ** 2:.0f} MB -> {memory['rss_end'] / 1024 ** 2:.0f} MB "
+            f"(pico {memory['rss_peak'] / 1024 ** 2:.0f} MB, {memory['growth_per_session'] / 1024 ** 2:.1f} MB por sesión)"
+        )
+    if result['errors']:
+        print(f"  Errores ({len(result['errors'])}):")
+        for error in result['errors'][:10]:
+            print(f"    {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con sesiones concurrentes de la aplicación")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 8],
+                        help="Niveles de concurrencia (se ejecutan uno tras otro)")
+    parser.add_argument('--iterations', type=int, default=1, help="Recorridos completos por sesión")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--features', type=int, default=10)
+    parser.add_argument('--categorical-fraction', type=float, default=0.3)
+    parser.add_argument('--no-train', action='store_true', help="Recorrer Modelos sin entrenar")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Segundos máximos por ejecución del script")
+    parser.add_argument('--database-url', default=None,
+                        help="Servidor donde crear la base de datos desechable (por defecto, un clúster temporal)")
+    parser.add_argument('--output', default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    # Registro, reportes y volcados en un directorio temporal para no tocar los del proyecto
+    work_dir = tempfile.mkdtemp(prefix='carga_')
+    for name, subdir in [('MODEL_REGISTRY_DIR', 'registro'), ('REPORTS_DIR', 'reportes'),
+                         ('SPILL_DIR', 'volcados'), ('DOCS_CACHE_DIR', 'documentacion')]:
+        os.environ[name] = os.path.join(work_dir, subdir)
+    os.environ.setdefault('PRELOAD_PAGES', '0')
+
+    from bench_models import make_dataset, get_environment
+
+    X, y = make_dataset("Clasificación", args.rows, args.features, args.categorical_fraction)
+    df = pd.concat([X, y], axis=1)
+
+    results = []
+    with disposable_postgres(args.database_url) as database_url:
+        os.environ['DATABASE_URL'] = database_url
+        for n_sessions in args.sessions:
+            result = run_level(n_sessions, database_url, df, args.iterations, args.timeout, not args.no_train)
+            results.append(result)
+            print_level(result)
+
+    environment = get_environment()
+    environment['database'] = describe_url(database_url)
+    output = {'environment': environment, 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(output, indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
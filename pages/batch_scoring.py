@@ -0,0 +1,217 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import time
+import argparse
+from pages.utils import (
+    get_db_connection, get_available_tables, get_postgres_type,
+    iter_table_chunks, copy_dataframe_to_table
+)
+from pages.model_registry import list_entries, load_entry
+from pages.preprocessing import make_inference_pipeline
+from pages.memory_governor import get_object
+
+# Número de filas leídas, puntuadas y escritas por bloque
+DEFAULT_CHUNKSIZE = 50000
+
+def create_results_table(conn, output_table, chunk, id_column, predictions, probabilities):
+    """Crea (o reemplaza) la tabla de resultados a partir del primer bloque puntuado"""
+    columns = []
+    if id_column:
+        columns.append(f'"{id_column}" {get_postgres_type(chunk[id_column].dtype)}')
+    else:
+        columns.append('"fila" BIGINT')
+    columns.append(f'"prediccion" {get_postgres_type(pd.Series(predictions).dtype)}')
+    if probabilities is not None:
+        columns.append('"probabilidad" DOUBLE PRECISION')
+
+    cursor = conn.cursor()
+    cursor.execute(f'DROP TABLE IF EXISTS "{output_table}"')
+    cursor.execute(f'CREATE TABLE "{output_table}" ({", ".join(columns)})')
+    conn.commit()
+
+def score_table(model, feature_columns, input_table, output_table, id_column=None,
+                chunksize=DEFAULT_CHUNKSIZE, progress_callback=None):
+    """Puntúa una tabla por bloques con un modelo entrenado y escribe las predicciones con COPY"""
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    columns = list(feature_columns)
+    if id_column and id_column not in columns:
+        columns.append(id_column)
+
+    stats = {
+        'rows': 0,
+        'chunks': 0,
+        'read_time': 0.0,
+        'predict_time': 0.0,
+        'write_time': 0.0
+    }
+    # Los modelos de regresión por bloques exponen predict_proba pero tienen classes_ = None
+    classes_ = getattr(model, 'classes_', None)
+    use_proba = hasattr(model, 'predict_proba') and classes_ is not None and len(classes_) == 2
+    start = time.perf_counter()
+
+    try:
+        read_start = time.perf_counter()
+        for chunk in iter_table_chunks(input_table, columns, chunksize):
+            stats['read_time'] += time.perf_counter() - read_start
+
+            # Predicción vectorizada sobre el bloque completo
+            predict_start = time.perf_counter()
+            X = chunk[feature_columns]
+            predictions = model.predict(X)
+            probabilities = model.predict_proba(X)[:, 1] if use_proba else None
+            stats['predict_time'] += time.perf_counter() - predict_start
+
+            write_start = time.perf_counter()
+            if stats['chunks'] == 0:
+                create_results_table(conn, output_table, chunk, id_column, predictions, probabilities)
+
+            output = pd.DataFrame({
+                id_column if id_column else 'fila': (
+                    chunk[id_column].values if id_column
+                    else np.arange(stats['rows'], stats['rows'] + len(chunk))
+                ),
+                'prediccion': predictions
+            })
+            if probabilities is not None:
+                output['probabilidad'] = probabilities
+            copy_dataframe_to_table(conn, output, output_table)
+            conn.commit()
+            stats['write_time'] += time.perf_counter() - write_start
+
+            stats['rows'] += len(chunk)
+            stats['chunks'] += 1
+            if progress_callback is not None:
+                elapsed = time.perf_counter() - start
+                progress_callback(stats['rows'], stats['rows'] / elapsed if elapsed > 0 else 0.0)
+            read_start = time.perf_counter()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    stats['total_time'] = time.perf_counter() - start
+    stats['rows_per_second'] = stats['rows'] / stats['total_time'] if stats['total_time'] > 0 else 0.0
+    return stats
+
+def get_model_sources():
+    """Reúne los modelos disponibles en la sesión y en el registro"""
+    sources = {}
+    run = get_object('training_run', {})
+    session_features = run.get('feature_columns', [])
+    session_preprocessor = run.get('preprocessor')
+    for model_name, model in run.get('models', {}).items():
+        sources[f"Sesión · {model_name}"] = lambda model=model: (
+            make_inference_pipeline(session_preprocessor, model), list(session_features)
+        )
+    for metadata in list_entries():
+        label = (
+            f"Registro · {metadata.get('model_name')} · {metadata.get('table_name')} → "
+            f"{metadata.get('target_column')} ({metadata['key'][:8]})"
+        )
+        sources[label] = lambda key=metadata['key']: _load_registry_model(key)
+    return sources
+
+def _load_registry_model(key):
+    """Carga un modelo guardado y sus variables predictoras"""
+    entry = load_entry(key)
+    if entry is None:
+        return None, []
+    model = make_inference_pipeline(entry.get('preprocessor'), entry['model'])
+    return model, entry['metadata'].get('feature_columns', [])
+
+def show():
+    st.title("🏭 Predicción por Lotes")
+
+    try:
+        sources = get_model_sources()
+        if not sources:
+            st.warning("No hay modelos entrenados. Entrena un modelo en la sección 'Modelos'.")
+            return
+
+        available_tables = get_available_tables()
+        if not available_tables:
+            st.warning("No hay datos disponibles. Por favor, carga datos en la sección 'Cargar Datos'.")
+            return
+
+        selected_source = st.selectbox("Selecciona el modelo", list(sources.keys()))
+        input_table = st.selectbox("Selecciona la tabla a puntuar", available_tables)
+        output_table = st.text_input("Tabla de resultados", f"{input_table}_predicciones")
+        id_column = st.text_input("Columna identificadora (opcional)", "")
+        chunksize = st.number_input(
+            "Filas por bloque", min_value=1000, max_value=1000000, value=DEFAULT_CHUNKSIZE, step=1000
+        )
+
+        if st.button("Puntuar Tabla"):
+            model, feature_columns = sources[selected_source]()
+            if model is None:
+                st.error("No se pudo cargar el modelo seleccionado.")
+                return
+
+            progress_text = st.empty()
+
+            def report_progress(rows, rows_per_second):
+                progress_text.text(f"Filas puntuadas: {rows:,} ({rows_per_second:,.0f} filas/s)")
+
+            with st.spinner("Puntuando tabla..."):
+                stats = score_table(
+                    model, feature_columns, input_table, output_table,
+                    id_column=id_column or None, chunksize=int(chunksize),
+                    progress_callback=report_progress
+                )
+
+            if stats is None:
+                return
+
+            st.success(f"Predicciones guardadas en la tabla '{output_table}'")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Filas Puntuadas", f"{stats['rows']:,}")
+            with col2:
+                st.metric("Tiempo Total", f"{stats['total_time']:.2f} s")
+            with col3:
+                st.metric("Rendimiento", f"{stats['rows_per_second']:,.0f} filas/s")
+            st.dataframe(pd.DataFrame({
+                'Etapa': ['Lectura', 'Predicción', 'Escritura (COPY)'],
+                'Tiempo (s)': [stats['read_time'], stats['predict_time'], stats['write_time']]
+            }), use_container_width=True)
+
+    except Exception as e:
+        st.error(f"Error en la predicción por lotes: {str(e)}")
+        st.error("Por favor, verifica que la tabla contenga las variables predictoras del modelo.")
+
+def main():
+    """Punto de entrada para ejecutar la puntuación por lotes desde la línea de comandos"""
+    parser = argparse.ArgumentParser(description="Puntúa una tabla de PostgreSQL con un modelo del registro")
+    parser.add_argument('--model-key', required=True, help="Clave del modelo en el registro")
+    parser.add_argument('--input', required=True, help="Tabla de entrada")
+    parser.add_argument('--output', required=True, help="Tabla de resultados")
+    parser.add_argument('--id-column', default=None, help="Columna identificadora de las filas")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Filas por bloque")
+    args = parser.parse_args()
+
+    model, feature_columns = _load_registry_model(args.model_key)
+    if model is None:
+        raise SystemExit(f"No existe el modelo '{args.model_key}' en el registro")
+
+    def report_progress(rows, rows_per_second):
+        print(f"Filas puntuadas: {rows:,} ({rows_per_second:,.0f} filas/s)", flush=True)
+
+    stats = score_table(
+        model, feature_columns, args.input, args.output,
+        id_column=args.id_column, chunksize=args.chunksize,
+        progress_callback=report_progress
+    )
+    if stats is None:
+        raise SystemExit("No se pudo conectar con la base de datos")
+    print(
+        f"Total: {stats['rows']:,} filas en {stats['total_time']:.2f} s "
+        f"({stats['rows_per_second']:,.0f} filas/s)"
+    )
+
+if __name__ == '__main__':
+    main()
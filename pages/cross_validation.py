@@ -0,0 +1,120 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.model_selection import KFold, StratifiedKFold, train_test_split
+from sklearn.metrics import accuracy_score, r2_score
+from pages.preprocessing import build_feature_matrices
+
+RANDOM_STATE = 42
+# Parada temprana de XGBoost sobre una partición de validación del pliegue de entrenamiento
+XGBOOST_MAX_ROUNDS = int(os.getenv('CV_XGBOOST_MAX_ROUNDS', '1000'))
+EARLY_STOPPING_ROUNDS = int(os.getenv('CV_EARLY_STOPPING_ROUNDS', '20'))
+VALIDATION_SIZE = 0.1
+# Crecimiento incremental de Random Forest con warm_start
+FOREST_STEP = 25
+FOREST_MAX_TREES = int(os.getenv('CV_FOREST_MAX_TREES', '500'))
+FOREST_TOLERANCE = 1e-3
+
+def make_folds(y, model_type, n_splits=5, random_state=RANDOM_STATE):
+    """Calcula una sola vez los índices de los pliegues, compartidos por todos los modelos"""
+    y = np.asarray(y)
+    if model_type == "Clasificación":
+        _, counts = np.unique(y, return_counts=True)
+        if counts.min() >= n_splits:
+            splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+            return list(splitter.split(np.zeros(len(y)), y))
+    splitter = KFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    return list(splitter.split(np.zeros(len(y))))
+
+def _score(model_type, y_true, y_pred):
+    """Métrica principal de la página de modelos"""
+    return accuracy_score(y_true, y_pred) if model_type == "Clasificación" else r2_score(y_true, y_pred)
+
+def _validation_split(X, y, model_type):
+    """Separa una partición de validación del pliegue de entrenamiento"""
+    stratify = y if model_type == "Clasificación" and np.unique(y, return_counts=True)[1].min() >= 2 else None
+    return train_test_split(X, y, test_size=VALIDATION_SIZE, random_state=RANDOM_STATE, stratify=stratify)
+
+def fit_fold(model, model_name, model_type, X_train, y_train, X_test, y_test):
+    """Entrena un modelo en un pliegue (con parada temprana cuando aplica) y lo evalúa"""
+    details = {}
+    start = time.perf_counter()
+
+    if model_name == "XGBoost":
+        X_fit, X_val, y_fit, y_val = _validation_split(X_train, y_train, model_type)
+        model.set_params(n_estimators=XGBOOST_MAX_ROUNDS, early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+        model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        details['n_estimators'] = int(model.best_iteration) + 1
+    elif model_name == "Random Forest":
+        # Agregar árboles mientras la puntuación de validación siga mejorando
+        X_fit, X_val, y_fit, y_val = _validation_split(X_train, y_train, model_type)
+        model.set_params(warm_start=True, n_estimators=FOREST_STEP)
+        best_score = -np.inf
+        while True:
+            model.fit(X_fit, y_fit)
+            val_score = _score(model_type, y_val, model.predict(X_val))
+            if val_score - best_score < FOREST_TOLERANCE or model.n_estimators >= FOREST_MAX_TREES:
+                break
+            best_score = val_score
+            model.set_params(n_estimators=model.n_estimators + FOREST_STEP)
+        details['n_estimators'] = model.n_estimators
+    else:
+        model.fit(X_train, y_train)
+
+    details['fit_time'] = time.perf_counter() - start
+    details['score'] = _score(model_type, y_test, model.predict(X_test))
+    return details
+
+def _prepare_fold(X, train_idx, test_idx):
+    """Ajusta el preprocesamiento en el pliegue de entrenamiento y transforma ambos lados"""
+    matrices = build_feature_matrices(X.iloc[train_idx], X.iloc[test_idx])
+    return matrices['X_train'], matrices['X_test']
+
+def cross_validate_models(model_factory, model_names, model_type, X, y, n_splits=5, n_jobs=-1):
+    """Evalúa varios modelos con k pliegues ejecutados en paralelo sobre las mismas particiones"""
+    y = pd.Series(y).reset_index(drop=True)
+    X = X.reset_index(drop=True)
+    if model_type == "Clasificación":
+        # Etiquetas 0..k-1: XGBoost no admite etiquetas de texto
+        y = pd.Series(pd.factorize(y, sort=True)[0])
+
+    start = time.perf_counter()
+    folds = make_folds(y, model_type, n_splits)
+
+    # Preprocesamiento una vez por pliegue, reutilizado por todos los modelos
+    fold_matrices = Parallel(n_jobs=n_jobs)(
+        delayed(_prepare_fold)(X, train_idx, test_idx) for train_idx, test_idx in folds
+    )
+
+    tasks = [
+        (model_name, fold)
+        for model_name in model_names
+        for fold in range(len(folds))
+    ]
+    outputs = Parallel(n_jobs=n_jobs)(
+        delayed(fit_fold)(
+            model_factory(model_name, fold_matrices[fold][0]), model_name, model_type,
+            fold_matrices[fold][0], y.iloc[folds[fold][0]].to_numpy(),
+            fold_matrices[fold][1], y.iloc[folds[fold][1]].to_numpy()
+        )
+        for model_name, fold in tasks
+    )
+    wall_time = time.perf_counter() - start
+
+    fold_results = pd.DataFrame([
+        dict(output, model=model_name, fold=fold + 1)
+        for (model_name, fold), output in zip(tasks, outputs)
+    ])
+    summary = fold_results.groupby('model', sort=False).agg(
+        score_mean=('score', 'mean'),
+        score_std=('score', 'std'),
+        fit_time_total=('fit_time', 'sum')
+    ).reset_index()
+    if 'n_estimators' in fold_results.columns:
+        summary = summary.merge(
+            fold_results.groupby('model')['n_estimators'].mean().rename('n_estimators_mean').reset_index(),
+            on='model', how='left'
+        )
+    return fold_results, summary, wall_time
@@ -2,27 +2,102 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from pages.utils import load_from_db, get_available_tables
+from pages.datasets import select_table, get_dataframe
+from pages.distributed import use_dask, read_table, summarize_table, get_cluster_info
+from pages.reports import show_report_export
+
+def show_distributed(selected_table):
+    """Dashboard con las agregaciones calculadas en el clúster Dask, sin cargar la tabla completa"""
+    ddf = read_table(selected_table)
+    cluster = get_cluster_info()
+    st.caption(
+        f"🖧 Calculado en Dask: {ddf.npartitions} particiones · {cluster['workers']} trabajadores · "
+        f"{cluster['dashboard']}"
+    )
+    numeric_columns = list(ddf.select_dtypes(include=['int64', 'float64']).columns)
+    categorical_columns = list(ddf.select_dtypes(include=['object', 'category']).columns)
+    
+    selected_column = None
+    if numeric_columns:
+        selected_column = st.selectbox("Selecciona una variable numérica", numeric_columns)
+    selected_cat_column = None
+    if categorical_columns:
+        selected_cat_column = st.selectbox("Selecciona una variable categórica", categorical_columns)
+    
+    with st.spinner("Calculando agregaciones en el clúster..."):
+        summary = summarize_table(ddf, selected_column, selected_cat_column)
+    
+    st.header("📈 Información General")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Número de Registros", summary['n_rows'])
+    with col2:
+        st.metric("Número de Columnas", len(ddf.columns))
+    with col3:
+        st.metric("Memoria Usada", f"{summary['memory_bytes'] / 1024:.2f} KB")
+    
+    if selected_column is not None:
+        st.header("📊 Análisis de Variables Numéricas")
+        histogram = summary.get('histogram')
+        if histogram is None:
+            st.info(f"La variable {selected_column} no tiene valores: no se muestra su distribución.")
+        else:
+            fig_hist = px.bar(
+                x=(histogram['Desde'] + histogram['Hasta']) / 2,
+                y=histogram['Cantidad'],
+                title=f"Distribución de {selected_column}",
+                labels={'x': selected_column, 'y': 'count'}
+            )
+            fig_hist.update_layout(bargap=0)
+            st.plotly_chart(fig_hist, use_container_width=True)
+        st.subheader("Estadísticas Descriptivas")
+        st.dataframe(summary['describe'], use_container_width=True)
+    
+    if selected_cat_column is not None:
+        st.header("📊 Análisis de Variables Categóricas")
+        value_counts = summary['value_counts'].sort_values(ascending=False).reset_index()
+        value_counts.columns = ['Categoría', 'Cantidad']
+        fig_bar = px.bar(
+            value_counts,
+            x='Categoría',
+            y='Cantidad',
+            title=f"Distribución de {selected_cat_column}"
+        )
+        st.plotly_chart(fig_bar, use_container_width=True)
+        st.subheader("Conteo por Categoría")
+        st.dataframe(value_counts, use_container_width=True)
+    
+    if 'corr' in summary:
+        st.header("📊 Matriz de Correlaciones")
+        fig_corr = px.imshow(
+            summary['corr'],
+            title="Matriz de Correlaciones",
+            color_continuous_scale='RdBu'
+        )
+        st.plotly_chart(fig_corr, use_container_width=True)
+    
+    st.header("📋 Vista Previa de los Datos")
+    st.dataframe(summary['head'], use_container_width=True)
+    
+    show_report_export(selected_table)
 
 def show():
     st.title("📊 Dashboard")
     
     try:
-        # Obtener lista de tablas disponibles
-        available_tables = get_available_tables()
+        # Seleccionar tabla (la tabla activa se comparte entre todas las páginas)
+        selected_table = select_table("Selecciona la tabla a analizar")
         
-        if not available_tables:
+        if selected_table is None:
             st.warning("No hay datos disponibles. Por favor, carga datos en la sección 'Cargar Datos'.")
             return
         
-        # Seleccionar tabla
-        selected_table = st.selectbox(
-            "Selecciona la tabla a analizar",
-            available_tables
-        )
+        if use_dask():
+            show_distributed(selected_table)
+            return
         
         # Cargar datos
-        df = load_from_db(selected_table)
+        df = get_dataframe(selected_table)
         
         if df is None or df.empty:
             st.error("No se pudieron cargar los datos. Por favor, intenta nuevamente.")
@@ -109,6 +184,9 @@ def show():
         st.header("📋 Vista Previa de los Datos")
         st.dataframe(df.head(10), use_container_width=True)
         
+        # Reporte PDF en segundo plano (reutiliza los datos ya cargados)
+        show_report_export(selected_table, df)
+        
     except Exception as e:
         st.error(f"Error en el dashboard: {str(e)}")
         st.error("Por favor, intenta recargar la página o verifica que los datos estén cargados correctamente.") 
\ No newline at end of file
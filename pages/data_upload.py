@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
-from pages.utils import upload_to_db, get_available_tables, load_from_db, delete_table
+from pages.utils import upload_to_db, delete_table
+from pages.datasets import select_table, get_dataframe, set_dataframe, get_active_dataframe, invalidate
 import time
 
 def show():
@@ -40,6 +41,10 @@ def show():
                         st.dataframe(df, use_container_width=True, height=400)
                     
                     table_name = st.text_input("Nombre de la tabla", "datos_analisis")
+                    append_rows = st.checkbox(
+                        "Añadir filas a la tabla existente (permite actualizar los modelos de forma incremental)",
+                        value=False
+                    )
                     
                     if st.button("Cargar a Base de Datos", key="upload_to_db"):
                         # Crear una barra de progreso
@@ -52,14 +57,18 @@ def show():
                             status_text.text(f"Preparando carga de {total_rows} registros...")
                             
                             # Cargar datos a la base de datos
-                            upload_to_db(df, table_name)
+                            upload_to_db(df, table_name, append=append_rows)
                             
                             # Actualizar la barra de progreso al 100%
                             progress_bar.progress(100)
                             status_text.text("¡Carga completada!")
                             
-                            # Guardar el DataFrame en la sesión
-                            st.session_state['df'] = df
+                            # El DataFrame pasa a ser el conjunto activo de todas las páginas; al
+                            # añadir filas solo se tienen las nuevas, así que la tabla se relee al usarla
+                            if append_rows:
+                                invalidate(table_name)
+                            else:
+                                set_dataframe(table_name, df)
                             
                             # Mostrar mensaje de éxito
                             st.success(f"✅ Datos cargados exitosamente a la base de datos")
@@ -81,18 +90,14 @@ def show():
             st.markdown("### Selecciona una tabla existente")
             
             try:
-                available_tables = get_available_tables()
+                selected_table = select_table("Selecciona una tabla")
                 
-                if available_tables:
-                    selected_table = st.selectbox(
-                        "Selecciona una tabla",
-                        available_tables
-                    )
-                    
+                if selected_table is not None:
                     # Opción para eliminar tabla
                     if st.button("🗑️ Eliminar Tabla", key="delete_table"):
                         if st.warning(f"¿Estás seguro de que deseas eliminar la tabla '{selected_table}'?"):
                             delete_table(selected_table)
+                            invalidate(selected_table)
                             st.success(f"Tabla '{selected_table}' eliminada exitosamente")
                             st.experimental_rerun()
                     
@@ -107,11 +112,10 @@ def show():
                             status_text.text(f"Cargando datos... {i + 1}%")
                             time.sleep(0.01)  # Pequeña pausa para mostrar el progreso
                         
-                        # Cargar datos desde la base de datos
-                        df = load_from_db(selected_table)
+                        # Cargar datos desde la base de datos (se descarta la copia de la sesión)
+                        invalidate(selected_table)
+                        df = get_dataframe(selected_table)
                         if df is not None:
-                            st.session_state['df'] = df
-                            
                             # Actualizar la barra de progreso al 100%
                             progress_bar.progress(100)
                             status_text.text("¡Carga completada!")
@@ -131,33 +135,34 @@ def show():
                 st.error(f"Error al cargar desde la base de datos: {str(e)}")
         
         # Mostrar información sobre los datos cargados
-        if 'df' in st.session_state:
+        active_df = get_active_dataframe()
+        if active_df is not None:
             st.markdown("---")
             st.header("📊 Información de los Datos")
             
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                st.metric("Número de Filas", len(st.session_state['df']))
+                st.metric("Número de Filas", len(active_df))
             
             with col2:
-                st.metric("Número de Columnas", len(st.session_state['df'].columns))
+                st.metric("Número de Columnas", len(active_df.columns))
             
             with col3:
-                st.metric("Memoria Usada", f"{st.session_state['df'].memory_usage().sum() / 1024:.2f} KB")
+                st.metric("Memoria Usada", f"{active_df.memory_usage().sum() / 1024:.2f} KB")
             
             # Mostrar información de tipos de datos
             st.subheader("Tipos de Datos")
             type_info = pd.DataFrame({
-                'Columna': st.session_state['df'].columns,
-                'Tipo': st.session_state['df'].dtypes,
-                'Valores Únicos': st.session_state['df'].nunique()
+                'Columna': active_df.columns,
+                'Tipo': active_df.dtypes,
+                'Valores Únicos': active_df.nunique()
             })
             st.dataframe(type_info, use_container_width=True)
             
             # Mostrar estadísticas descriptivas
             st.subheader("Estadísticas Descriptivas")
-            st.dataframe(st.session_state['df'].describe(), use_container_width=True)
+            st.dataframe(active_df.describe(), use_container_width=True)
     
     except Exception as e:
         st.error(f"Error en la página de carga de datos: {str(e)}")
@@ -0,0 +1,205 @@
+import os
+import time
+import pandas as pd
+import streamlit as st
+from pages.utils import get_available_tables, get_table_version, get_table_columns, load_columns
+from pages.distributed import use_dask, load_table
+from pages.memory_governor import store_object, drop_object
+from pages.instrumentation import record_cache
+
+# Segundos durante los que se reutilizan la lista de tablas y la versión comprobada de la
+# tabla activa; pasado ese tiempo se vuelven a consultar (una consulta ligera cada una)
+DATASET_REFRESH_SECONDS = float(os.getenv('DATASET_REFRESH_SECONDS', '30'))
+
+DATASET_KEY = 'dataset'
+ACTIVE_TABLE_KEY = 'active_table'
+TABLES_KEY = 'dataset_tables'
+
+class DatasetHandle:
+    """Conjunto de datos activo de la sesión: tabla, versión, esquema y columnas ya leídas"""
+
+    def __init__(self, table_name, version, schema):
+        self.table_name = table_name
+        self.version = version
+        # Lista de (columna, tipo) en el orden de la tabla
+        self.schema = schema
+        # Columnas materializadas: se leen de la base de datos la primera vez que se piden y el
+        # gobernador de memoria puede volcarlas a disco mientras no se usan
+        self._frame = store_object('dataset', pd.DataFrame())
+        # Se guardan aparte para consultarlas sin recargar un DataFrame volcado
+        self.loaded_columns = []
+        self.n_rows = None
+        self.checked_at = time.monotonic()
+
+    @property
+    def column_names(self):
+        return [name for name, _ in self.schema]
+
+    @property
+    def frame(self):
+        return self._frame.get()
+
+    def missing_columns(self, columns=None):
+        loaded = set(self.loaded_columns)
+        return [col for col in (columns or self.column_names) if col not in loaded]
+
+    def store(self, df):
+        """Guarda las columnas de un DataFrame leído de la tabla"""
+        df = df.reset_index(drop=True)
+        if self.n_rows is None or len(df) != self.n_rows or not self.loaded_columns:
+            # Primera lectura, o las filas cambiaron entre dos lecturas y las columnas
+            # anteriores ya no se alinean
+            frame = df
+        else:
+            frame = self.frame
+            frame = pd.concat([frame.drop(columns=[col for col in df.columns if col in frame.columns]), df], axis=1)
+        self.n_rows = len(df)
+        self.loaded_columns = list(frame.columns)
+        self._frame.set(frame)
+
+    def to_frame(self, columns=None):
+        loaded = set(self.loaded_columns)
+        selected = [col for col in (columns or self.column_names) if col in loaded]
+        frame = self.frame
+        # Sin copia cuando se piden todas las columnas en su orden (las páginas no modifican el DataFrame)
+        return frame if selected == list(frame.columns) else frame[selected]
+
+    def memory_bytes(self):
+        return self._frame.nbytes
+
+    def is_spilled(self):
+        return self._frame.spilled
+
+def get_tables(refresh=False):
+    """Lista de tablas, reutilizada por todas las páginas de la sesión"""
+    cached = st.session_state.get(TABLES_KEY)
+    if refresh or cached is None or time.monotonic() - cached[0] > DATASET_REFRESH_SECONDS:
+        cached = (time.monotonic(), get_available_tables())
+        st.session_state[TABLES_KEY] = cached
+    return cached[1]
+
+def invalidate(table_name=None):
+    """Descarta la lista de tablas y, si es la activa, los datos de `table_name`.
+
+    Se llama tras crear, modificar o eliminar una tabla desde esta sesión.
+    """
+    st.session_state.pop(TABLES_KEY, None)
+    handle = st.session_state.get(DATASET_KEY)
+    if handle is not None and (table_name is None or handle.table_name == table_name):
+        _drop_dataset()
+
+def _drop_dataset():
+    st.session_state.pop(DATASET_KEY, None)
+    drop_object('dataset')
+
+def select_table(label):
+    """Selector de tabla compartido: todas las páginas muestran y cambian la misma tabla activa"""
+    tables = get_tables()
+    if not tables:
+        return None
+    active = st.session_state.get(ACTIVE_TABLE_KEY)
+    selected_table = st.selectbox(label, tables, index=tables.index(active) if active in tables else 0)
+    st.session_state[ACTIVE_TABLE_KEY] = selected_table
+    return selected_table
+
+def get_dataset(table_name):
+    """Handle de la tabla en la sesión; se crea de nuevo si cambia la tabla o su versión"""
+    handle = st.session_state.get(DATASET_KEY)
+    if handle is not None and handle.table_name == table_name:
+        if time.monotonic() - handle.checked_at <= DATASET_REFRESH_SECONDS:
+            return handle
+        version = get_table_version(table_name)
+        if version == handle.version:
+            handle.checked_at = time.monotonic()
+            return handle
+    else:
+        version = get_table_version(table_name)
+    if version is None:
+        return None
+    handle = DatasetHandle(table_name, version, get_table_columns(table_name))
+    st.session_state[DATASET_KEY] = handle
+    st.session_state[ACTIVE_TABLE_KEY] = table_name
+    return handle
+
+def _read_columns(table_name, columns):
+    if use_dask():
+        # Particiones por rangos de ctid leídas en paralelo: mismo orden físico que load_columns
+        try:
+            return load_table(table_name, columns)
+        except Exception as e:
+            st.error(f"Error al cargar datos: {str(e)}")
+            return None
+    return load_columns(table_name, columns)
+
+def get_dataframe(table_name, columns=None):
+    """DataFrame de la tabla con las columnas pedidas (todas por defecto).
+
+    Solo se leen de la base de datos las columnas que todavía no estén en la sesión; al
+    cambiar de página o repetir la ejecución se reutilizan sin volver a cargarlas.
+    """
+    handle = get_dataset(table_name)
+    if handle is None:
+        return None
+    missing = handle.missing_columns(columns)
+    record_cache('conjunto_activo', not missing)
+    if missing:
+        df = _read_columns(table_name, missing)
+        if df is None:
+            return None
+        if handle.loaded_columns and get_table_version(table_name) != handle.version:
+            # La tabla cambió dentro de la ventana de refresco: aunque conserve el número de
+            # filas, su orden físico ya no tiene por qué coincidir con el de las columnas
+            # guardadas, así que se descartan y las pedidas se leen juntas en una sola consulta
+            _drop_dataset()
+            handle = get_dataset(table_name)
+            if handle is None:
+                return None
+            df = _read_columns(table_name, handle.missing_columns(columns))
+            if df is None:
+                return None
+        handle.store(df)
+        # Si las filas cambiaron, se descartaron las columnas anteriores y se leen otra vez
+        missing = handle.missing_columns(columns)
+        if missing:
+            df = load_columns(table_name, missing)
+            if df is None:
+                return None
+            handle.store(df)
+    return handle.to_frame(columns)
+
+def set_dataframe(table_name, df):
+    """Registra como conjunto activo un DataFrame que ya contiene la tabla completa"""
+    invalidate(table_name)
+    handle = get_dataset(table_name)
+    if handle is not None and sorted(df.columns) == sorted(handle.column_names):
+        handle.store(df)
+    return handle
+
+def get_active_dataframe():
+    """Columnas ya leídas del conjunto activo, sin consultar la base de datos"""
+    handle = st.session_state.get(DATASET_KEY)
+    if handle is None or not handle.loaded_columns:
+        return None
+    return handle.to_frame()
+
+def get_loaded_version(table_name):
+    """Versión de la tabla con la que se leyeron las columnas del conjunto activo.
+
+    Es la que identifica los datos con los que se entrena, aunque la tabla haya cambiado
+    después dentro de la ventana de refresco.
+    """
+    handle = st.session_state.get(DATASET_KEY)
+    if handle is None or handle.table_name != table_name:
+        return None
+    return handle.version
+
+def show_dataset_status():
+    """Resumen del conjunto activo de la sesión"""
+    handle = st.session_state.get(DATASET_KEY)
+    if handle is None:
+        return
+    st.caption(
+        f"📦 Conjunto activo: {handle.table_name} · "
+        f"{len(handle.loaded_columns)} de {len(handle.schema)} columnas leídas · "
+        f"{handle.memory_bytes() / 1024 / 1024:.2f} MB{' (en disco)' if handle.is_spilled() else ''}"
+    )
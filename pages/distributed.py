@@ -0,0 +1,210 @@
+import os
+import tempfile
+import threading
+import importlib.util
+from functools import partial
+import numpy as np
+import pandas as pd
+import psycopg2
+from dotenv import load_dotenv
+
+# Dask es opcional y costoso de importar: solo se comprueba que esté instalado y se
+# importa al usar el backend distribuido, para no retrasar el arranque de las páginas
+DASK_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ('dask', 'distributed'))
+
+load_dotenv()
+
+# 'local' (un proceso, pandas) o 'dask' (clúster local de varios procesos o remoto)
+EXECUTION_BACKEND = os.getenv('EXECUTION_BACKEND', 'local')
+# Dirección de un planificador existente; sin ella se inicia un clúster local
+DASK_SCHEDULER_ADDRESS = os.getenv('DASK_SCHEDULER_ADDRESS')
+DASK_WORKERS = int(os.getenv('DASK_WORKERS', str(max(1, (os.cpu_count() or 1) // 2))))
+DASK_THREADS_PER_WORKER = int(os.getenv('DASK_THREADS_PER_WORKER', '2'))
+# Tamaño en disco de cada partición leída de PostgreSQL
+DASK_PARTITION_MB = float(os.getenv('DASK_PARTITION_MB', '64'))
+# Filas por bloque de los arrays distribuidos usados en el entrenamiento
+DASK_CHUNK_ROWS = int(os.getenv('DASK_CHUNK_ROWS', '100000'))
+SAMPLE_ROWS = 100
+
+def use_dask():
+    """Indica si las lecturas y el entrenamiento se ejecutan en el clúster Dask"""
+    return DASK_AVAILABLE and EXECUTION_BACKEND == 'dask'
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Cliente Dask compartido por todas las sesiones del servidor.
+
+    Con DASK_SCHEDULER_ADDRESS se conecta a un clúster existente (varios nodos); sin ella
+    inicia un clúster local con un proceso por trabajador.
+    """
+    from dask.distributed import Client, LocalCluster
+    
+    global _client
+    with _client_lock:
+        if _client is None:
+            if DASK_SCHEDULER_ADDRESS:
+                _client = Client(DASK_SCHEDULER_ADDRESS)
+            else:
+                _client = Client(LocalCluster(
+                    n_workers=DASK_WORKERS, threads_per_worker=DASK_THREADS_PER_WORKER, processes=True
+                ))
+        return _client
+
+def get_cluster_info():
+    """Resumen de los trabajadores del clúster"""
+    workers = get_client().scheduler_info()['workers']
+    return {
+        'dashboard': get_client().dashboard_link,
+        'workers': len(workers),
+        'threads': sum(w['nthreads'] for w in workers.values()),
+        'memory_bytes': sum(w['memory_limit'] for w in workers.values())
+    }
+
+def _column_list(columns):
+    return ', '.join(f'"{col}"' for col in columns) if columns else '*'
+
+def _read_block_range(dsn, table_name, columns, block_range):
+    """Lee las filas de un rango de bloques físicos de la tabla (se ejecuta en un trabajador)"""
+    start, end = block_range
+    query = f'SELECT {_column_list(columns)} FROM "{table_name}" WHERE ctid >= %s::tid'
+    params = [f"({start},0)"]
+    if end is not None:
+        query += ' AND ctid < %s::tid'
+        params.append(f"({end},0)")
+    # Sin ORDER BY el plan puede devolver otro orden (p. ej. un seqscan sincronizado); las
+    # columnas leídas por separado se alinean por posición y necesitan el orden físico
+    query += ' ORDER BY ctid'
+    conn = psycopg2.connect(dsn)
+    try:
+        return pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+
+def _get_block_ranges(dsn, table_name):
+    """Divide la tabla en rangos de bloques de DASK_PARTITION_MB cada uno"""
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT pg_relation_size(to_regclass(%s)), current_setting('block_size')::int",
+            (f'"{table_name}"',)
+        )
+        relation_size, block_size = cursor.fetchone()
+    finally:
+        conn.close()
+    n_blocks = relation_size // block_size
+    blocks_per_partition = max(1, int(DASK_PARTITION_MB * 1024 * 1024 // block_size))
+    starts = list(range(0, max(n_blocks, 1), blocks_per_partition))
+    # La última partición no tiene límite superior: incluye las filas añadidas tras medir la tabla
+    return [(start, next_start) for start, next_start in zip(starts, starts[1:])] + [(starts[-1], None)]
+
+def read_table(table_name, columns=None):
+    """DataFrame distribuido de una tabla, con particiones por rangos de bloques (ctid).
+
+    Cada trabajador lee su rango con su propia conexión, así que la lectura escala con el
+    número de procesos. El orden de las filas es el físico de la tabla.
+    """
+    import dask.dataframe as dd
+    
+    dsn = os.getenv('DATABASE_URL')
+    block_ranges = _get_block_ranges(dsn, table_name)
+    conn = psycopg2.connect(dsn)
+    try:
+        meta = pd.read_sql(
+            f'SELECT {_column_list(columns)} FROM "{table_name}" LIMIT {SAMPLE_ROWS}', conn
+        ).iloc[:0]
+    finally:
+        conn.close()
+    return dd.from_map(
+        partial(_read_block_range, dsn, table_name, columns), block_ranges,
+        meta=meta, label=f"leer-{table_name}", enforce_metadata=False
+    )
+
+def load_table(table_name, columns=None):
+    """Carga una tabla completa en un DataFrame de pandas leyendo sus particiones en paralelo"""
+    get_client()
+    return read_table(table_name, columns).compute().reset_index(drop=True)
+
+def summarize_table(ddf, numeric_column=None, categorical_column=None, bins=30):
+    """Agregaciones del dashboard calculadas en el clúster, sin traer la tabla al proceso.
+
+    Retorna el número de filas, la memoria, el histograma y la descripción de una variable
+    numérica, los conteos de una categórica, las correlaciones y una vista previa.
+    """
+    import dask
+    import dask.array as da
+    
+    get_client()
+    numeric_columns = list(ddf.select_dtypes(include=['int64', 'float64']).columns)
+    tasks = {
+        'n_rows': ddf.shape[0],
+        'memory_bytes': ddf.memory_usage(deep=False).sum(),
+        'head': ddf.head(10, npartitions=-1, compute=False)
+    }
+    if numeric_column is not None:
+        tasks['describe'] = ddf[numeric_column].describe()
+        tasks['range'] = (ddf[numeric_column].min(), ddf[numeric_column].max())
+    if categorical_column is not None:
+        tasks['value_counts'] = ddf[categorical_column].value_counts()
+    if len(numeric_columns) > 1:
+        tasks['corr'] = ddf[numeric_columns].corr()
+    summary, = dask.compute(tasks)
+
+    if numeric_column is not None:
+        # El histograma necesita el rango: se calcula en una segunda pasada. Una columna sin
+        # valores tiene rango NaN y se queda sin histograma
+        low, high = summary['range']
+        if not pd.isna(low):
+            low, high = float(low), float(high)
+            if low == high:
+                # Mismo criterio que np.histogram para una columna constante
+                low, high = low - 0.5, high + 0.5
+            counts, edges = da.histogram(
+                ddf[numeric_column].dropna().to_dask_array().astype(np.float64), bins=bins, range=(low, high)
+            )
+            edges = np.asarray(edges)
+            summary['histogram'] = pd.DataFrame({
+                'Desde': edges[:-1],
+                'Hasta': edges[1:],
+                'Cantidad': counts.compute()
+            })
+    summary['numeric_columns'] = numeric_columns
+    return summary
+
+def _as_dask_array(X):
+    """Array distribuido por bloques de filas (admite matrices CSR)"""
+    import dask.array as da
+    
+    if hasattr(X, 'tocsr'):
+        return da.from_array(X, chunks=(DASK_CHUNK_ROWS, X.shape[1]), asarray=False)
+    X = np.asarray(X)
+    return da.from_array(X, chunks=(DASK_CHUNK_ROWS,) + X.shape[1:])
+
+def fit_distributed(model, X, y):
+    """Entrena el modelo en el clúster y lo deja ajustado en el proceso actual.
+
+    XGBoost se entrena con xgboost.dask sobre arrays distribuidos y su resultado se copia
+    al estimador local; el resto de modelos reparte su paralelismo de joblib (árboles,
+    vecinos, pliegues de calibración) entre los trabajadores.
+    """
+    import joblib
+    import xgboost as xgb
+    from xgboost import dask as dxgb
+    
+    client = get_client()
+    if isinstance(model, xgb.XGBModel):
+        dask_class = dxgb.DaskXGBClassifier if isinstance(model, xgb.XGBClassifier) else dxgb.DaskXGBRegressor
+        dask_model = dask_class(**model.get_params())
+        dask_model.client = client
+        dask_model.fit(_as_dask_array(X), _as_dask_array(y))
+        # El modelo guardado incluye los atributos de scikit-learn (clases, tipo de estimador)
+        with tempfile.TemporaryDirectory(prefix='xgb_dask_') as tmp_dir:
+            path = os.path.join(tmp_dir, 'modelo.json')
+            dask_model.save_model(path)
+            model.load_model(path)
+        return model
+    with joblib.parallel_backend('dask', n_jobs=-1):
+        model.fit(X, y)
+    return model
@@ -1,37 +1,32 @@
 import streamlit as st
 import os
+import json
+import hashlib
+import tempfile
+import threading
 from dotenv import load_dotenv
-import base64
 from fpdf import FPDF
-import tempfile
 import unicodedata
 from pages.utils import load_from_db, get_available_tables
 
+# Directorio donde se guarda el PDF generado, una versión por hash de contenido
+DOCS_CACHE_DIR = os.getenv(
+    'DOCS_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.docs_cache')
+)
+PDF_TITLE = "Documentacion del Proyecto de Analisis Predictivo"
+PDF_AUTHORS = ["Santiago Ramirez Forero", "Macjainer Molano Ramos"]
+
+_pdf_lock = threading.Lock()
+
 def remove_accents(text):
     """Elimina acentos y caracteres especiales del texto"""
     text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
     return text
 
-def create_pdf():
-    # Crear PDF con soporte UTF-8
-    pdf = FPDF()
-    pdf.add_page()
-    
-    # Configurar fuente
-    pdf.set_font("helvetica", "B", 16)
-    
-    # Portada
-    title = remove_accents("Documentacion del Proyecto de Analisis Predictivo")
-    pdf.cell(0, 10, title, ln=True, align='C')
-    pdf.ln(10)
-    pdf.set_font("helvetica", "", 12)
-    pdf.cell(0, 10, "Desarrollado por:", ln=True, align='C')
-    pdf.cell(0, 10, remove_accents("Santiago Ramirez Forero"), ln=True, align='C')
-    pdf.cell(0, 10, remove_accents("Macjainer Molano Ramos"), ln=True, align='C')
-    pdf.ln(20)
-    
-    # Contenido
-    sections = [
+def get_pdf_sections():
+    """Secciones del PDF como pares (título, contenido)"""
+    return [
         ("Introduccion", """
         Este proyecto es una aplicacion de analisis predictivo que permite:
         - Cargar y visualizar datos
@@ -160,8 +155,36 @@ def create_pdf():
         - Soporte tecnico
         """)
     ]
+
+def get_pdf_content_hash():
+    """Hash del contenido del PDF: cambia solo cuando cambia el texto del documento"""
+    payload = json.dumps({
+        'title': PDF_TITLE,
+        'authors': PDF_AUTHORS,
+        'sections': get_pdf_sections()
+    }, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def create_pdf(path):
+    """Genera el PDF de la documentación en la ruta indicada"""
+    # Crear PDF con soporte UTF-8
+    pdf = FPDF()
+    pdf.add_page()
+    
+    # Configurar fuente
+    pdf.set_font("helvetica", "B", 16)
+    
+    # Portada
+    title = remove_accents(PDF_TITLE)
+    pdf.cell(0, 10, title, ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font("helvetica", "", 12)
+    pdf.cell(0, 10, "Desarrollado por:", ln=True, align='C')
+    for author in PDF_AUTHORS:
+        pdf.cell(0, 10, remove_accents(author), ln=True, align='C')
+    pdf.ln(20)
     
-    for title, content in sections:
+    for title, content in get_pdf_sections():
         pdf.add_page()
         pdf.set_font("helvetica", "B", 14)
         pdf.cell(0, 10, remove_accents(title), ln=True)
@@ -170,23 +193,54 @@ def create_pdf():
         for line in content.split('\n'):
             pdf.multi_cell(0, 10, remove_accents(line))
     
-    # Guardar PDF
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-    pdf.output(temp_file.name)
-    return temp_file.name
+    pdf.output(path)
+
+def _pdf_path():
+    return os.path.join(DOCS_CACHE_DIR, f"documentacion-{get_pdf_content_hash()}.pdf")
 
-def get_download_link(file_path, link_text):
-    with open(file_path, "rb") as f:
-        bytes = f.read()
-        b64 = base64.b64encode(bytes)
-        return f'<a href="data:application/pdf;base64,{b64.decode()}" download="documentacion.pdf">{link_text}</a>'
+def get_cached_pdf_path():
+    """Ruta del PDF en caché para la versión actual del contenido, o None si aún no se ha generado"""
+    path = _pdf_path()
+    return path if os.path.exists(path) else None
+
+def build_pdf():
+    """Genera el PDF una sola vez por versión del contenido y elimina las versiones anteriores"""
+    with _pdf_lock:
+        path = _pdf_path()
+        if os.path.exists(path):
+            return path
+        os.makedirs(DOCS_CACHE_DIR, exist_ok=True)
+        # Escribir en un archivo temporal único y renombrar para no servir un PDF a medias;
+        # el prefijo oculto evita que la limpieza de versiones anteriores lo borre
+        fd, tmp_path = tempfile.mkstemp(dir=DOCS_CACHE_DIR, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+        os.close(fd)
+        try:
+            create_pdf(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        for file_name in os.listdir(DOCS_CACHE_DIR):
+            old_path = os.path.join(DOCS_CACHE_DIR, file_name)
+            if file_name.startswith('documentacion-') and old_path != path:
+                os.remove(old_path)
+        return path
 
 def show():
     st.title("📚 Documentación del Proyecto")
     
-    # Botón para descargar PDF
-    pdf_path = create_pdf()
-    st.markdown(get_download_link(pdf_path, "📥 Descargar Documentación en PDF"), unsafe_allow_html=True)
+    # El PDF se genera solo a petición y se reutiliza mientras el contenido no cambie
+    pdf_path = get_cached_pdf_path()
+    if pdf_path is None and st.button("📄 Generar Documentación en PDF"):
+        with st.spinner("Generando PDF..."):
+            pdf_path = build_pdf()
+    if pdf_path is not None:
+        with open(pdf_path, "rb") as pdf_file:
+            st.download_button(
+                "📥 Descargar Documentación en PDF", pdf_file,
+                file_name="documentacion.pdf", mime="application/pdf"
+            )
     
     # Índice
     st.markdown("## Índice")
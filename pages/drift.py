@@ -0,0 +1,93 @@
+import os
+import numpy as np
+import pandas as pd
+
+# PSI a partir del cual la deriva se considera alta y se recomienda un reentrenamiento completo
+PSI_RETRAIN_THRESHOLD = float(os.getenv('PSI_RETRAIN_THRESHOLD', '0.25'))
+PSI_MODERATE = 0.1
+PSI_EPSILON = 1e-4
+# Casillas de los histogramas de referencia
+PROFILE_BINS = 10
+PROFILE_TOP_CATEGORIES = 20
+
+def _is_numeric(series):
+    return (pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)) \
+        or pd.api.types.is_datetime64_any_dtype(series.dtype)
+
+def _profile_column(series, reference=None):
+    """Histograma de una columna: cuantiles para las numéricas y categorías frecuentes para el resto"""
+    kind = reference['kind'] if reference is not None else ('numeric' if _is_numeric(series) else 'categorical')
+    missing = int(series.isna().sum())
+    values = series.dropna()
+    if kind == 'numeric':
+        values = pd.to_numeric(values, errors='coerce').dropna().to_numpy(dtype=np.float64)
+        if reference is not None:
+            edges = np.asarray(reference['edges'], dtype=np.float64)
+        elif len(values):
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, PROFILE_BINS + 1)[1:-1]))
+        else:
+            edges = np.array([])
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        return {'kind': kind, 'edges': edges.tolist(), 'counts': counts.tolist(), 'missing': missing}
+
+    values = values.astype(str)
+    if reference is not None:
+        categories = reference['categories']
+    else:
+        categories = values.value_counts().index[:PROFILE_TOP_CATEGORIES].tolist()
+    frequencies = values.value_counts()
+    counts = [int(frequencies.get(category, 0)) for category in categories]
+    return {
+        'kind': kind,
+        'categories': categories,
+        'counts': counts,
+        # Las categorías fuera de la lista se acumulan en una sola casilla
+        'other': int(len(values) - sum(counts)),
+        'missing': missing
+    }
+
+def build_profile(df, columns, reference=None):
+    """Perfil de distribución de las columnas; con una referencia se usan sus mismas casillas"""
+    return {
+        col: _profile_column(df[col], reference[col] if reference is not None else None)
+        for col in columns
+        if reference is None or col in reference
+    }
+
+def merge_profiles(reference, current):
+    """Suma los conteos de dos perfiles con las mismas casillas (perfil de todos los datos vistos)"""
+    merged = {}
+    for col, profile in reference.items():
+        merged[col] = dict(profile)
+        if col not in current:
+            continue
+        merged[col]['counts'] = (np.asarray(profile['counts']) + np.asarray(current[col]['counts'])).tolist()
+        merged[col]['missing'] = profile['missing'] + current[col]['missing']
+        if profile['kind'] == 'categorical':
+            merged[col]['other'] = profile['other'] + current[col]['other']
+    return merged
+
+def _proportions(profile):
+    counts = list(profile['counts']) + [profile['missing']]
+    if profile['kind'] == 'categorical':
+        counts.append(profile['other'])
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    return counts / total if total > 0 else counts
+
+def population_stability_index(expected, actual):
+    """PSI entre dos perfiles de una misma columna"""
+    expected = np.clip(_proportions(expected), PSI_EPSILON, None)
+    actual = np.clip(_proportions(actual), PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def drift_report(reference, current):
+    """PSI por columna, de mayor a menor deriva"""
+    rows = []
+    for col, profile in current.items():
+        value = population_stability_index(reference[col], profile)
+        level = "Estable" if value < PSI_MODERATE else "Moderada" if value < PSI_RETRAIN_THRESHOLD else "Alta"
+        rows.append({'Variable': col, 'PSI': value, 'Deriva': level})
+    return pd.DataFrame(rows, columns=['Variable', 'PSI', 'Deriva']).sort_values(
+        'PSI', ascending=False
+    ).reset_index(drop=True)
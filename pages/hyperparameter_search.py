@@ -0,0 +1,254 @@
+import os
+import json
+import math
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy.stats import loguniform, randint, uniform
+from sklearn.model_selection import ParameterSampler, train_test_split
+from sklearn.metrics import accuracy_score, r2_score
+from pages.model_registry import REGISTRY_DIR
+
+RANDOM_STATE = 42
+# Ensayos completados de cada búsqueda, para poder reanudarla si se interrumpe
+TRIALS_DIR = os.getenv('HYPERPARAMETER_TRIALS_DIR', os.path.join(REGISTRY_DIR, 'trials'))
+VALIDATION_SIZE = 0.2
+MIN_ROWS = 200
+MIN_ROUNDS = 10
+MAX_ROUNDS = int(os.getenv('SEARCH_XGBOOST_MAX_ROUNDS', '500'))
+
+# Espacios de búsqueda por modelo (los nombres coinciden con get_model; en las variantes
+# escalables se asignan al paso del pipeline que los define con resolve_params)
+SEARCH_SPACES = {
+    "Árbol de Decisión": {
+        'max_depth': [3, 5, 8, 12, 20, None],
+        'min_samples_leaf': randint(1, 50),
+        'min_samples_split': randint(2, 20)
+    },
+    "Random Forest": {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [5, 10, 20, None],
+        'max_features': ['sqrt', 'log2', 0.5, 1.0],
+        'min_samples_leaf': randint(1, 20)
+    },
+    "XGBoost": {
+        'learning_rate': loguniform(0.01, 0.3),
+        'max_depth': randint(3, 11),
+        'subsample': uniform(0.6, 0.4),
+        'colsample_bytree': uniform(0.5, 0.5),
+        'min_child_weight': loguniform(0.5, 20),
+        'reg_lambda': loguniform(0.1, 10)
+    },
+    "Regresión Logística": {
+        'C': loguniform(1e-3, 1e2),
+        'max_iter': [200, 500, 1000]
+    },
+    "Regresión Lineal": {
+        'fit_intercept': [True, False]
+    },
+    "SVM": {
+        'C': loguniform(1e-2, 1e2),
+        'gamma': loguniform(1e-4, 1e0)
+    },
+    "KNN": {
+        'n_neighbors': randint(2, 51),
+        'weights': ['uniform', 'distance'],
+        'p': [1, 2]
+    }
+}
+
+def get_resource_kind(model_name):
+    """Recurso que se asigna a cada ensayo: rondas de boosting para XGBoost y filas para el resto"""
+    return 'rounds' if model_name == "XGBoost" else 'rows'
+
+def _to_builtin(value):
+    """Convierte escalares de numpy a tipos de Python para guardarlos en JSON"""
+    return value.item() if hasattr(value, 'item') else value
+
+def sample_candidates(model_name, n_candidates, random_state=RANDOM_STATE):
+    """Muestrea las configuraciones candidatas del espacio de búsqueda"""
+    space = SEARCH_SPACES[model_name]
+    # Los espacios completamente discretos pueden tener menos combinaciones que candidatos pedidos
+    if all(isinstance(values, list) for values in space.values()):
+        n_candidates = min(n_candidates, math.prod(len(values) for values in space.values()))
+    candidates = []
+    for params in ParameterSampler(space, n_candidates, random_state=random_state):
+        params = {name: _to_builtin(value) for name, value in params.items()}
+        params_id = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        candidates.append((params_id, params))
+    return candidates
+
+def describe_space(space):
+    """Descripción estable de un espacio de búsqueda para incluirla en la clave.
+
+    El repr de las distribuciones de scipy incluye su dirección de memoria, que cambia en
+    cada proceso: se describen por su nombre y sus parámetros.
+    """
+    described = {}
+    for name, values in space.items():
+        if isinstance(values, list):
+            described[name] = values
+        else:
+            described[name] = [values.dist.name, list(values.args), sorted(values.kwds.items())]
+    return described
+
+def make_search_key(data_key, model_name, model_type, n_candidates, eta, variant="Estándar"):
+    """Clave de una búsqueda: los mismos datos y ajustes reanudan la misma búsqueda"""
+    payload = json.dumps({
+        'data': data_key,
+        'model': model_name,
+        'model_type': model_type,
+        'variant': variant,
+        'n_candidates': n_candidates,
+        'eta': eta,
+        'space': describe_space(SEARCH_SPACES[model_name])
+    }, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def load_trials(search_key):
+    """Carga los ensayos ya completados de una búsqueda"""
+    path = os.path.join(TRIALS_DIR, f"{search_key}.jsonl")
+    trials = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    trial = json.loads(line)
+                except ValueError:
+                    continue
+                trials[(trial['params_id'], trial['resource'])] = trial
+    return trials
+
+def save_trial(search_key, trial):
+    """Agrega un ensayo completado al almacén de la búsqueda"""
+    os.makedirs(TRIALS_DIR, exist_ok=True)
+    with open(os.path.join(TRIALS_DIR, f"{search_key}.jsonl"), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(trial, default=_to_builtin) + '\n')
+
+def resolve_params(model, params):
+    """Traduce los hiperparámetros del espacio a los nombres del modelo.
+
+    Las variantes escalables son pipelines (p. ej. Nystroem + SVM lineal o SVD + KNN): cada
+    hiperparámetro se asigna al paso que lo define ('gamma' -> 'nystroem__gamma',
+    'C' -> 'svm__estimator__C'). Los que no existen en la variante se omiten.
+    """
+    available = model.get_params()
+    resolved = {}
+    for name, value in params.items():
+        if name in available:
+            resolved[name] = value
+            continue
+        matches = sorted((key for key in available if key.endswith(f"__{name}")), key=len)
+        if matches:
+            resolved[matches[0]] = value
+    return resolved
+
+def run_trial(model, model_name, model_type, params_id, params, resource, X_fit, y_fit, X_val, y_val, row_order):
+    """Entrena una configuración con el recurso asignado y la evalúa en validación"""
+    start = time.perf_counter()
+    model.set_params(**resolve_params(model, params))
+    if get_resource_kind(model_name) == 'rounds':
+        model.set_params(n_estimators=resource)
+        model.fit(X_fit, y_fit)
+    else:
+        rows = row_order[:resource]
+        model.fit(X_fit[rows], y_fit[rows])
+    pred = model.predict(X_val)
+    score = accuracy_score(y_val, pred) if model_type == "Clasificación" else r2_score(y_val, pred)
+    return {
+        'params_id': params_id,
+        'params': params,
+        'resource': int(resource),
+        'score': float(score),
+        'time': time.perf_counter() - start
+    }
+
+def successive_halving(model_factory, model_name, model_type, X_train, y_train, search_key,
+                       n_candidates=27, eta=3, time_budget=120.0, n_jobs=-1, progress_callback=None):
+    """Búsqueda de hiperparámetros por successive halving bajo un presupuesto de tiempo"""
+    y_train = np.asarray(y_train)
+    if model_type == "Clasificación":
+        # Etiquetas 0..k-1: XGBoost no admite etiquetas de texto
+        y_train = pd.factorize(y_train, sort=True)[0]
+    stratify = y_train if model_type == "Clasificación" and np.bincount(y_train).min() >= 2 else None
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=VALIDATION_SIZE, random_state=RANDOM_STATE, stratify=stratify
+    )
+    row_order = np.random.default_rng(RANDOM_STATE).permutation(X_fit.shape[0])
+
+    candidates = sample_candidates(model_name, n_candidates)
+    n_rungs = max(1, int(math.floor(math.log(len(candidates), eta))) + 1)
+    if get_resource_kind(model_name) == 'rounds':
+        max_resource, min_floor = MAX_ROUNDS, MIN_ROUNDS
+    else:
+        max_resource, min_floor = X_fit.shape[0], min(MIN_ROWS, X_fit.shape[0])
+    resources = [
+        max(min_floor, int(max_resource / eta ** (n_rungs - 1 - rung)))
+        for rung in range(n_rungs)
+    ]
+
+    completed = load_trials(search_key)
+    resumed = len(completed)
+    start = time.perf_counter()
+    budget_exhausted = False
+    trials = []
+    survivors = candidates
+
+    for rung, resource in enumerate(resources):
+        pending = [(pid, params) for pid, params in survivors if (pid, resource) not in completed]
+        rung_trials = [completed[(pid, resource)] for pid, params in survivors if (pid, resource) in completed]
+
+        if pending:
+            if time.perf_counter() - start >= time_budget:
+                budget_exhausted = True
+                break
+            # Los ensayos se consumen a medida que terminan para respetar el presupuesto
+            results = Parallel(n_jobs=n_jobs, return_as='generator_unordered')(
+                delayed(run_trial)(
+                    model_factory(model_name), model_name, model_type, pid, params, resource,
+                    X_fit, y_fit, X_val, y_val, row_order
+                )
+                for pid, params in pending
+            )
+            for trial in results:
+                trial['rung'] = rung
+                save_trial(search_key, trial)
+                completed[(trial['params_id'], resource)] = trial
+                rung_trials.append(trial)
+                if progress_callback is not None:
+                    progress_callback(rung, len(rung_trials), len(survivors), resource)
+                if time.perf_counter() - start >= time_budget:
+                    budget_exhausted = True
+                    break
+            # Cancelar los ensayos pendientes si se agotó el presupuesto
+            results.close()
+            if budget_exhausted:
+                trials.extend(rung_trials)
+                break
+
+        trials.extend(rung_trials)
+        # Conservar la mejor fracción 1/eta para el siguiente escalón
+        ranked = sorted(rung_trials, key=lambda t: t['score'], reverse=True)
+        keep = max(1, len(ranked) // eta)
+        kept_ids = {t['params_id'] for t in ranked[:keep]}
+        survivors = [(pid, params) for pid, params in survivors if pid in kept_ids]
+
+    trials_df = pd.DataFrame(trials)
+    if trials_df.empty:
+        best = None
+    else:
+        # La mejor configuración es la de mejor puntuación en el mayor recurso evaluado
+        top_resource = trials_df['resource'].max()
+        best = trials_df[trials_df['resource'] == top_resource].sort_values('score', ascending=False).iloc[0]
+        best = {'params': best['params'], 'score': float(best['score']), 'resource': int(best['resource'])}
+
+    return {
+        'best': best,
+        'trials': trials_df,
+        'resources': resources,
+        'elapsed': time.perf_counter() - start,
+        'resumed_trials': resumed,
+        'completed': not budget_exhausted and len(trials) > 0
+    }
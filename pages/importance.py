@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from scipy import stats
+from sklearn.inspection import permutation_importance
+from sklearn.utils import resample
+from pages.preprocessing import make_inference_pipeline
+
+RANDOM_STATE = 42
+# Filas del conjunto de prueba usadas para evaluar las permutaciones y repeticiones por variable
+PERMUTATION_SAMPLE_SIZE = int(os.getenv('PERMUTATION_SAMPLE_SIZE', '2000'))
+PERMUTATION_REPEATS = int(os.getenv('PERMUTATION_REPEATS', '5'))
+CONFIDENCE_LEVEL = 0.95
+
+def get_importance_settings(sample_size=None, n_repeats=None):
+    """Ajustes de la importancia por permutación (se guardan junto al resultado)"""
+    return {
+        'sample_size': int(sample_size or PERMUTATION_SAMPLE_SIZE),
+        'n_repeats': int(n_repeats or PERMUTATION_REPEATS),
+        'confidence_level': CONFIDENCE_LEVEL,
+        'random_state': RANDOM_STATE
+    }
+
+def _subsample(X, y, sample_size, model_type):
+    """Submuestra de evaluación (estratificada en clasificación cuando es posible)"""
+    if len(X) <= sample_size:
+        return X, y
+    stratify = None
+    if model_type == "Clasificación":
+        counts = pd.Series(np.asarray(y)).value_counts()
+        if counts.min() >= 2:
+            stratify = y
+    return resample(
+        X, y, n_samples=sample_size, replace=False, stratify=stratify, random_state=RANDOM_STATE
+    )
+
+def compute_permutation_importance(model, preprocessor, model_type, X_test, y_test, settings, n_jobs=-1):
+    """Importancia por permutación de las variables originales, válida para cualquier modelo.
+
+    Permuta las columnas antes del preprocesamiento, de modo que las variables categóricas
+    codificadas en varias columnas se evalúan como una sola. Las variables se reparten entre
+    los núcleos disponibles.
+    """
+    X_eval, y_eval = _subsample(X_test, y_test, settings['sample_size'], model_type)
+    pipeline = make_inference_pipeline(preprocessor, model)
+    scoring = 'accuracy' if model_type == "Clasificación" else 'r2'
+    permutation = permutation_importance(
+        pipeline, X_eval, y_eval,
+        scoring=scoring,
+        n_repeats=settings['n_repeats'],
+        n_jobs=n_jobs,
+        random_state=settings['random_state']
+    )
+
+    n_repeats = permutation.importances.shape[1]
+    # Intervalo de confianza de la media con la distribución t de Student
+    if n_repeats > 1:
+        t_value = stats.t.ppf((1 + settings['confidence_level']) / 2, n_repeats - 1)
+        margin = t_value * permutation.importances_std / np.sqrt(n_repeats)
+    else:
+        margin = np.zeros_like(permutation.importances_mean)
+
+    return pd.DataFrame({
+        'Característica': list(X_eval.columns),
+        'Importancia': permutation.importances_mean,
+        'Desviación': permutation.importances_std,
+        'IC inferior': permutation.importances_mean - margin,
+        'IC superior': permutation.importances_mean + margin
+    }).sort_values('Importancia', ascending=False).reset_index(drop=True)
+
+def has_importance(result, settings):
+    """Indica si el resultado ya guarda una importancia calculada con los mismos ajustes"""
+    cached = result.get('permutation_importance')
+    return cached is not None and cached['settings'] == settings
+
+def plot_permutation_importance(importance_df, model_name, confidence_level=CONFIDENCE_LEVEL):
+    """Gráfica de importancia por permutación con sus intervalos de confianza"""
+    importance_df = importance_df.sort_values('Importancia')
+    fig = go.Figure(go.Bar(
+        x=importance_df['Importancia'],
+        y=importance_df['Característica'],
+        orientation='h',
+        error_x=dict(
+            type='data',
+            symmetric=False,
+            array=importance_df['IC superior'] - importance_df['Importancia'],
+            arrayminus=importance_df['Importancia'] - importance_df['IC inferior']
+        )
+    ))
+    fig.update_layout(
+        title=f'Importancia por Permutación - {model_name} (IC {confidence_level:.0%})',
+        xaxis_title='Caída de la métrica al permutar',
+        yaxis_title='Característica',
+        showlegend=False
+    )
+    return fig
@@ -0,0 +1,312 @@
+import os
+import copy
+import numpy as np
+import pandas as pd
+import streamlit as st
+import xgboost as xgb
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.model_selection import train_test_split
+from pages.utils import load_rows_since, get_table_version, count_table_rows
+from pages.model_registry import make_registry_key, load_entry, save_entry, list_entries
+from pages.out_of_core import BoosterModel, get_booster_params
+from pages.metrics import evaluate_predictions
+from pages.drift import build_profile, merge_profiles, drift_report, PSI_RETRAIN_THRESHOLD
+from pages.profiling import profile_call, get_model_size_bytes, record_run
+
+# Árboles añadidos en cada actualización incremental (XGBoost y Random Forest)
+INCREMENTAL_BOOST_ROUNDS = int(os.getenv('INCREMENTAL_BOOST_ROUNDS', '20'))
+INCREMENTAL_FOREST_TREES = int(os.getenv('INCREMENTAL_FOREST_TREES', '20'))
+# Caída de la puntuación a partir de la cual se recomienda un reentrenamiento completo
+SCORE_DROP_TOLERANCE = float(os.getenv('SCORE_DROP_TOLERANCE', '0.05'))
+HOLDOUT_SIZE = 0.2
+RANDOM_STATE = 42
+
+def parse_table_version(version):
+    """Descompone la versión de una tabla en (identidad, inserciones, actualizaciones, eliminaciones).
+
+    La identidad (OID y token de seguimiento) cambia si la tabla se recrea. Las versiones
+    basadas en una suma de comprobación no se pueden descomponer y retornan None.
+    """
+    try:
+        oid, token, inserted, updated, deleted = str(version).split('-')
+        return f"{oid}-{token}", int(inserted), int(updated), int(deleted)
+    except (TypeError, ValueError):
+        return None
+
+def check_appended(recorded_version, current_version):
+    """Indica si la tabla solo ha recibido filas nuevas desde la versión registrada.
+
+    La actualización incremental solo es válida si la tabla no se ha recreado (mismo OID)
+    ni se han modificado o eliminado filas: en ese caso las filas nuevas son exactamente
+    las que siguen a las ya usadas en el entrenamiento.
+    """
+    recorded = parse_table_version(recorded_version)
+    current = parse_table_version(current_version)
+    if recorded is None or current is None:
+        return False, "No se pudo determinar la versión de la tabla."
+    if current[0] != recorded[0]:
+        return False, "La tabla se ha recreado desde el entrenamiento."
+    if current[2:] != recorded[2:]:
+        return False, "Se han actualizado o eliminado filas desde el entrenamiento."
+    if current[1] <= recorded[1]:
+        return False, "No hay filas nuevas desde el entrenamiento."
+    return True, f"{current[1] - recorded[1]:,} inserciones desde el entrenamiento."
+
+def supports_incremental(model):
+    """Indica si el modelo puede actualizarse con filas nuevas sin reentrenar desde cero"""
+    return isinstance(model, (
+        xgb.XGBModel, BoosterModel, RandomForestClassifier, RandomForestRegressor, SGDClassifier, SGDRegressor
+    ))
+
+def _check_classes(model, y):
+    """Las filas nuevas no pueden traer clases desconocidas para el modelo"""
+    unseen = set(pd.unique(y)) - set(model.classes_)
+    if unseen:
+        raise ValueError(
+            f"Las filas nuevas contienen clases desconocidas ({', '.join(map(str, unseen))}); "
+            "se requiere un reentrenamiento completo."
+        )
+
+def update_model(model, model_type, X, y):
+    """Actualiza una copia del modelo con las filas nuevas ya preprocesadas.
+
+    XGBoost continúa el boosting desde el booster existente, Random Forest añade árboles
+    con warm_start y los modelos SGD siguen con partial_fit.
+    """
+    if not supports_incremental(model):
+        raise ValueError(
+            f"{type(model).__name__} no admite actualización incremental; se requiere un reentrenamiento completo."
+        )
+    y = np.asarray(y)
+    if model_type == "Clasificación":
+        _check_classes(model, y)
+
+    if isinstance(model, BoosterModel):
+        labels = pd.Categorical(y, categories=model.classes_).codes if model.classes_ is not None else y
+        booster = xgb.train(
+            get_booster_params(model_type, model.classes_), xgb.DMatrix(X, label=labels),
+            num_boost_round=INCREMENTAL_BOOST_ROUNDS, xgb_model=model.booster
+        )
+        return BoosterModel(booster, model.classes_), f"XGBoost: +{INCREMENTAL_BOOST_ROUNDS} rondas de boosting"
+
+    if isinstance(model, xgb.XGBModel):
+        if model_type == "Clasificación" and len(np.unique(y)) != len(model.classes_):
+            # El clasificador recalcula el número de clases con las etiquetas recibidas
+            raise ValueError("Las filas nuevas no contienen todas las clases; se requiere un reentrenamiento completo.")
+        updated = copy.deepcopy(model)
+        updated.set_params(n_estimators=INCREMENTAL_BOOST_ROUNDS)
+        updated.fit(X, y, xgb_model=model.get_booster())
+        return updated, f"XGBoost: +{INCREMENTAL_BOOST_ROUNDS} rondas de boosting"
+
+    if isinstance(model, (RandomForestClassifier, RandomForestRegressor)):
+        if model_type == "Clasificación" and len(np.unique(y)) != len(model.classes_):
+            # Los árboles nuevos deben conocer las mismas clases que los existentes
+            raise ValueError("Las filas nuevas no contienen todas las clases; se requiere un reentrenamiento completo.")
+        updated = copy.deepcopy(model)
+        updated.set_params(warm_start=True, n_estimators=model.n_estimators + INCREMENTAL_FOREST_TREES)
+        updated.fit(X, y)
+        return updated, f"Random Forest: +{INCREMENTAL_FOREST_TREES} árboles (warm_start)"
+
+    updated = copy.deepcopy(model)
+    updated.partial_fit(X, y)
+    return updated, "SGD: partial_fit"
+
+def _score(model, preprocessor, model_type, X, y):
+    pred = model.predict(preprocessor.transform(X))
+    metrics = evaluate_predictions(model_type, y, pred)
+    return metrics['accuracy'] if model_type == "Clasificación" else metrics['r2']
+
+def refresh_model(key, table_name):
+    """Actualiza un modelo del registro con las filas añadidas a su tabla desde el entrenamiento.
+
+    Solo se leen las filas nuevas; una parte se reserva para comparar el modelo antes y
+    después de la actualización. El modelo actualizado se guarda como una entrada nueva.
+    """
+    entry = load_entry(key)
+    if entry is None:
+        raise ValueError("El modelo ya no está en el registro.")
+    metadata = entry['metadata']
+    model, preprocessor = entry['model'], entry['preprocessor']
+    model_type = metadata['model_type']
+    target_column = metadata['target_column']
+    feature_columns = list(metadata['feature_columns'])
+    if metadata.get('n_rows') is None or preprocessor is None:
+        raise ValueError("El modelo se guardó sin el número de filas de entrenamiento; reentrénalo una vez.")
+
+    table_version = get_table_version(table_name)
+    valid, message = check_appended(metadata.get('table_version'), table_version)
+    if not valid:
+        raise ValueError(f"{message} Se requiere un reentrenamiento completo.")
+
+    new_rows = load_rows_since(table_name, metadata['n_rows'], feature_columns + [target_column])
+    if new_rows is None:
+        raise ValueError("No se pudieron leer las filas nuevas.")
+    labeled = new_rows[new_rows[target_column].notna()]
+    if len(labeled) < 2:
+        raise ValueError("No hay suficientes filas nuevas con la variable objetivo.")
+    X_fit, X_holdout, y_fit, y_holdout = train_test_split(
+        labeled[feature_columns], labeled[target_column], test_size=HOLDOUT_SIZE, random_state=RANDOM_STATE
+    )
+
+    # Deriva de las filas nuevas frente a los datos con los que se entrenó el modelo
+    reference = metadata.get('data_profile')
+    new_profile = build_profile(labeled, feature_columns + [target_column], reference) if reference else None
+    drift_before = drift_report(reference, new_profile) if reference else None
+
+    timings = {}
+    score_before = _score(model, preprocessor, model_type, X_holdout, y_holdout)
+    with profile_call(timings, 'fit'):
+        updated, method = update_model(model, model_type, preprocessor.transform(X_fit), y_fit)
+    with profile_call(timings, 'predict'):
+        X_holdout_matrix = preprocessor.transform(X_holdout)
+        pred = updated.predict(X_holdout_matrix)
+    proba = None
+    if model_type == "Clasificación" and hasattr(updated, 'predict_proba'):
+        proba = updated.predict_proba(X_holdout_matrix)
+    metrics = evaluate_predictions(model_type, y_holdout, pred, proba, getattr(updated, 'classes_', None))
+    score_after = metrics['accuracy'] if model_type == "Clasificación" else metrics['r2']
+    timings['model_size_bytes'] = get_model_size_bytes(updated)
+    timings['predict_latency_per_row'] = timings['predict_time'] / max(len(y_holdout), 1)
+
+    # Tras la actualización, la referencia pasa a ser el conjunto de todos los datos vistos
+    merged_profile = merge_profiles(reference, new_profile) if reference else None
+    drift_after = drift_report(merged_profile, new_profile) if reference else None
+
+    max_psi = float(drift_before['PSI'].max()) if drift_before is not None and len(drift_before) else 0.0
+    original_score = entry['result']['score']
+    reasons = []
+    if max_psi > PSI_RETRAIN_THRESHOLD:
+        reasons.append(f"deriva alta (PSI máximo {max_psi:.3f} > {PSI_RETRAIN_THRESHOLD})")
+    if score_after < original_score - SCORE_DROP_TOLERANCE:
+        reasons.append(f"la puntuación cae de {original_score:.4f} a {score_after:.4f}")
+
+    result = {
+        'score': score_after,
+        'report': metrics['report'] if model_type == "Clasificación" else f"MSE: {metrics['mse']:.4f}",
+        'predictions': pred,
+        'pred_proba': proba,
+        'metrics': metrics,
+        'variant': f"Actualización incremental ({method})"
+    }
+    new_key = make_registry_key(table_version, target_column, feature_columns, metadata['model_name'], {
+        'incremental_from': key,
+        'boost_rounds': INCREMENTAL_BOOST_ROUNDS,
+        'forest_trees': INCREMENTAL_FOREST_TREES
+    })
+    parent_metadata = {k: v for k, v in metadata.items() if k not in ('key', 'created_at', 'size_bytes')}
+    save_entry(new_key, updated, result, timings, metadata=dict(
+        parent_metadata,
+        table_version=table_version,
+        n_rows=metadata['n_rows'] + len(new_rows),
+        data_profile=merged_profile,
+        parent_key=key,
+        incremental_updates=metadata.get('incremental_updates', 0) + 1,
+        permutation_importance=None
+    ), preprocessor=preprocessor)
+    record_run({
+        'model_name': metadata['model_name'],
+        'model_type': model_type,
+        'variant': "Actualización incremental",
+        'table_name': table_name,
+        'target_column': target_column,
+        'n_features': len(feature_columns),
+        'n_train': len(y_fit),
+        'n_test': len(y_holdout),
+        'score': score_after
+    }, timings)
+
+    return {
+        'key': new_key,
+        'method': method,
+        'n_new_rows': len(new_rows),
+        'n_fit': len(y_fit),
+        'n_holdout': len(y_holdout),
+        'original_score': original_score,
+        'score_before': score_before,
+        'score_after': score_after,
+        'drift_before': drift_before,
+        'drift_after': drift_after,
+        'timings': timings,
+        'retrain_reasons': reasons
+    }
+
+def show_incremental_refresh(selected_table):
+    """Interfaz para actualizar los modelos del registro con las filas nuevas de la tabla"""
+    entries = [
+        m for m in list_entries()
+        if m.get('table_name') == selected_table and m.get('n_rows') is not None
+    ]
+    if not entries:
+        st.info(
+            "No hay modelos registrados para esta tabla con el número de filas de entrenamiento. "
+            "Entrena un modelo primero y añade filas a la tabla desde 'Cargar Datos'."
+        )
+        return
+
+    labels = {
+        f"{m.get('model_name')} → {m.get('target_column')} "
+        f"({m.get('n_rows'):,} filas, {m['key'][:8]})": m
+        for m in entries
+    }
+    metadata = labels[st.selectbox("Modelo a actualizar", list(labels))]
+
+    table_version = get_table_version(selected_table)
+    valid, message = check_appended(metadata.get('table_version'), table_version)
+    current_rows = count_table_rows(selected_table)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Filas al entrenar", f"{metadata['n_rows']:,}")
+    with col2:
+        st.metric(
+            "Filas actuales", f"{current_rows:,}" if current_rows is not None else "-",
+            delta=f"{current_rows - metadata['n_rows']:,}" if current_rows is not None else None
+        )
+    if not valid:
+        st.warning(f"{message} La actualización incremental no es posible.")
+        return
+    st.caption(message)
+
+    if not st.button("Actualizar modelo con las filas nuevas", key="incremental_refresh"):
+        return
+    try:
+        with st.spinner("Leyendo las filas nuevas y actualizando el modelo..."):
+            report = refresh_model(metadata['key'], selected_table)
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    metric_name = "Precisión" if metadata['model_type'] == "Clasificación" else "R²"
+    st.success(f"Modelo actualizado ({report['method']}) y guardado con la clave {report['key']}")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric(f"{metric_name} original (prueba)", f"{report['original_score']:.4f}")
+    with col2:
+        st.metric(f"{metric_name} en filas nuevas, antes", f"{report['score_before']:.4f}")
+    with col3:
+        st.metric(
+            f"{metric_name} en filas nuevas, después", f"{report['score_after']:.4f}",
+            delta=f"{report['score_after'] - report['score_before']:+.4f}"
+        )
+    st.caption(
+        f"{report['n_new_rows']:,} filas nuevas · {report['n_fit']:,} para actualizar · "
+        f"{report['n_holdout']:,} reservadas · Actualización: {report['timings']['fit_time']:.3f} s"
+    )
+
+    if report['drift_before'] is not None:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Deriva antes de actualizar")
+            st.caption("Filas nuevas frente a los datos de entrenamiento")
+            st.dataframe(report['drift_before'], use_container_width=True)
+        with col2:
+            st.subheader("Deriva después de actualizar")
+            st.caption("Filas nuevas frente a todos los datos vistos por el modelo")
+            st.dataframe(report['drift_after'], use_container_width=True)
+    else:
+        st.info("El modelo no tiene perfil de datos de referencia: no se puede medir la deriva.")
+
+    if report['retrain_reasons']:
+        st.warning("🔁 Se recomienda un reentrenamiento completo: " + "; ".join(report['retrain_reasons']) + ".")
+    else:
+        st.info("✅ La actualización incremental es suficiente por ahora.")
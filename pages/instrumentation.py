@@ -0,0 +1,267 @@
+import os
+import time
+import inspect
+import functools
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import streamlit as st
+
+# Puerto del endpoint /metrics en formato de texto de Prometheus (0 = desactivado)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# Archivo donde se escriben las métricas periódicamente (p. ej. para el textfile collector)
+METRICS_FILE = os.getenv('METRICS_FILE')
+METRICS_FILE_INTERVAL = float(os.getenv('METRICS_FILE_INTERVAL', '15'))
+# Panel lateral con las operaciones más lentas de la ejecución actual
+SHOW_DEBUG_PANEL = os.getenv('SHOW_DEBUG_PANEL', '0') == '1'
+DEBUG_PANEL_ROWS = 15
+# Filas con las que se estiman los bytes de las columnas de texto de cada resultado
+DATA_SIZE_SAMPLE_ROWS = 1000
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Tipo y descripción de cada métrica exportada
+METRICS = OrderedDict([
+    ('app_db_call_seconds', ('histogram', 'Duración de las funciones de base de datos de pages.utils')),
+    ('app_db_rows_total', ('counter', 'Filas leídas o escritas por las funciones de base de datos')),
+    ('app_db_bytes_total', ('counter', 'Bytes en memoria de los datos leídos o escritos (aproximación de lo transferido)')),
+    ('app_page_render_seconds', ('histogram', 'Duración de show() por página')),
+    ('app_cache_requests_total', ('counter', 'Consultas a las cachés de la aplicación por resultado')),
+    ('app_training_seconds', ('histogram', 'Duración del entrenamiento por modelo'))
+])
+
+_counters = {}
+_histograms = {}
+_metrics_lock = threading.Lock()
+# Operaciones medidas en la ejecución actual del script (cada sesión ejecuta en su propio hilo)
+_rerun = threading.local()
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def inc(metric, value=1, **labels):
+    """Suma `value` a un contador"""
+    key = (metric, _label_key(labels))
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(metric, seconds, **labels):
+    """Registra una duración en un histograma"""
+    key = (metric, _label_key(labels))
+    with _metrics_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+def get_observation_count(metric, **labels):
+    """Número de observaciones registradas en un histograma"""
+    with _metrics_lock:
+        histogram = _histograms.get((metric, _label_key(labels)))
+        return histogram['count'] if histogram is not None else 0
+
+def record_cache(cache, hit):
+    """Cuenta un acierto o un fallo de una caché"""
+    inc('app_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+def start_rerun():
+    """Empieza a registrar las operaciones de una nueva ejecución del script"""
+    _rerun.operations = []
+
+def _record_operation(kind, name, seconds, rows=None):
+    operations = getattr(_rerun, 'operations', None)
+    if operations is not None:
+        operations.append({'Tipo': kind, 'Operación': name, 'Tiempo (s)': seconds, 'Filas': rows})
+
+@contextmanager
+def timed(metric, kind, name, **labels):
+    """Mide un bloque de código en un histograma y en las operaciones de la ejecución actual"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(metric, elapsed, **labels)
+        _record_operation(kind, name, elapsed)
+
+def _data_size(data):
+    """Filas y bytes de un resultado o de los datos escritos.
+
+    Los bytes de las columnas de texto se extrapolan de una muestra de filas: medirlos en
+    todas (deep=True) recorre cada valor y añadiría a cada consulta un coste O(n).
+    """
+    if isinstance(data, pd.DataFrame):
+        nbytes = int(data.memory_usage(deep=False).sum())
+        object_columns = data.select_dtypes(include='object').columns
+        if len(object_columns) and len(data):
+            sample = data[object_columns].iloc[::max(1, len(data) // DATA_SIZE_SAMPLE_ROWS)]
+            # Sin deep, cada valor de texto cuenta solo como un puntero
+            extra = sample.memory_usage(deep=True, index=False).sum() - sample.memory_usage(deep=False, index=False).sum()
+            nbytes += int(extra * len(data) / len(sample))
+        return len(data), nbytes
+    if isinstance(data, list):
+        return len(data), 0
+    return 0, 0
+
+def _record_db_call(name, elapsed, rows, nbytes):
+    observe('app_db_call_seconds', elapsed, function=name)
+    if rows:
+        inc('app_db_rows_total', rows, function=name)
+    if nbytes:
+        inc('app_db_bytes_total', nbytes, function=name)
+    _record_operation("Base de datos", name, elapsed, rows)
+
+def instrument_db(fn=None, *, writes=False):
+    """Decorador para las funciones de base de datos: tiempo, filas y bytes.
+
+    Con writes=True las filas y los bytes se toman del DataFrame recibido como argumento.
+    Los generadores (lectura por bloques) se miden hasta que se consumen.
+    """
+    if fn is None:
+        return functools.partial(instrument_db, writes=writes)
+    name = fn.__name__
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            rows = nbytes = 0
+            try:
+                for chunk in fn(*args, **kwargs):
+                    chunk_rows, chunk_bytes = _data_size(chunk)
+                    rows += chunk_rows
+                    nbytes += chunk_bytes
+                    yield chunk
+            finally:
+                _record_db_call(name, time.perf_counter() - start, rows, nbytes)
+        return wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        finally:
+            if writes:
+                data = next((arg for arg in list(args) + list(kwargs.values()) if isinstance(arg, pd.DataFrame)), None)
+            else:
+                data = result
+            _record_db_call(name, time.perf_counter() - start, *_data_size(data))
+    return wrapper
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def render_metrics():
+    """Métricas del proceso en el formato de texto de Prometheus (versión 0.0.4)"""
+    with _metrics_lock:
+        counters = dict(_counters)
+        histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in _histograms.items()}
+    lines = []
+    for metric, (kind, description) in METRICS.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {kind}")
+        if kind == 'counter':
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+            continue
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name != metric:
+                continue
+            for bound, count in zip(LATENCY_BUCKETS, histogram['buckets']):
+                lines.append(f"{metric}_bucket{_format_labels(labels, [('le', repr(bound))])} {count}")
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+def write_metrics_file(path=METRICS_FILE):
+    """Escribe las métricas de forma atómica (un lector nunca ve el archivo a medias)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render_metrics())
+    os.replace(tmp_path, path)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _write_metrics_periodically():
+    while True:
+        time.sleep(METRICS_FILE_INTERVAL)
+        try:
+            write_metrics_file()
+        except OSError:
+            continue
+
+@st.cache_resource
+def start_metrics_exporter():
+    """Inicia, una vez por proceso del servidor, el endpoint HTTP y la escritura del archivo"""
+    exporters = {}
+    if METRICS_PORT:
+        server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metricas-http", daemon=True).start()
+        exporters['http'] = f"http://{METRICS_HOST}:{METRICS_PORT}/metrics"
+    if METRICS_FILE:
+        threading.Thread(target=_write_metrics_periodically, name="metricas-archivo", daemon=True).start()
+        exporters['file'] = METRICS_FILE
+    return exporters
+
+def get_rerun_operations():
+    """Operaciones de la ejecución actual, de la más lenta a la más rápida"""
+    operations = getattr(_rerun, 'operations', None) or []
+    if not operations:
+        return pd.DataFrame(columns=['Tipo', 'Operación', 'Tiempo (s)', 'Filas'])
+    return pd.DataFrame(operations).sort_values('Tiempo (s)', ascending=False).reset_index(drop=True)
+
+def get_cache_hit_rates():
+    """Tasa de aciertos de cada caché desde el inicio del proceso"""
+    with _metrics_lock:
+        counters = {key: value for key, value in _counters.items() if key[0] == 'app_cache_requests_total'}
+    caches = {}
+    for (_, labels), value in counters.items():
+        labels = dict(labels)
+        caches.setdefault(labels['cache'], {'hit': 0, 'miss': 0})[labels['result']] += value
+    return {cache: counts['hit'] / (counts['hit'] + counts['miss']) for cache, counts in caches.items()}
+
+def show_debug_panel():
+    """Panel lateral con las operaciones más lentas de esta ejecución y las tasas de acierto"""
+    with st.sidebar.expander("🐞 Depuración"):
+        operations = get_rerun_operations()
+        st.caption(
+            f"{len(operations)} operaciones medidas · "
+            f"{operations[operations['Tipo'] == 'Base de datos']['Tiempo (s)'].sum():.3f} s en base de datos"
+        )
+        st.dataframe(operations.head(DEBUG_PANEL_ROWS), use_container_width=True, hide_index=True)
+        hit_rates = get_cache_hit_rates()
+        if hit_rates:
+            st.caption(" · ".join(f"{cache}: {rate:.0%} aciertos" for cache, rate in sorted(hit_rates.items())))
@@ -0,0 +1,201 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+
+# Número máximo de trabajos pesados que se ejecutan a la vez en el servidor
+MAX_CONCURRENT_JOBS = int(os.getenv('MAX_TRAINING_JOBS', str(max(1, (os.cpu_count() or 2) // 2))))
+# Trabajos terminados que se conservan para consultar su estado (el resultado lo recoge la sesión)
+MAX_FINISHED_JOBS = int(os.getenv('MAX_FINISHED_JOBS', '50'))
+
+QUEUED = "En cola"
+RUNNING = "Ejecutando"
+DONE = "Completado"
+CANCELLED = "Cancelado"
+FAILED = "Error"
+FINISHED_STATES = (DONE, CANCELLED, FAILED)
+
+class Job:
+    """Trabajo en segundo plano con progreso por tarea y cancelación cooperativa"""
+
+    def __init__(self, title, owner, tasks):
+        self.id = uuid.uuid4().hex[:12]
+        self.title = title
+        self.owner = owner
+        self.status = QUEUED
+        self.tasks = {task: QUEUED for task in tasks}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def set_task_status(self, task, status):
+        with self._lock:
+            self.tasks[task] = status
+
+    def get_tasks(self):
+        with self._lock:
+            return dict(self.tasks)
+
+    def take_result(self):
+        """Entrega el resultado a la sesión que lo recoge y deja de conservarlo en el trabajo.
+
+        El trabajo terminado sigue en el gestor (hasta MAX_FINISHED_JOBS) para mostrar su
+        estado, pero sus modelos y datos de prueba ya no quedan retenidos fuera de la sesión.
+        """
+        with self._lock:
+            result, self.result = self.result, None
+        return result
+
+    def cancel(self):
+        """Solicita la cancelación: las tareas en curso terminan y las pendientes no se inician"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def progress(self):
+        with self._lock:
+            if not self.tasks:
+                return 1.0 if self.status in FINISHED_STATES else 0.0
+            finished = sum(1 for status in self.tasks.values() if status in FINISHED_STATES)
+            return finished / len(self.tasks)
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+class JobManager:
+    """Cola de trabajos compartida por todas las sesiones del servidor"""
+
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='trabajo')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, title, owner, tasks, fn, *args, **kwargs):
+        """Encola un trabajo; fn recibe el Job como primer argumento y retorna su resultado"""
+        job = Job(title, owner, tasks)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        if job.is_cancelled():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            for task, status in job.tasks.items():
+                if status not in FINISHED_STATES:
+                    job.set_task_status(task, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = CANCELLED if job.is_cancelled() else DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        """Descarta los trabajos terminados más antiguos"""
+        finished = sorted(
+            (job for job in self._jobs.values() if job.status in FINISHED_STATES),
+            key=lambda job: job.finished_at or 0
+        )
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def list_jobs(self, owner=None):
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if owner is None or job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    def queue_position(self, job_id):
+        """Número de trabajos en cola por delante del indicado"""
+        jobs = self.list_jobs()
+        queued = [job.id for job in jobs if job.status == QUEUED]
+        return queued.index(job_id) if job_id in queued else 0
+
+    def running_count(self):
+        return sum(1 for job in self.list_jobs() if job.status == RUNNING)
+
+@st.cache_resource
+def get_job_manager():
+    """Gestor de trabajos único por proceso del servidor"""
+    return JobManager()
+
+def get_session_id():
+    """Identificador estable de la sesión del usuario"""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+def show_job_status(job_id, key_prefix="job"):
+    """Muestra el estado de un trabajo con progreso por tarea y opción de cancelarlo"""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        return None
+
+    st.subheader(f"⚙️ {job.title}")
+    if job.status == QUEUED:
+        st.info(
+            f"En cola: {manager.queue_position(job.id)} trabajos por delante "
+            f"({manager.running_count()}/{manager.max_workers} en ejecución en el servidor)"
+        )
+    st.progress(job.progress)
+    st.caption(f"Estado: {job.status} · Tiempo: {job.elapsed:.1f} s")
+    st.dataframe(
+        [{'Tarea': task, 'Estado': status} for task, status in job.get_tasks().items()],
+        use_container_width=True
+    )
+    if job.status == FAILED:
+        st.error(f"El trabajo falló: {job.error}")
+    if job.status not in FINISHED_STATES:
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("⏹️ Cancelar", key=f"{key_prefix}_cancel_{job.id}"):
+                job.cancel()
+                st.warning("Cancelación solicitada: el modelo en curso terminará antes de detenerse.")
+        with col2:
+            st.button("🔄 Actualizar estado", key=f"{key_prefix}_refresh_{job.id}")
+    return job
+
+def watch_job(job_id, key_prefix="job", interval=2):
+    """Muestra el estado del trabajo y lo refresca periódicamente hasta que termine"""
+    job = get_job_manager().get(job_id)
+    if job is None or job.status in FINISHED_STATES or not hasattr(st, 'fragment'):
+        return show_job_status(job_id, key_prefix)
+
+    @st.fragment(run_every=interval)
+    def _status_fragment():
+        current = show_job_status(job_id, key_prefix)
+        # Al terminar se vuelve a ejecutar la página completa para mostrar los resultados
+        if current is not None and current.status in FINISHED_STATES:
+            st.rerun()
+
+    _status_fragment()
+    return job
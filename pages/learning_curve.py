@@ -0,0 +1,139 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, r2_score
+from pages.profiling import profile_call
+
+RANDOM_STATE = 42
+# Muestra inicial, factor de crecimiento y mejora mínima para seguir aumentando la muestra
+ADAPTIVE_INITIAL_ROWS = int(os.getenv('ADAPTIVE_INITIAL_ROWS', '2000'))
+ADAPTIVE_GROWTH_FACTOR = float(os.getenv('ADAPTIVE_GROWTH_FACTOR', '2'))
+ADAPTIVE_TOLERANCE = float(os.getenv('ADAPTIVE_TOLERANCE', '0.005'))
+# Pasos seguidos sin superar la mejor puntuación en la mejora mínima antes de detenerse
+ADAPTIVE_PATIENCE = int(os.getenv('ADAPTIVE_PATIENCE', '2'))
+VALIDATION_SIZE = 0.1
+REGRESSION_STRATA = 10
+
+def get_sampling_settings(initial_rows=None, growth_factor=None, tolerance=None):
+    """Ajustes del muestreo adaptativo (forman parte de la clave del registro)"""
+    return {
+        'initial_rows': int(initial_rows or ADAPTIVE_INITIAL_ROWS),
+        'growth_factor': float(growth_factor or ADAPTIVE_GROWTH_FACTOR),
+        'tolerance': float(ADAPTIVE_TOLERANCE if tolerance is None else tolerance),
+        'patience': ADAPTIVE_PATIENCE,
+        'random_state': RANDOM_STATE
+    }
+
+def _strata(y, model_type):
+    """Estratos del muestreo: las clases o, en regresión, cuantiles de la variable objetivo"""
+    y = pd.Series(np.asarray(y))
+    if model_type == "Clasificación":
+        return pd.factorize(y)[0]
+    return pd.qcut(y.rank(method='first'), q=min(REGRESSION_STRATA, len(y)), labels=False).to_numpy()
+
+def stratified_order(y, model_type, random_state=RANDOM_STATE):
+    """Orden de las filas tal que cualquier prefijo es una muestra estratificada.
+
+    Cada fila recibe su posición relativa dentro de su estrato, tras permutarlo al azar;
+    ordenar por esa posición intercala los estratos en proporción a su tamaño, de modo
+    que las muestras crecientes quedan anidadas.
+    """
+    strata = _strata(y, model_type)
+    rng = np.random.default_rng(random_state)
+    keys = np.empty(len(strata))
+    for stratum in np.unique(strata):
+        rows = np.flatnonzero(strata == stratum)
+        keys[rng.permutation(rows)] = (np.arange(len(rows)) + rng.random(len(rows))) / len(rows)
+    return np.argsort(keys, kind='stable')
+
+def get_sample_sizes(n_rows, initial_rows, growth_factor):
+    """Tamaños de muestra crecientes en progresión geométrica hasta el total de filas"""
+    sizes = []
+    size = min(initial_rows, n_rows)
+    while size < n_rows:
+        sizes.append(int(size))
+        size *= growth_factor
+    sizes.append(n_rows)
+    return sizes
+
+def _score(model_type, y_true, y_pred):
+    return accuracy_score(y_true, y_pred) if model_type == "Clasificación" else r2_score(y_true, y_pred)
+
+def _take(X, rows):
+    return X.iloc[rows] if hasattr(X, 'iloc') else X[rows]
+
+def estimate_fit_time(sizes, fit_times, n_rows):
+    """Extrapola el tiempo de entrenamiento al total de filas con un ajuste potencial (log-log)"""
+    sizes = np.asarray(sizes, dtype=float)
+    fit_times = np.maximum(np.asarray(fit_times, dtype=float), 1e-6)
+    slope = 1.0
+    if len(sizes) >= 2:
+        slope = float(np.clip(np.polyfit(np.log(sizes), np.log(fit_times), 1)[0], 0.5, 2.0))
+    # Se ancla en la mayor muestra medida, la más representativa del coste a escala completa
+    return float(fit_times[-1] * (n_rows / sizes[-1]) ** slope)
+
+def adaptive_sample_size(model, model_type, X_train, y_train, settings):
+    """Curva de aprendizaje con muestras estratificadas crecientes y parada por meseta.
+
+    Retorna el orden estratificado de las filas de ajuste (sin la partición de validación,
+    sobre la que se mide la puntuación), el tamaño elegido y la curva medida. Los tamaños
+    son prefijos de ese orden. La curva se detiene tras `patience` pasos seguidos sin
+    superar la mejor puntuación en la mejora mínima, para que un paso ruidoso no la corte,
+    y se elige la muestra que alcanzó esa mejor puntuación; su modelo ya entrenado se
+    retorna para no ajustarlo otra vez. Sin meseta, el tamaño elegido es el de todas las
+    filas de ajuste y el modelo final puede usar el conjunto de entrenamiento completo.
+    """
+    y_train = np.asarray(y_train)
+    order = stratified_order(y_train, model_type, settings['random_state'])
+    n_validation = max(1, int(len(order) * VALIDATION_SIZE))
+    validation_rows, fit_order = order[:n_validation], order[n_validation:]
+    X_val, y_val = _take(X_train, validation_rows), y_train[validation_rows]
+
+    sizes = get_sample_sizes(len(fit_order), settings['initial_rows'], settings['growth_factor'])
+    patience = settings.get('patience', ADAPTIVE_PATIENCE)
+    curve = []
+    best = None
+    stalled = 0
+    start = time.perf_counter()
+    for size in sizes:
+        rows = fit_order[:size]
+        estimator = clone(model)
+        fit_timings = {}
+        with profile_call(fit_timings, 'fit'):
+            estimator.fit(_take(X_train, rows), y_train[rows])
+        score = _score(model_type, y_val, estimator.predict(X_val))
+        curve.append({'rows': size, 'score': score, 'fit_time': fit_timings['fit_time']})
+        if best is None or score - best['score'] >= settings['tolerance']:
+            best = {'rows': size, 'score': score, 'model': estimator, 'fit_timings': fit_timings}
+            stalled = 0
+        else:
+            stalled += 1
+            if stalled >= patience:
+                # Meseta: una muestra menor ya alcanzaba prácticamente la misma puntuación
+                break
+
+    return {
+        'fit_order': fit_order,
+        'chosen_rows': best['rows'],
+        'full_rows': len(fit_order),
+        'model': best['model'],
+        'fit_timings': best['fit_timings'],
+        'curve': pd.DataFrame(curve),
+        'curve_time': time.perf_counter() - start
+    }
+
+def summarize_savings(sampling, final_fit_time):
+    """Tiempo ahorrado frente a entrenar con todas las filas (estimado por extrapolación)"""
+    curve = sampling['curve']
+    estimated_full = estimate_fit_time(curve['rows'], curve['fit_time'], sampling['full_rows'])
+    spent = sampling['curve_time'] + final_fit_time
+    return {
+        'chosen_rows': sampling['chosen_rows'],
+        'full_rows': sampling['full_rows'],
+        'curve': curve,
+        'estimated_full_fit_time': estimated_full,
+        'time_spent': spent,
+        'time_saved': estimated_full - spent
+    }
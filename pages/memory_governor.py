@@ -0,0 +1,320 @@
+import os
+import time
+import uuid
+import pickle
+import shutil
+import atexit
+import weakref
+import tempfile
+import threading
+import importlib.util
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import streamlit as st
+from pages.jobs import get_session_id
+
+# Parquet (pyarrow) es opcional: sin él los DataFrames se guardan comprimidos con joblib
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+def _default_limit_mb():
+    """Una cuarta parte de la memoria física del servidor"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 4 / 1024 / 1024
+    except (ValueError, OSError, AttributeError):
+        return 2048
+
+# Memoria máxima que pueden ocupar entre todas las sesiones los datos, modelos y resultados
+MEMORY_LIMIT_MB = float(os.getenv('MEMORY_LIMIT_MB', str(int(_default_limit_mb()))))
+# Límite por sesión (0 = sin límite propio, solo cuenta el global)
+SESSION_MEMORY_LIMIT_MB = float(os.getenv('SESSION_MEMORY_LIMIT_MB', '0'))
+# Directorio donde se vuelcan los objetos fríos; cada proceso usa su propio subdirectorio
+SPILL_DIR = os.getenv(
+    'SPILL_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.spill')
+)
+SPILL_COMPRESSION = int(os.getenv('SPILL_COMPRESSION', '3'))
+# Mostrar en la barra lateral el uso de memoria de todas las sesiones
+SHOW_MEMORY_ADMIN = os.getenv('SHOW_MEMORY_ADMIN', '1') == '1'
+
+def estimate_bytes(value):
+    """Memoria aproximada de un objeto de la sesión"""
+    if value is None:
+        return 0
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if sp.issparse(value):
+        # Matrices CSR/CSC de la caché de preprocesamiento: sin serializarlas
+        value = value.tocsr()
+        return int(value.data.nbytes + value.indices.nbytes + value.indptr.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_bytes(item) for item in value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+def _write_spill(value, base_path):
+    """Guarda el objeto en disco: Parquet para DataFrames y joblib comprimido para el resto"""
+    import joblib
+
+    if PARQUET_AVAILABLE and isinstance(value, pd.DataFrame):
+        try:
+            path = base_path + '.parquet'
+            value.to_parquet(path, compression='zstd')
+            return path
+        except Exception:
+            # Columnas con tipos mezclados que Parquet no admite
+            if os.path.exists(path):
+                os.remove(path)
+    path = base_path + '.joblib'
+    joblib.dump(value, path, compress=SPILL_COMPRESSION)
+    return path
+
+def _read_spill(path):
+    import joblib
+
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return joblib.load(path)
+
+def _remove_files(paths):
+    for path in list(paths):
+        if os.path.exists(path):
+            os.remove(path)
+        paths.discard(path)
+
+class SpillSlot:
+    """Objeto de una sesión que el gobernador puede volcar a disco y que se recarga al pedirlo"""
+
+    def __init__(self, governor, session_id, name):
+        self.governor = governor
+        self.session_id = session_id
+        self.name = name
+        self.path = None
+        self.nbytes = 0
+        self.disk_bytes = 0
+        self.last_access = time.monotonic()
+        self._value = None
+        self._lock = threading.RLock()
+        # El archivo volcado se elimina cuando la sesión (y con ella el slot) desaparece
+        self._files = set()
+        weakref.finalize(self, _remove_files, self._files)
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+    def set(self, value):
+        with self._lock:
+            if value is self._value and self.path is None:
+                # El mismo objeto ya está en memoria: no se vuelve a medir (serializar modelos es caro)
+                self.last_access = time.monotonic()
+                return
+            _remove_files(self._files)
+            self.path = None
+            self.disk_bytes = 0
+            self._value = value
+            self.nbytes = estimate_bytes(value)
+            self.last_access = time.monotonic()
+        self.governor.enforce(keep=self)
+
+    def get(self):
+        reloaded = False
+        with self._lock:
+            if self.path is not None:
+                self._value = _read_spill(self.path)
+                _remove_files(self._files)
+                self.path = None
+                self.disk_bytes = 0
+                reloaded = True
+            self.last_access = time.monotonic()
+            value = self._value
+        if reloaded:
+            self.governor.record('reloads')
+            self.governor.enforce(keep=self)
+        return value
+
+    def spill(self):
+        """Vuelca el objeto a disco y libera la memoria; retorna los bytes liberados"""
+        with self._lock:
+            if self.path is not None or self._value is None:
+                return 0
+            base_path = os.path.join(self.governor.get_spill_dir(), f"{self.name}_{uuid.uuid4().hex[:12]}")
+            self.path = _write_spill(self._value, base_path)
+            self._files.add(self.path)
+            self.disk_bytes = os.path.getsize(self.path)
+            self._value = None
+        self.governor.record('spills')
+        return self.nbytes
+
+class MemoryGovernor:
+    """Contabilidad de la memoria de las sesiones, compartida por todo el proceso del servidor.
+
+    Cuando el total (o el de una sesión) supera su límite, los objetos usados hace más
+    tiempo se vuelcan a disco hasta volver por debajo. El objeto que se acaba de guardar o
+    leer nunca se vuelca, así que uno solo mayor que el límite se queda en memoria.
+    """
+
+    def __init__(self, limit_bytes=MEMORY_LIMIT_MB * 1024 * 1024,
+                 session_limit_bytes=SESSION_MEMORY_LIMIT_MB * 1024 * 1024, spill_dir=SPILL_DIR):
+        self.limit_bytes = limit_bytes
+        self.session_limit_bytes = session_limit_bytes
+        self.spill_root = spill_dir
+        self._spill_dir = None
+        # Las sesiones cerradas liberan sus slots y desaparecen solas de la contabilidad
+        self._slots = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.stats = {'spills': 0, 'reloads': 0}
+
+    def get_spill_dir(self):
+        with self._lock:
+            if self._spill_dir is None:
+                os.makedirs(self.spill_root, exist_ok=True)
+                self._spill_dir = tempfile.mkdtemp(prefix=f"proceso_{os.getpid()}_", dir=self.spill_root)
+                atexit.register(shutil.rmtree, self._spill_dir, True)
+            return self._spill_dir
+
+    def record(self, counter):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def track(self, session_id, name, value):
+        slot = SpillSlot(self, session_id, name)
+        with self._lock:
+            self._slots.add(slot)
+        slot.set(value)
+        return slot
+
+    def _get_slots(self, session_id=None):
+        with self._lock:
+            slots = list(self._slots)
+        return [slot for slot in slots if session_id is None or slot.session_id == session_id]
+
+    def _select_victims(self, slots, limit_bytes, keep):
+        """Objetos en memoria a volcar, del usado hace más tiempo al más reciente"""
+        resident = [slot for slot in slots if not slot.spilled]
+        excess = sum(slot.nbytes for slot in resident) - limit_bytes
+        victims = []
+        for slot in sorted(resident, key=lambda slot: slot.last_access):
+            if excess <= 0:
+                break
+            if slot is keep:
+                continue
+            victims.append(slot)
+            excess -= slot.nbytes
+        return victims
+
+    def enforce(self, keep=None):
+        """Vuelca objetos fríos hasta respetar el límite de la sesión de `keep` y el global"""
+        slots = self._get_slots()
+        victims = []
+        if self.session_limit_bytes > 0 and keep is not None:
+            session_slots = [slot for slot in slots if slot.session_id == keep.session_id]
+            victims = self._select_victims(session_slots, self.session_limit_bytes, keep)
+        remaining = [slot for slot in slots if slot not in victims]
+        victims += self._select_victims(remaining, self.limit_bytes, keep)
+        return sum(slot.spill() for slot in victims)
+
+    def spill_session(self, session_id):
+        """Vuelca a disco todos los objetos de una sesión"""
+        return sum(slot.spill() for slot in self._get_slots(session_id))
+
+    def get_usage(self, session_id=None):
+        """Bytes en memoria y en disco (de una sesión o de todas)"""
+        slots = self._get_slots(session_id)
+        return {
+            'memory_bytes': sum(slot.nbytes for slot in slots if not slot.spilled),
+            'disk_bytes': sum(slot.disk_bytes for slot in slots if slot.spilled),
+            'objects': len(slots),
+            'spilled': sum(1 for slot in slots if slot.spilled)
+        }
+
+    def get_usage_report(self):
+        """Uso por sesión, de la que más memoria ocupa a la que menos"""
+        now = time.monotonic()
+        sessions = {}
+        for slot in self._get_slots():
+            row = sessions.setdefault(slot.session_id, {
+                'Sesión': slot.session_id[:8],
+                'Objetos': 0,
+                'En disco': 0,
+                'Memoria (MB)': 0.0,
+                'Disco (MB)': 0.0,
+                'Último uso (s)': None
+            })
+            row['Objetos'] += 1
+            if slot.spilled:
+                row['En disco'] += 1
+                row['Disco (MB)'] += slot.disk_bytes / 1024 / 1024
+            else:
+                row['Memoria (MB)'] += slot.nbytes / 1024 / 1024
+            idle = now - slot.last_access
+            row['Último uso (s)'] = idle if row['Último uso (s)'] is None else min(row['Último uso (s)'], idle)
+        if not sessions:
+            return pd.DataFrame(columns=['Sesión', 'Objetos', 'En disco', 'Memoria (MB)', 'Disco (MB)', 'Último uso (s)'])
+        return pd.DataFrame(list(sessions.values())).sort_values('Memoria (MB)', ascending=False).reset_index(drop=True)
+
+@st.cache_resource
+def get_memory_governor():
+    """Gobernador de memoria único por proceso del servidor"""
+    return MemoryGovernor()
+
+def _slot_key(name):
+    return f"_memoria_{name}"
+
+def store_object(name, value):
+    """Guarda un objeto grande en la sesión bajo el control del gobernador y retorna su slot"""
+    slot = st.session_state.get(_slot_key(name))
+    if slot is None:
+        slot = get_memory_governor().track(get_session_id(), name, value)
+        st.session_state[_slot_key(name)] = slot
+    else:
+        slot.set(value)
+    return slot
+
+def get_object(name, default=None):
+    """Lee un objeto guardado con store_object, recargándolo de disco si fue volcado"""
+    slot = st.session_state.get(_slot_key(name))
+    if slot is None:
+        return default
+    value = slot.get()
+    return default if value is None else value
+
+def drop_object(name):
+    """Elimina un objeto de la sesión (y su copia en disco)"""
+    slot = st.session_state.pop(_slot_key(name), None)
+    if slot is not None:
+        slot.set(None)
+
+def show_memory_admin():
+    """Uso de memoria de la sesión actual y, para administración, del servidor completo"""
+    governor = get_memory_governor()
+    session_id = get_session_id()
+    session = governor.get_usage(session_id)
+    with st.expander("🧠 Memoria"):
+        st.metric(
+            "Esta sesión",
+            f"{session['memory_bytes'] / 1024 / 1024:.1f} MB",
+            help=f"{session['spilled']} de {session['objects']} objetos en disco "
+                 f"({session['disk_bytes'] / 1024 / 1024:.1f} MB)"
+        )
+        if st.button("Liberar memoria de la sesión", key="spill_session"):
+            governor.spill_session(session_id)
+            st.rerun()
+        if not SHOW_MEMORY_ADMIN:
+            return
+        total = governor.get_usage()
+        st.progress(min(1.0, total['memory_bytes'] / governor.limit_bytes) if governor.limit_bytes else 0.0)
+        st.caption(
+            f"Servidor: {total['memory_bytes'] / 1024 / 1024:.1f} MB de "
+            f"{governor.limit_bytes / 1024 / 1024:.0f} MB · "
+            f"{total['disk_bytes'] / 1024 / 1024:.1f} MB en disco · "
+            f"{governor.stats['spills']} volcados · {governor.stats['reloads']} recargas"
+        )
+        st.dataframe(governor.get_usage_report(), use_container_width=True, hide_index=True)
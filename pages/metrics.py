@@ -0,0 +1,173 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Puntos máximos de cada curva ROC/PR enviados a las gráficas (el AUC se calcula con la curva completa)
+CURVE_MAX_POINTS = int(os.getenv('CURVE_MAX_POINTS', '200'))
+
+def _trapezoid(x, y):
+    """Área bajo la curva por la regla del trapecio"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    return float(np.sum(np.diff(x) * (y[1:] + y[:-1]) / 2))
+
+def confusion_counts(y_true, y_pred, classes=None):
+    """Matriz de confusión en una sola pasada con bincount sobre los códigos de clase"""
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    if classes is None:
+        classes = np.unique(np.concatenate([y_true, y_pred]))
+    classes = np.asarray(classes)
+    n_classes = len(classes)
+    true_codes = np.searchsorted(classes, y_true)
+    pred_codes = np.searchsorted(classes, y_pred)
+    confusion = np.bincount(
+        true_codes * n_classes + pred_codes, minlength=n_classes * n_classes
+    ).reshape(n_classes, n_classes)
+    return classes, confusion
+
+def per_class_metrics(confusion, classes):
+    """Precisión, recall, F1 y soporte por clase derivados de la matriz de confusión"""
+    true_positives = np.diag(confusion).astype(float)
+    predicted = confusion.sum(axis=0)
+    support = confusion.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        recall = np.where(support > 0, true_positives / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return pd.DataFrame({
+        'clase': [str(c) for c in classes],
+        'precision': precision,
+        'recall': recall,
+        'f1-score': f1,
+        'support': support
+    })
+
+def format_report(per_class, accuracy):
+    """Reporte en texto con el mismo formato que classification_report"""
+    support = per_class['support'].to_numpy()
+    total = support.sum()
+    width = max(len('weighted avg'), per_class['clase'].str.len().max())
+    lines = [f"{'':>{width}} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", ""]
+    for row in per_class.itertuples(index=False):
+        lines.append(
+            f"{row.clase:>{width}} {row.precision:>9.2f} {row.recall:>9.2f} {row[3]:>9.2f} {row.support:>9}"
+        )
+    lines.append("")
+    lines.append(f"{'accuracy':>{width}} {'':>9} {'':>9} {accuracy:>9.2f} {total:>9}")
+    for name, weights in (('macro avg', None), ('weighted avg', support)):
+        averages = [
+            np.average(per_class[col], weights=weights) if total else 0.0
+            for col in ('precision', 'recall', 'f1-score')
+        ]
+        lines.append(
+            f"{name:>{width}} {averages[0]:>9.2f} {averages[1]:>9.2f} {averages[2]:>9.2f} {total:>9}"
+        )
+    return "\n".join(lines)
+
+def threshold_curves(y_true, scores):
+    """Curvas ROC y precisión-recall de una clase en una sola pasada ordenada por puntuación"""
+    y_true = np.asarray(y_true, dtype=bool)
+    scores = np.asarray(scores, dtype=float)
+    order = np.argsort(-scores, kind='mergesort')
+    scores = scores[order]
+    y_true = y_true[order]
+
+    # Un punto por umbral distinto: conteos acumulados de verdaderos y falsos positivos
+    last_of_threshold = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    true_positives = np.cumsum(y_true)[last_of_threshold]
+    false_positives = last_of_threshold + 1 - true_positives
+    positives, negatives = true_positives[-1], false_positives[-1]
+    if positives == 0 or negatives == 0:
+        return None
+
+    fpr = np.r_[0.0, false_positives / negatives]
+    tpr = np.r_[0.0, true_positives / positives]
+    precision = true_positives / (true_positives + false_positives)
+    recall = true_positives / positives
+    return {
+        'fpr': fpr,
+        'tpr': tpr,
+        'precision': np.r_[1.0, precision],
+        'recall': np.r_[0.0, recall],
+        'roc_auc': _trapezoid(fpr, tpr),
+        # Precisión promedio: suma de la precisión ponderada por el aumento de recall
+        'average_precision': float(np.sum(np.diff(np.r_[0.0, recall]) * precision))
+    }
+
+def decimate_curve(x, y, max_points=CURVE_MAX_POINTS):
+    """Reduce una curva a un máximo de puntos repartidos uniformemente a lo largo de su recorrido"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) <= max_points:
+        return x, y
+    # Longitud de arco acumulada: conserva los tramos donde la curva cambia
+    distance = np.r_[0.0, np.cumsum(np.hypot(np.diff(x), np.diff(y)))]
+    targets = np.linspace(0.0, distance[-1], max_points)
+    indices = np.unique(np.r_[0, np.searchsorted(distance, targets).clip(0, len(x) - 1), len(x) - 1])
+    return x[indices], y[indices]
+
+def classification_metrics(y_true, y_pred, proba=None, proba_classes=None, max_points=CURVE_MAX_POINTS):
+    """Todas las métricas de clasificación a partir de una matriz de confusión y una pasada por umbral.
+
+    Para problemas multiclase las curvas se calculan uno contra el resto por cada clase.
+    """
+    classes, confusion = confusion_counts(y_true, y_pred)
+    n = confusion.sum()
+    accuracy = float(np.trace(confusion) / n) if n else 0.0
+    per_class = per_class_metrics(confusion, classes)
+
+    curves = {}
+    if proba is not None and proba_classes is not None:
+        proba = np.asarray(proba)
+        if proba.ndim == 1:
+            proba = np.column_stack([1 - proba, proba])
+        proba_classes = list(proba_classes)
+        # En binario basta la curva de la clase positiva
+        curve_classes = proba_classes[1:] if len(proba_classes) == 2 else proba_classes
+        y_true = np.asarray(y_true)
+        for label in curve_classes:
+            full = threshold_curves(y_true == label, proba[:, proba_classes.index(label)])
+            if full is None:
+                continue
+            fpr, tpr = decimate_curve(full['fpr'], full['tpr'], max_points)
+            recall, precision = decimate_curve(full['recall'], full['precision'], max_points)
+            curves[str(label)] = {
+                'fpr': fpr,
+                'tpr': tpr,
+                'recall': recall,
+                'precision': precision,
+                'roc_auc': full['roc_auc'],
+                'average_precision': full['average_precision']
+            }
+
+    return {
+        'accuracy': accuracy,
+        'classes': [str(c) for c in classes],
+        'confusion_matrix': confusion,
+        'per_class': per_class,
+        'report': format_report(per_class, accuracy),
+        'curves': curves,
+        'roc_auc_macro': float(np.mean([c['roc_auc'] for c in curves.values()])) if curves else None
+    }
+
+def regression_metrics(y_true, y_pred):
+    """Métricas de regresión a partir de los residuos calculados una sola vez"""
+    y_true = np.asarray(y_true, dtype=float)
+    residuals = y_true - np.asarray(y_pred, dtype=float)
+    sse = float(np.dot(residuals, residuals))
+    total = float(np.sum((y_true - y_true.mean()) ** 2))
+    n = max(len(y_true), 1)
+    return {
+        'mse': sse / n,
+        'rmse': float(np.sqrt(sse / n)),
+        'mae': float(np.abs(residuals).mean()) if len(residuals) else 0.0,
+        'r2': 1 - sse / total if total > 0 else 0.0
+    }
+
+def evaluate_predictions(model_type, y_true, y_pred, proba=None, proba_classes=None,
+                         max_points=CURVE_MAX_POINTS):
+    """Calcula las métricas del modelo según su tipo"""
+    if model_type == "Clasificación":
+        return classification_metrics(y_true, y_pred, proba, proba_classes, max_points)
+    return regression_metrics(y_true, y_pred)
@@ -0,0 +1,220 @@
+import os
+import re
+import json
+import time
+import hashlib
+import joblib
+import tempfile
+import numpy as np
+
+# Directorio y tamaño máximo del registro de modelos entrenados
+REGISTRY_DIR = os.getenv(
+    'MODEL_REGISTRY_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.model_registry')
+)
+REGISTRY_MAX_BYTES = int(float(os.getenv('MODEL_REGISTRY_MAX_MB', '500')) * 1024 * 1024)
+# Las claves son los primeros 32 caracteres hexadecimales de un SHA-256
+KEY_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+def make_registry_key(table_version, target_column, feature_columns, model_name, params):
+    """Genera la clave del registro a partir de los datos y la configuración del modelo"""
+    payload = json.dumps({
+        'table_version': table_version,
+        'target': target_column,
+        'features': list(feature_columns),
+        'model': model_name,
+        'params': params
+    }, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def is_valid_key(key):
+    """Indica si una clave recibida desde fuera tiene el formato de las claves del registro"""
+    return isinstance(key, str) and KEY_PATTERN.fullmatch(key) is not None
+
+def _entry_path(key):
+    """Ruta del archivo joblib de una entrada"""
+    return os.path.join(REGISTRY_DIR, f"{key}.joblib")
+
+def _metadata_path(key):
+    """Ruta del archivo de metadatos de una entrada"""
+    return os.path.join(REGISTRY_DIR, f"{key}.json")
+
+def get_onnx_path(key):
+    """Ruta del modelo exportado a ONNX de una entrada"""
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    return os.path.join(REGISTRY_DIR, f"{key}.onnx")
+
+def has_entry(key):
+    """Indica si existe una entrada en el registro"""
+    return os.path.exists(_entry_path(key))
+
+def write_atomic(path, write):
+    """Escribe un archivo temporal propio y lo renombra, para no dejar entradas a medias.
+
+    Cada escritura usa un nombre temporal único: dos sesiones que guardan la misma clave
+    a la vez no se pisan el archivo temporal y la última en renombrar gana.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _dump_json(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, default=repr)
+
+def _to_builtin(value):
+    """Convierte arrays y escalares de NumPy en listas y números de Python para guardarlos en JSON"""
+    if isinstance(value, dict):
+        return {str(k): _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def summarize_result(result):
+    """Puntuación, reporte y métricas de un resultado, sin predicciones ni tablas por clase.
+
+    Se guarda en los metadatos para que los reportes no tengan que cargar el modelo.
+    """
+    metrics = result.get('metrics')
+    if metrics is not None:
+        metrics = _to_builtin({k: v for k, v in metrics.items() if k != 'per_class'})
+    return {
+        'score': _to_builtin(result['score']),
+        'variant': result.get('variant'),
+        'report': result.get('report', ''),
+        'metrics': metrics
+    }
+
+def save_entry(key, model, result, timings, metadata=None, preprocessor=None):
+    """Guarda un modelo entrenado con su preprocesamiento, métricas y tiempos en el registro"""
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    metadata = dict(metadata or {})
+    metadata['key'] = key
+    metadata['created_at'] = time.time()
+    metadata['result'] = summarize_result(result)
+
+    path = _entry_path(key)
+    write_atomic(path, lambda tmp_path: joblib.dump({
+        'model': model,
+        'preprocessor': preprocessor,
+        'result': result,
+        'timings': timings,
+        'metadata': metadata
+    }, tmp_path, compress=3))
+
+    metadata['size_bytes'] = os.path.getsize(path)
+    write_atomic(_metadata_path(key), lambda tmp_path: _dump_json(metadata, tmp_path))
+
+    enforce_size_limit(keep=key)
+    return metadata
+
+def load_entry(key):
+    """Carga una entrada del registro, o None si no existe"""
+    path = _entry_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        entry = joblib.load(path)
+    except Exception:
+        # Una entrada corrupta se descarta y se vuelve a entrenar
+        delete_entry(key)
+        return None
+    # Marcar el acceso para que la expulsión elimine primero lo menos usado
+    os.utime(path, None)
+    return entry
+
+def load_metadata(key):
+    """Carga solo los metadatos de una entrada, o None si no existe"""
+    if not has_entry(key):
+        return None
+    try:
+        with open(_metadata_path(key), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def delete_entry(key):
+    """Elimina una entrada del registro"""
+    for path in (_entry_path(key), _metadata_path(key), get_onnx_path(key)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def list_entries():
+    """Lista los metadatos de las entradas del registro, de la más reciente a la más antigua"""
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    entries = []
+    for file_name in os.listdir(REGISTRY_DIR):
+        if not file_name.endswith('.json'):
+            continue
+        key = file_name[:-len('.json')]
+        if not has_entry(key):
+            continue
+        try:
+            with open(_metadata_path(key), encoding='utf-8') as f:
+                entries.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(entries, key=lambda m: m.get('created_at', 0), reverse=True)
+
+def _entry_sizes():
+    """(último acceso, tamaño en bytes, clave) de cada entrada del registro.
+
+    El tamaño incluye la exportación ONNX guardada junto a la entrada; el acceso es el que
+    marca load_entry en el archivo del modelo (el servidor de predicción también lo usa).
+    """
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    entries = []
+    for file_name in os.listdir(REGISTRY_DIR):
+        if not file_name.endswith('.joblib'):
+            continue
+        key = file_name[:-len('.joblib')]
+        try:
+            stat = os.stat(os.path.join(REGISTRY_DIR, file_name))
+        except OSError:
+            continue
+        size = stat.st_size
+        onnx_path = get_onnx_path(key)
+        if os.path.exists(onnx_path):
+            size += os.path.getsize(onnx_path)
+        entries.append((stat.st_mtime, size, key))
+    return entries
+
+def get_registry_size():
+    """Retorna el tamaño total en bytes de las entradas del registro (con sus exportaciones ONNX)"""
+    return sum(size for _, size, _ in _entry_sizes())
+
+def enforce_size_limit(max_bytes=None, keep=None):
+    """Expulsa las entradas usadas hace más tiempo hasta respetar el tamaño máximo"""
+    max_bytes = REGISTRY_MAX_BYTES if max_bytes is None else max_bytes
+    files = _entry_sizes()
+    total = sum(size for _, size, _ in files)
+    evicted = []
+    for _, size, key in sorted(files):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        delete_entry(key)
+        total -= size
+        evicted.append(key)
+    return evicted
+
+def clear_registry():
+    """Elimina todas las entradas del registro"""
+    if not os.path.isdir(REGISTRY_DIR):
+        return
+    for file_name in os.listdir(REGISTRY_DIR):
+        if file_name.endswith('.joblib'):
+            delete_entry(file_name[:-len('.joblib')])
@@ -1,25 +1,68 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import os
 from sklearn.model_selection import train_test_split
 from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.linear_model import LogisticRegression, LinearRegression
 from sklearn.svm import SVC, SVR
 from sklearn.neighbors import KNeighborsClassifier, KNeighborsRegressor
-from sklearn.metrics import accuracy_score, mean_squared_error, r2_score, classification_report, confusion_matrix, roc_curve, auc
+from sklearn.svm import LinearSVC, LinearSVR
+from sklearn.kernel_approximation import Nystroem
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline
 import xgboost as xgb
 import plotly.express as px
 import plotly.graph_objects as go
-from pages.utils import load_from_db, get_available_tables
+from pages.datasets import select_table, get_dataset, get_dataframe, get_loaded_version
+from pages.model_registry import (
+    make_registry_key, load_entry, load_metadata, save_entry, has_entry,
+    list_entries, get_registry_size, clear_registry, REGISTRY_MAX_BYTES
+)
+from pages.out_of_core import show_out_of_core_training
+from pages.incremental import show_incremental_refresh
+from pages.drift import build_profile
+from pages.distributed import use_dask, fit_distributed, get_cluster_info
+from pages.cross_validation import cross_validate_models, XGBOOST_MAX_ROUNDS
+from pages.hyperparameter_search import successive_halving, make_search_key, get_resource_kind, resolve_params
+from pages.profiling import profile_call, get_model_size_bytes, record_run, load_runs, format_cost_table
+from pages.preprocessing import build_feature_matrices, get_feature_names, get_preprocessing_config, get_matrix_nbytes
+from pages.metrics import evaluate_predictions
+from pages.learning_curve import (
+    adaptive_sample_size, summarize_savings, get_sampling_settings,
+    ADAPTIVE_INITIAL_ROWS, ADAPTIVE_GROWTH_FACTOR, ADAPTIVE_TOLERANCE
+)
+from pages.onnx_export import export_and_validate, ONNX_AVAILABLE
+from pages.importance import (
+    compute_permutation_importance, get_importance_settings, has_importance, plot_permutation_importance,
+    PERMUTATION_SAMPLE_SIZE, PERMUTATION_REPEATS
+)
+from pages.jobs import get_job_manager, get_session_id, watch_job, RUNNING, DONE, CANCELLED
+from pages.memory_governor import store_object, get_object
+from pages.instrumentation import record_cache
 
-def plot_confusion_matrix(y_true, y_pred, model_name):
+# Parámetros de la división entrenamiento/prueba (forman parte de la clave del registro)
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+# Filas de entrenamiento a partir de las cuales se sustituyen los modelos que no escalan
+LARGE_DATA_THRESHOLDS = {
+    "SVM": int(os.getenv('LARGE_DATA_SVM_ROWS', '20000')),
+    "KNN": int(os.getenv('LARGE_DATA_KNN_ROWS', '50000')),
+    "XGBoost": int(os.getenv('LARGE_DATA_XGBOOST_ROWS', '100000'))
+}
+NYSTROEM_COMPONENTS = int(os.getenv('LARGE_DATA_NYSTROEM_COMPONENTS', '300'))
+KNN_SVD_COMPONENTS = int(os.getenv('LARGE_DATA_KNN_SVD_COMPONENTS', '30'))
+
+def plot_confusion_matrix(metrics, model_name):
     """Genera y muestra la matriz de confusión"""
-    cm = confusion_matrix(y_true, y_pred)
     fig = go.Figure(data=go.Heatmap(
-        z=cm,
-        x=['Predicción Negativa', 'Predicción Positiva'],
-        y=['Real Negativo', 'Real Positivo'],
+        z=metrics['confusion_matrix'],
+        x=[f"Predicción {label}" for label in metrics['classes']],
+        y=[f"Real {label}" for label in metrics['classes']],
         colorscale='Blues',
         showscale=True
     ))
@@ -30,17 +73,13 @@ def plot_confusion_matrix(y_true, y_pred, model_name):
     )
     return fig
 
-def plot_roc_curve(y_true, y_pred_proba, model_name):
-    """Genera y muestra la curva ROC"""
-    fpr, tpr, _ = roc_curve(y_true, y_pred_proba)
-    roc_auc = auc(fpr, tpr)
-    
+def plot_roc_curve(metrics, model_name):
+    """Genera y muestra la curva ROC (una por clase en multiclase)"""
+    curves = metrics['curves']
     fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=fpr, y=tpr,
-        name=f'ROC (AUC = {roc_auc:.2f})',
-        line=dict(color='blue')
-    ))
+    for label, curve in curves.items():
+        name = f'ROC (AUC = {curve["roc_auc"]:.2f})' if len(curves) == 1 else f'{label} (AUC = {curve["roc_auc"]:.2f})'
+        fig.add_trace(go.Scatter(x=curve['fpr'], y=curve['tpr'], name=name))
     fig.add_trace(go.Scatter(
         x=[0, 1], y=[0, 1],
         name='Línea Base',
@@ -54,6 +93,21 @@ def plot_roc_curve(y_true, y_pred_proba, model_name):
     )
     return fig
 
+def plot_pr_curve(metrics, model_name):
+    """Genera y muestra la curva precisión-recall (una por clase en multiclase)"""
+    curves = metrics['curves']
+    fig = go.Figure()
+    for label, curve in curves.items():
+        name = f'PR (AP = {curve["average_precision"]:.2f})' if len(curves) == 1 else f'{label} (AP = {curve["average_precision"]:.2f})'
+        fig.add_trace(go.Scatter(x=curve['recall'], y=curve['precision'], name=name))
+    fig.update_layout(
+        title=f'Curva Precisión-Recall - {model_name}',
+        xaxis_title='Recall',
+        yaxis_title='Precisión',
+        showlegend=True
+    )
+    return fig
+
 def plot_regression_results(y_true, y_pred, model_name):
     """Genera y muestra gráfica de resultados de regresión"""
     fig = go.Figure()
@@ -116,28 +170,664 @@ def get_model(model_name, model_type):
         }
     return models.get(model_name)
 
+def uses_large_data_variant(model_name, n_rows, thresholds=None):
+    """Indica si el modelo debe sustituirse por su variante escalable según el número de filas"""
+    thresholds = LARGE_DATA_THRESHOLDS if thresholds is None else thresholds
+    threshold = thresholds.get(model_name)
+    return threshold is not None and n_rows >= threshold
+
+def get_scalable_model(model_name, model_type, n_rows, n_features, sparse=False, thresholds=None):
+    """Retorna el modelo adecuado al tamaño de los datos y la descripción de la variante usada"""
+    if not uses_large_data_variant(model_name, n_rows, thresholds):
+        return get_model(model_name, model_type), "Estándar"
+    
+    if model_name == "SVM":
+        # Aproximación del kernel RBF con Nystroem + SVM lineal, lineal en el número de filas
+        kernel_map = Nystroem(kernel='rbf', n_components=NYSTROEM_COMPONENTS, random_state=RANDOM_STATE)
+        scaler = StandardScaler(with_mean=not sparse)
+        if model_type == "Clasificación":
+            model = Pipeline([
+                ('escalado', scaler),
+                ('nystroem', kernel_map),
+                ('svm', CalibratedClassifierCV(LinearSVC(random_state=RANDOM_STATE), cv=3))
+            ])
+        else:
+            model = Pipeline([
+                ('escalado', scaler),
+                ('nystroem', kernel_map),
+                ('svm', LinearSVR(random_state=RANDOM_STATE))
+            ])
+        return model, f"Nystroem ({NYSTROEM_COMPONENTS} componentes) + SVM lineal"
+    
+    if model_name == "KNN":
+        knn_class = KNeighborsClassifier if model_type == "Clasificación" else KNeighborsRegressor
+        if sparse or n_features > KNN_SVD_COMPONENTS:
+            # Los índices en árbol no admiten matrices dispersas ni escalan con muchas dimensiones
+            model = Pipeline([
+                ('reduccion', TruncatedSVD(
+                    n_components=min(KNN_SVD_COMPONENTS, n_features - 1), random_state=RANDOM_STATE
+                )),
+                ('knn', knn_class(algorithm='ball_tree', n_jobs=-1))
+            ])
+            return model, f"SVD ({min(KNN_SVD_COMPONENTS, n_features - 1)} componentes) + índice Ball Tree"
+        return knn_class(algorithm='kd_tree', n_jobs=-1), "Índice KD Tree"
+    
+    if model_name == "XGBoost":
+        model = get_model(model_name, model_type)
+        model.set_params(tree_method='hist', max_bin=256, n_jobs=-1)
+        return model, "Histograma (tree_method='hist')"
+    
+    return get_model(model_name, model_type), "Estándar"
+
+def train_and_evaluate(model, model_type, X_train, X_test, y_train, y_test, distributed=False, fit_timings=None):
+    """Entrena un modelo, lo evalúa sobre el conjunto de prueba y perfila su coste.
+
+    Con fit_timings el modelo ya viene entrenado (por la curva de aprendizaje) y se
+    conservan los tiempos de ese ajuste.
+    """
+    timings = dict(fit_timings or {})
+    if fit_timings is None:
+        with profile_call(timings, 'fit'):
+            if distributed:
+                fit_distributed(model, X_train, y_train)
+            else:
+                model.fit(X_train, y_train)
+    
+    with profile_call(timings, 'predict'):
+        pred = model.predict(X_test)
+    
+    pred_proba = None
+    if model_type == "Clasificación" and hasattr(model, 'predict_proba'):
+        # Probabilidades de todas las clases para las curvas ROC y PR
+        with profile_call(timings, 'predict_proba'):
+            pred_proba = model.predict_proba(X_test)
+    
+    with profile_call(timings, 'metrics'):
+        metrics = evaluate_predictions(
+            model_type, y_test, pred, pred_proba, getattr(model, 'classes_', None)
+        )
+    if model_type == "Clasificación":
+        score = metrics['accuracy']
+        report = metrics['report']
+    else:
+        score = metrics['r2']
+        report = f"MSE: {metrics['mse']:.4f}"
+    
+    result = {
+        'score': score,
+        'report': report,
+        'predictions': pred,
+        'pred_proba': pred_proba,
+        'metrics': metrics
+    }
+    timings['model_size_bytes'] = get_model_size_bytes(model)
+    timings['predict_latency_per_row'] = timings['predict_time'] / max(X_test.shape[0], 1)
+    return result, timings
+
+def get_result_metrics(result, y_test, model_type):
+    """Métricas del resultado; las entradas antiguas del registro se completan al mostrarlas"""
+    if result.get('metrics') is None:
+        proba = result.get('pred_proba')
+        classes = None
+        if proba is not None and np.ndim(proba) == 1:
+            # Las entradas antiguas solo guardaban la probabilidad de la clase positiva
+            classes = np.unique(y_test)
+            if len(classes) != 2:
+                proba, classes = None, None
+        result['metrics'] = evaluate_predictions(model_type, y_test, result['predictions'], proba, classes)
+    return result['metrics']
+
+def get_registry_key(model, model_name, table_version, target_column, feature_columns, large_data=False,
+                     sampling=None):
+    """Calcula la clave del registro para un modelo y un conjunto de datos"""
+    params = {
+        'estimator': type(model).__name__,
+        'large_data': large_data,
+        'hyperparameters': model.get_params(deep=False),
+        'preprocessing': get_preprocessing_config(),
+        'test_size': TEST_SIZE,
+        'random_state': RANDOM_STATE
+    }
+    if sampling is not None:
+        params['sampling'] = sampling
+    return make_registry_key(table_version, target_column, feature_columns, model_name, params)
+
+def run_cross_validation(selected_models, model_type, X, y, n_splits, n_jobs, thresholds):
+    """Ejecuta la validación cruzada en paralelo y muestra sus resultados"""
+    def model_factory(model_name, X_train_matrix):
+        model, _ = get_scalable_model(
+            model_name, model_type, X_train_matrix.shape[0], X_train_matrix.shape[1],
+            sparse=hasattr(X_train_matrix, 'tocsr'), thresholds=thresholds
+        )
+        return model
+    
+    with st.spinner(f"Ejecutando validación cruzada con {n_splits} pliegues..."):
+        fold_results, summary, wall_time = cross_validate_models(
+            model_factory, selected_models, model_type, X, y, n_splits=n_splits, n_jobs=n_jobs
+        )
+    
+    st.header("📊 Resultados de la Validación Cruzada")
+    metric_name = "Precisión" if model_type == "Clasificación" else "R²"
+    cols = st.columns(len(summary))
+    for i, row in summary.iterrows():
+        with cols[i]:
+            st.subheader(row['model'])
+            st.metric(f"{metric_name} media", f"{row['score_mean']:.4f}", f"± {row['score_std']:.4f}", delta_color="off")
+            if not pd.isna(row.get('n_estimators_mean', np.nan)):
+                st.caption(f"Árboles/rondas usados (media): {row['n_estimators_mean']:.0f}")
+    
+    st.caption(
+        f"Tiempo total: {wall_time:.2f} s · Suma de tiempos de entrenamiento: "
+        f"{fold_results['fit_time'].sum():.2f} s · XGBoost con parada temprana "
+        f"(máx. {XGBOOST_MAX_ROUNDS} rondas) y Random Forest con crecimiento incremental"
+    )
+    st.plotly_chart(px.box(
+        fold_results, x='model', y='score', points='all',
+        title=f"{metric_name} por pliegue",
+        labels={'model': 'Modelo', 'score': metric_name}
+    ))
+    st.dataframe(fold_results, use_container_width=True)
+
+def run_hyperparameter_search(model_name, model_type, target_column, X_train, X_test, y_train, y_test,
+                              table_version, n_candidates, eta, time_budget, n_jobs, thresholds=None):
+    """Ejecuta la búsqueda de hiperparámetros y evalúa la mejor configuración en el conjunto de prueba"""
+    feature_columns = list(X_train.columns)
+    matrices = build_feature_matrices(
+        X_train, X_test,
+        cache_key=(table_version, tuple(feature_columns), TEST_SIZE, RANDOM_STATE)
+        if table_version is not None else None
+    )
+
+    def model_factory(name):
+        # Misma variante (estándar o escalable) que en el entrenamiento normal con estos datos
+        return get_scalable_model(
+            name, model_type, matrices['X_train'].shape[0], matrices['X_train'].shape[1],
+            sparse=hasattr(matrices['X_train'], 'tocsr'), thresholds=thresholds
+        )
+    
+    variant = model_factory(model_name)[1]
+    search_key = make_search_key(
+        (table_version, target_column, feature_columns, TEST_SIZE, RANDOM_STATE),
+        model_name, model_type, n_candidates, eta, variant
+    )
+    progress_text = st.empty()
+    
+    def report_progress(rung, done, total, resource):
+        unit = "rondas" if get_resource_kind(model_name) == 'rounds' else "filas"
+        progress_text.text(f"Escalón {rung + 1}: {done}/{total} ensayos con {resource:,} {unit}")
+    
+    with st.spinner(f"Buscando hiperparámetros para {model_name}..."):
+        search = successive_halving(
+            lambda name: model_factory(name)[0], model_name, model_type,
+            matrices['X_train'], y_train, search_key,
+            n_candidates=n_candidates, eta=eta, time_budget=time_budget, n_jobs=n_jobs,
+            progress_callback=report_progress
+        )
+    progress_text.empty()
+    
+    if search['resumed_trials']:
+        st.info(f"Se reutilizaron {search['resumed_trials']} ensayos de una búsqueda anterior.")
+    if not search['completed']:
+        st.warning("Se agotó el presupuesto de tiempo. Vuelve a ejecutar la búsqueda para reanudarla.")
+    if search['best'] is None:
+        return
+    
+    st.header(f"🔎 Búsqueda de Hiperparámetros - {model_name}")
+    st.caption(
+        f"Variante: {variant} · "
+        f"Recursos por escalón: {', '.join(f'{r:,}' for r in search['resources'])} "
+        f"({'rondas de boosting' if get_resource_kind(model_name) == 'rounds' else 'filas'}) · "
+        f"Tiempo: {search['elapsed']:.2f} s"
+    )
+    st.json(search['best']['params'])
+    
+    # Comparar la mejor configuración con los valores por defecto en el conjunto de prueba
+    tuned_model = model_factory(model_name)[0]
+    tuned_model.set_params(**resolve_params(tuned_model, search['best']['params']))
+    if get_resource_kind(model_name) == 'rounds':
+        tuned_model.set_params(n_estimators=search['best']['resource'])
+    tuned_result, _ = train_and_evaluate(
+        tuned_model, model_type, matrices['X_train'], matrices['X_test'], y_train, y_test
+    )
+    default_result, _ = train_and_evaluate(
+        model_factory(model_name)[0], model_type, matrices['X_train'], matrices['X_test'], y_train, y_test
+    )
+    metric_name = "Precisión" if model_type == "Clasificación" else "R²"
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric(f"{metric_name} en validación", f"{search['best']['score']:.4f}")
+    with col2:
+        st.metric(
+            f"{metric_name} en prueba (optimizado)", f"{tuned_result['score']:.4f}",
+            f"{tuned_result['score'] - default_result['score']:+.4f} vs. por defecto"
+        )
+    with col3:
+        st.metric(f"{metric_name} en prueba (por defecto)", f"{default_result['score']:.4f}")
+    
+    trials = search['trials'].copy()
+    trials['params'] = trials['params'].astype(str)
+    st.plotly_chart(px.scatter(
+        trials, x='resource', y='score', color='rung', hover_data=['params'],
+        title="Ensayos por escalón", labels={'resource': 'Recurso', 'score': metric_name}
+    ))
+    st.dataframe(trials.sort_values(['rung', 'score'], ascending=[False, False]), use_container_width=True)
+
+def add_permutation_importance(result, model, preprocessor, model_type, X_test, y_test, settings):
+    """Calcula la importancia por permutación y la guarda en el resultado del modelo"""
+    stats = {}
+    with profile_call(stats, 'permutation_importance'):
+        table = compute_permutation_importance(model, preprocessor, model_type, X_test, y_test, settings)
+    result['permutation_importance'] = {
+        'settings': settings,
+        'table': table,
+        'time': stats['permutation_importance_time']
+    }
+
+def train_selected_models(job, spec):
+    """Entrena (o carga del registro) los modelos seleccionados sin usar la interfaz.
+    
+    Se ejecuta en un hilo del gestor de trabajos; job puede ser None cuando todos los
+    modelos están en el registro y se cargan de forma síncrona.
+    """
+    model_type = spec['model_type']
+    X_train, X_test = spec['X_train'], spec['X_test']
+    y_train, y_test = spec['y_train'], spec['y_test']
+    table_version = spec['table_version']
+    feature_columns = spec['feature_columns']
+    registry_keys = spec['registry_keys']
+    importance_settings = spec.get('importance_settings')
+    sampling_settings = spec.get('sampling_settings')
+    
+    results = {}
+    models = {}
+    timings = {}
+    cached = {}
+    matrices = None
+    preprocessor = None
+    data_profile = None
+    
+    for model_name in spec['selected_models']:
+        # Cancelación cooperativa entre modelos
+        if job is not None and job.is_cancelled():
+            job.set_task_status(model_name, CANCELLED)
+            continue
+        if job is not None:
+            job.set_task_status(model_name, RUNNING)
+        
+        entry = load_entry(registry_keys[model_name]) if model_name in registry_keys else None
+        record_cache('registro_modelos', entry is not None)
+        if entry is not None and entry.get('preprocessor') is not None:
+            model = entry['model']
+            preprocessor = entry['preprocessor']
+            results[model_name] = entry['result']
+            timings[model_name] = entry['timings']
+            cached[model_name] = True
+            # Completar la entrada del registro si le falta la importancia con estos ajustes
+            if importance_settings is not None and not has_importance(results[model_name], importance_settings):
+                add_permutation_importance(
+                    results[model_name], model, preprocessor, model_type, X_test, y_test, importance_settings
+                )
+                save_entry(
+                    registry_keys[model_name], model, results[model_name], timings[model_name],
+                    metadata=dict(entry['metadata'], permutation_importance=importance_settings),
+                    preprocessor=preprocessor
+                )
+        else:
+            # Matrices float32/CSR compartidas por todos los modelos (con caché por versión de tabla)
+            if matrices is None:
+                matrices = build_feature_matrices(
+                    X_train, X_test,
+                    cache_key=(table_version, tuple(feature_columns), TEST_SIZE, RANDOM_STATE)
+                    if table_version is not None else None
+                )
+                preprocessor = matrices['preprocessor']
+            model, variant = get_scalable_model(
+                model_name, model_type, matrices['X_train'].shape[0], matrices['X_train'].shape[1],
+                sparse=hasattr(matrices['X_train'], 'tocsr'), thresholds=spec['thresholds']
+            )
+            if sampling_settings is not None:
+                # Curva de aprendizaje: entrenar solo con la muestra a partir de la cual no mejora
+                sampling = adaptive_sample_size(model, model_type, matrices['X_train'], y_train, sampling_settings)
+                if sampling['chosen_rows'] < sampling['full_rows']:
+                    # Se reutiliza el modelo que la curva ya entrenó con la muestra elegida
+                    model = sampling['model']
+                    results[model_name], timings[model_name] = train_and_evaluate(
+                        model, model_type, None, matrices['X_test'], None, y_test,
+                        fit_timings=sampling['fit_timings']
+                    )
+                    final_fit_time = 0.0
+                else:
+                    # Sin meseta: el modelo final usa todas las filas, también las de validación
+                    results[model_name], timings[model_name] = train_and_evaluate(
+                        model, model_type, matrices['X_train'], matrices['X_test'],
+                        y_train, y_test, distributed=spec.get('distributed', False)
+                    )
+                    final_fit_time = timings[model_name]['fit_time']
+                results[model_name]['learning_curve'] = summarize_savings(sampling, final_fit_time)
+            else:
+                results[model_name], timings[model_name] = train_and_evaluate(
+                    model, model_type, matrices['X_train'], matrices['X_test'], y_train, y_test,
+                    distributed=spec.get('distributed', False)
+                )
+            results[model_name]['variant'] = variant
+            cached[model_name] = False
+            if data_profile is None:
+                # Distribución de los datos de entrenamiento, referencia de la deriva en actualizaciones incrementales
+                data_profile = build_profile(
+                    pd.concat([X_train, y_train], axis=1), list(feature_columns) + [spec['target_column']]
+                )
+            if importance_settings is not None:
+                add_permutation_importance(
+                    results[model_name], model, preprocessor, model_type, X_test, y_test, importance_settings
+                )
+            record_run({
+                'model_name': model_name,
+                'model_type': model_type,
+                'variant': variant,
+                'table_name': spec['selected_table'],
+                'target_column': spec['target_column'],
+                'n_features': len(feature_columns),
+                'n_train': X_train.shape[0],
+                'n_test': X_test.shape[0],
+                'score': results[model_name]['score']
+            }, timings[model_name])
+            if model_name in registry_keys:
+                save_entry(
+                    registry_keys[model_name], model, results[model_name], timings[model_name],
+                    metadata={
+                        'model_name': model_name,
+                        'model_type': model_type,
+                        'table_name': spec['selected_table'],
+                        'table_version': table_version,
+                        'target_column': spec['target_column'],
+                        'feature_columns': list(feature_columns),
+                        'permutation_importance': importance_settings,
+                        'n_rows': spec.get('n_rows'),
+                        'data_profile': data_profile
+                    },
+                    preprocessor=preprocessor
+                )
+        models[model_name] = model
+        if job is not None:
+            job.set_task_status(model_name, DONE)
+    
+    matrix_info = None
+    if matrices is not None:
+        matrix_info = {
+            'sparse': hasattr(matrices['X_train'], 'tocsr'),
+            'n_columns': matrices['X_train'].shape[1],
+            'nbytes': get_matrix_nbytes(matrices['X_train']),
+            'cached': matrices['cached']
+        }
+    
+    return {
+        'results': results,
+        'models': models,
+        'timings': timings,
+        'cached': cached,
+        'preprocessor': preprocessor,
+        'matrix_info': matrix_info,
+        'X_test': X_test,
+        'y_test': y_test,
+        'model_type': model_type,
+        'selected_models': [m for m in spec['selected_models'] if m in results],
+        'selected_table': spec['selected_table'],
+        'target_column': spec['target_column'],
+        'feature_columns': feature_columns,
+        'registry_keys': registry_keys,
+        'importance_settings': importance_settings
+    }
+
+def matches_selection(run, selected_table, target_column, feature_columns, model_type):
+    """Indica si un entrenamiento corresponde a la tabla, el objetivo y las variables seleccionados"""
+    return (
+        run['selected_table'] == selected_table
+        and run['target_column'] == target_column
+        and list(run['feature_columns']) == list(feature_columns)
+        and run['model_type'] == model_type
+        and run.get('mode') is None
+    )
+
+def show_training_results(run):
+    """Muestra los resultados de un entrenamiento guardado en la sesión"""
+    results = run['results']
+    models = run['models']
+    timings = run['timings']
+    cached = run['cached']
+    preprocessor = run['preprocessor']
+    y_test = run['y_test']
+    model_type = run['model_type']
+    selected_models = run['selected_models']
+    
+    matrix_info = run['matrix_info']
+    if matrix_info is not None:
+        st.caption(
+            f"Matriz de características: {'CSR dispersa' if matrix_info['sparse'] else 'densa'} "
+            f"float32 · {matrix_info['n_columns']} columnas · "
+            f"{matrix_info['nbytes'] / 1024 / 1024:.2f} MB"
+            f"{' (desde caché)' if matrix_info['cached'] else ''}"
+        )
+    
+    # Mostrar resultados
+    st.header("📊 Resultados de los Modelos")
+    
+    # Crear columnas para los resultados
+    cols = st.columns(len(selected_models))
+    
+    for i, model_name in enumerate(selected_models):
+        with cols[i]:
+            st.subheader(model_name)
+            if model_type == "Clasificación":
+                st.metric("Precisión", f"{results[model_name]['score']:.4f}")
+            else:
+                st.metric("R²", f"{results[model_name]['score']:.4f}")
+                st.metric("MSE", f"{get_result_metrics(results[model_name], y_test, model_type)['mse']:.4f}")
+            variant = results[model_name].get('variant', "Estándar")
+            if variant != "Estándar":
+                st.warning(f"Variante para grandes volúmenes: {variant}")
+            st.caption(
+                f"{'⚡ Desde el registro' if cached[model_name] else 'Entrenado ahora'} · "
+                f"Entrenamiento: {timings[model_name]['fit_time']:.3f} s · "
+                f"Predicción: {timings[model_name]['predict_time']:.3f} s"
+            )
+            st.text("Reporte:")
+            st.text(results[model_name]['report'])
+    
+    # Curvas de aprendizaje del muestreo adaptativo
+    curve_models = [m for m in selected_models if results[m].get('learning_curve') is not None]
+    if curve_models:
+        st.header("📉 Curvas de Aprendizaje")
+        for model_name in curve_models:
+            learning_curve = results[model_name]['learning_curve']
+            st.subheader(model_name)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric(
+                    "Filas usadas", f"{learning_curve['chosen_rows']:,}",
+                    f"{learning_curve['chosen_rows'] / learning_curve['full_rows']:.0%} del total", delta_color="off"
+                )
+            with col2:
+                st.metric("Entrenamiento completo (estimado)", f"{learning_curve['estimated_full_fit_time']:.2f} s")
+            with col3:
+                st.metric("Tiempo ahorrado (estimado)", f"{learning_curve['time_saved']:.2f} s")
+            st.plotly_chart(px.line(
+                learning_curve['curve'], x='rows', y='score', markers=True, log_x=True,
+                title=f"Curva de Aprendizaje - {model_name}",
+                labels={'rows': 'Filas de entrenamiento', 'score': 'Puntuación en validación'}
+            ))
+    
+    # Coste de cada modelo junto a sus métricas
+    st.header("⏱️ Coste de los Modelos")
+    st.dataframe(format_cost_table(timings), use_container_width=True)
+    
+    with st.expander("Historial de ejecuciones"):
+        history = load_runs(table_name=run['selected_table'], target_column=run['target_column'])
+        if history.empty:
+            st.info("Todavía no hay ejecuciones registradas para esta tabla y variable objetivo.")
+        else:
+            history['fecha'] = pd.to_datetime(history['timestamp'], unit='s')
+            st.dataframe(history[[
+                col for col in [
+                    'fecha', 'model_name', 'variant', 'n_train', 'score', 'fit_time',
+                    'fit_cpu_time', 'fit_peak_rss_delta', 'predict_time',
+                    'predict_latency_per_row', 'model_size_bytes'
+                ] if col in history.columns
+            ]].sort_values('fecha', ascending=False), use_container_width=True)
+    
+    # Gráficas específicas según el tipo de modelo
+    st.header("📈 Visualizaciones")
+    
+    for model_name in selected_models:
+        st.subheader(f"Gráficas - {model_name}")
+    
+        if model_type == "Clasificación":
+            # Matriz de confusión
+            metrics = get_result_metrics(results[model_name], y_test, model_type)
+            st.plotly_chart(plot_confusion_matrix(metrics, model_name))
+            
+            # Curvas ROC y precisión-recall
+            if metrics['curves']:
+                st.plotly_chart(plot_roc_curve(metrics, model_name))
+                st.plotly_chart(plot_pr_curve(metrics, model_name))
+        else:
+            # Gráfica de predicciones vs valores reales
+            st.plotly_chart(plot_regression_results(y_test, results[model_name]['predictions'], model_name))
+    
+    # Importancia de características
+    st.header("📊 Importancia de Características")
+    
+    importance_models = [m for m in selected_models if m in ["Árbol de Decisión", "Random Forest", "XGBoost"]]
+    if importance_models:
+        cols = st.columns(len(importance_models))
+    
+        for i, model_name in enumerate(importance_models):
+            with cols[i]:
+                importance = pd.DataFrame({
+                    'Característica': get_feature_names(preprocessor),
+                    'Importancia': models[model_name].feature_importances_
+                }).sort_values('Importancia', ascending=False)
+    
+                # Mostrar gráfica de importancia
+                st.plotly_chart(plot_feature_importance(importance, model_name))
+    
+                # Mostrar tabla de importancia
+                st.dataframe(importance, use_container_width=True)
+    
+    # Importancia por permutación (todos los modelos, calculada durante el entrenamiento)
+    permutation_models = [m for m in selected_models if results[m].get('permutation_importance') is not None]
+    if permutation_models:
+        st.header("🔀 Importancia por Permutación")
+        for model_name in permutation_models:
+            permutation = results[model_name]['permutation_importance']
+            st.subheader(model_name)
+            st.caption(
+                f"{permutation['settings']['sample_size']:,} filas de prueba · "
+                f"{permutation['settings']['n_repeats']} repeticiones · "
+                f"calculada en {permutation['time']:.2f} s"
+            )
+            st.plotly_chart(plot_permutation_importance(
+                permutation['table'], model_name, permutation['settings']['confidence_level']
+            ))
+            st.dataframe(permutation['table'], use_container_width=True)
+    
+    show_onnx_export(run)
+
+def show_onnx_export(run):
+    """Exporta un modelo entrenado a ONNX y lo compara con el original"""
+    with st.expander("⚡ Exportar a ONNX (inferencia de baja latencia)"):
+        if not ONNX_AVAILABLE:
+            st.warning("Instala skl2onnx, onnxmltools y onnxruntime para exportar modelos a ONNX.")
+            return
+        if run['preprocessor'] is None:
+            st.info("Los modelos sin preprocesamiento asociado no se pueden exportar.")
+            return
+        model_name = st.selectbox("Modelo a exportar", run['selected_models'], key="onnx_model")
+        if not st.button("Exportar y validar", key="onnx_export"):
+            return
+        try:
+            with st.spinner("Convirtiendo a ONNX y midiendo la latencia..."):
+                export = export_and_validate(
+                    run['models'][model_name], run['preprocessor'], run['model_type'],
+                    run['X_test'], registry_key=run.get('registry_keys', {}).get(model_name)
+                )
+        except ValueError as e:
+            # Modelo sin convertidor ONNX: se informa y se puede seguir usando en scikit-learn
+            st.warning(str(e))
+            return
+        except Exception as e:
+            st.error(f"No se pudo exportar {model_name} a ONNX: {str(e)}")
+            return
+        
+        parity = export['parity']
+        if parity['passed']:
+            st.success(f"✅ Paridad verificada sobre {parity['rows']:,} filas de prueba")
+        else:
+            st.error("❌ Las predicciones ONNX difieren de las del modelo original")
+        st.json({k: v for k, v in parity.items() if k != 'passed'})
+        st.subheader("Latencia por tamaño de lote")
+        st.dataframe(export['latency'], use_container_width=True)
+        if export['path'] is not None:
+            st.caption(f"Guardado en el registro: {export['path']}")
+        st.download_button(
+            "Descargar modelo ONNX", export['onnx_bytes'],
+            file_name=f"{model_name}.onnx", mime="application/octet-stream"
+        )
+
+def show_registry_panel():
+    """Muestra el estado del registro de modelos entrenados"""
+    with st.expander("🗄️ Registro de modelos entrenados"):
+        entries = list_entries()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Modelos guardados", len(entries))
+        with col2:
+            st.metric(
+                "Espacio usado",
+                f"{get_registry_size() / 1024 / 1024:.2f} MB de {REGISTRY_MAX_BYTES / 1024 / 1024:.0f} MB"
+            )
+        if entries:
+            st.dataframe(pd.DataFrame([{
+                'Modelo': m.get('model_name'),
+                'Tabla': m.get('table_name'),
+                'Objetivo': m.get('target_column'),
+                'Tamaño (KB)': m.get('size_bytes', 0) / 1024
+            } for m in entries]), use_container_width=True)
+        if st.button("Vaciar registro", key="clear_registry"):
+            clear_registry()
+            st.success("Registro vaciado")
+
 def show():
     st.title("🤖 Modelos de Machine Learning")
     
     try:
-        # Obtener lista de tablas disponibles
-        available_tables = get_available_tables()
+        # Seleccionar tabla (la tabla activa se comparte entre todas las páginas)
+        selected_table = select_table("Selecciona la tabla a analizar")
         
-        if not available_tables:
+        if selected_table is None:
             st.warning("No hay datos disponibles. Por favor, carga datos en la sección 'Cargar Datos'.")
             return
         
-        # Seleccionar tabla
-        selected_table = st.selectbox(
-            "Selecciona la tabla a analizar",
-            available_tables
+        # Modo de entrenamiento: en memoria o por bloques desde la base de datos
+        training_mode = st.radio(
+            "Modo de entrenamiento",
+            [
+                "En memoria",
+                "Fuera de memoria (streaming desde la base de datos)",
+                "Actualización incremental (filas nuevas)"
+            ],
+            horizontal=True
         )
-        
-        # Cargar datos
-        df = load_from_db(selected_table)
-        
-        if df is None or df.empty:
-            st.error("No se pudieron cargar los datos. Por favor, intenta nuevamente.")
+        if training_mode == "Actualización incremental (filas nuevas)":
+            show_incremental_refresh(selected_table)
+            return
+        # Los selectores se construyen con el esquema de la tabla, sin leer sus datos
+        handle = get_dataset(selected_table)
+        column_names = handle.column_names if handle is not None else []
+        if not column_names:
+            st.error("No se pudieron obtener las columnas de la tabla.")
+            return
+        if training_mode != "En memoria":
+            show_out_of_core_training(selected_table, column_names)
             return
         
         # Seleccionar tipo de modelo
@@ -175,117 +865,219 @@ def show():
         # Seleccionar variable objetivo
         target_column = st.selectbox(
             "Selecciona la variable objetivo",
-            df.columns
+            column_names
         )
         
         # Seleccionar variables predictoras
         feature_columns = st.multiselect(
             "Selecciona las variables predictoras",
-            [col for col in df.columns if col != target_column]
+            [col for col in column_names if col != target_column]
         )
         
         if not feature_columns:
             st.warning("Por favor, selecciona al menos una variable predictora.")
             return
         
+        # Cargar solo la variable objetivo y las predictoras
+        df = get_dataframe(selected_table, [target_column] + feature_columns)
+        
+        if df is None or df.empty:
+            st.error("No se pudieron cargar los datos. Por favor, intenta nuevamente.")
+            return
+        
         # Preparar datos
         X = df[feature_columns]
         y = df[target_column]
         
         # Dividir datos en entrenamiento y prueba
         X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
+            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+        )
+        
+        # Sustitución de modelos que no escalan en tablas grandes
+        with st.expander("⚙️ Modo de grandes volúmenes"):
+            large_data_mode = st.checkbox(
+                "Sustituir modelos que no escalan por variantes escalables", value=True
+            )
+            threshold_cols = st.columns(len(LARGE_DATA_THRESHOLDS))
+            thresholds = {}
+            for i, (model_name, default) in enumerate(LARGE_DATA_THRESHOLDS.items()):
+                with threshold_cols[i]:
+                    thresholds[model_name] = st.number_input(
+                        f"Umbral {model_name} (filas)", min_value=1000, value=default, step=1000
+                    )
+            st.markdown("**Tamaño de muestra adaptativo**")
+            adaptive_sampling = st.checkbox(
+                "Entrenar con muestras crecientes y detenerse cuando la puntuación se estabilice", value=False
+            )
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                initial_rows = st.number_input("Muestra inicial (filas)", min_value=100, value=ADAPTIVE_INITIAL_ROWS, step=500)
+            with col2:
+                growth_factor = st.number_input("Factor de crecimiento", min_value=1.5, max_value=4.0, value=ADAPTIVE_GROWTH_FACTOR, step=0.5)
+            with col3:
+                tolerance = st.number_input(
+                    "Mejora mínima", min_value=0.0, max_value=0.1, value=ADAPTIVE_TOLERANCE, step=0.001, format="%.3f"
+                )
+        if not large_data_mode:
+            thresholds = {}
+        sampling_settings = (
+            get_sampling_settings(initial_rows, growth_factor, tolerance) if adaptive_sampling else None
+        )
+        
+        switched = [m for m in selected_models if uses_large_data_variant(m, len(X_train), thresholds)]
+        if switched:
+            st.info(
+                f"📦 Conjunto de entrenamiento grande ({len(X_train):,} filas): "
+                f"se usarán variantes escalables para {', '.join(switched)}."
+            )
+        
+        # Modo de evaluación: división simple o validación cruzada en paralelo
+        evaluation_mode = st.radio(
+            "Modo de evaluación",
+            [
+                "División simple (80/20)",
+                "Validación cruzada (k pliegues en paralelo)",
+                "Búsqueda de hiperparámetros (successive halving)"
+            ],
+            horizontal=True
+        )
+        # Versión de las columnas leídas, no la actual: la clave debe describir los datos de entrenamiento
+        table_version = get_loaded_version(selected_table)
+        if evaluation_mode == "Búsqueda de hiperparámetros (successive halving)":
+            cpu_count = os.cpu_count() or 1
+            search_model = st.selectbox("Modelo a optimizar", selected_models)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                n_candidates = st.number_input("Configuraciones candidatas", 3, 243, 27)
+            with col2:
+                eta = st.number_input("Factor de reducción (eta)", 2, 5, 3)
+            with col3:
+                time_budget = st.number_input("Presupuesto de tiempo (s)", 10, 7200, 120, step=10)
+            with col4:
+                n_jobs = st.slider("Procesos en paralelo", 1, cpu_count, cpu_count)
+            if search_model and st.button("Iniciar Búsqueda"):
+                run_hyperparameter_search(
+                    search_model, model_type, target_column, X_train, X_test, y_train, y_test,
+                    table_version, int(n_candidates), int(eta), float(time_budget), n_jobs, thresholds
+                )
+            return
+        if evaluation_mode != "División simple (80/20)":
+            cpu_count = os.cpu_count() or 1
+            col1, col2 = st.columns(2)
+            with col1:
+                n_splits = st.slider("Número de pliegues", 3, 10, 5)
+            with col2:
+                n_jobs = st.slider("Procesos en paralelo", 1, cpu_count, cpu_count)
+            if selected_models and st.button("Ejecutar Validación Cruzada"):
+                run_cross_validation(selected_models, model_type, X, y, n_splits, n_jobs, thresholds)
+            return
+        
+        # Importancia por permutación para todos los modelos (se guarda con el modelo en el registro)
+        with st.expander("🔀 Importancia por permutación"):
+            compute_importance = st.checkbox("Calcular importancia por permutación", value=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                importance_sample = st.number_input(
+                    "Filas de prueba evaluadas", min_value=100, value=PERMUTATION_SAMPLE_SIZE, step=500
+                )
+            with col2:
+                importance_repeats = st.number_input(
+                    "Repeticiones por variable", min_value=2, max_value=50, value=PERMUTATION_REPEATS
+                )
+        importance_settings = (
+            get_importance_settings(importance_sample, importance_repeats) if compute_importance else None
         )
         
-        # Entrenar modelos
-        if st.button("Entrenar Modelos"):
-            with st.spinner("Entrenando modelos..."):
-                results = {}
-                models = {}
-                
-                for model_name in selected_models:
-                    model = get_model(model_name, model_type)
-                    model.fit(X_train, y_train)
-                    pred = model.predict(X_test)
-                    
-                    if model_type == "Clasificación":
-                        score = accuracy_score(y_test, pred)
-                        report = classification_report(y_test, pred)
-                        # Obtener probabilidades para la curva ROC
-                        if hasattr(model, 'predict_proba'):
-                            pred_proba = model.predict_proba(X_test)[:, 1]
-                        else:
-                            pred_proba = pred
-                    else:
-                        score = r2_score(y_test, pred)
-                        mse = mean_squared_error(y_test, pred)
-                        report = f"MSE: {mse:.4f}"
-                    
-                    results[model_name] = {
-                        'score': score,
-                        'report': report,
-                        'predictions': pred,
-                        'pred_proba': pred_proba if model_type == "Clasificación" else None
-                    }
-                    models[model_name] = model
-                
-                # Mostrar resultados
-                st.header("📊 Resultados de los Modelos")
-                
-                # Crear columnas para los resultados
-                cols = st.columns(len(selected_models))
-                
-                for i, model_name in enumerate(selected_models):
-                    with cols[i]:
-                        st.subheader(model_name)
-                        if model_type == "Clasificación":
-                            st.metric("Precisión", f"{results[model_name]['score']:.4f}")
-                        else:
-                            st.metric("R²", f"{results[model_name]['score']:.4f}")
-                            st.metric("MSE", f"{mean_squared_error(y_test, results[model_name]['predictions']):.4f}")
-                        st.text("Reporte:")
-                        st.text(results[model_name]['report'])
-                
-                # Gráficas específicas según el tipo de modelo
-                st.header("📈 Visualizaciones")
-                
-                for model_name in selected_models:
-                    st.subheader(f"Gráficas - {model_name}")
-                    
-                    if model_type == "Clasificación":
-                        # Matriz de confusión
-                        st.plotly_chart(plot_confusion_matrix(y_test, results[model_name]['predictions'], model_name))
-                        
-                        # Curva ROC
-                        st.plotly_chart(plot_roc_curve(y_test, results[model_name]['pred_proba'], model_name))
-                    else:
-                        # Gráfica de predicciones vs valores reales
-                        st.plotly_chart(plot_regression_results(y_test, results[model_name]['predictions'], model_name))
-                
-                # Importancia de características
-                st.header("📊 Importancia de Características")
-                
-                importance_models = [m for m in selected_models if m in ["Árbol de Decisión", "Random Forest", "XGBoost"]]
-                if importance_models:
-                    cols = st.columns(len(importance_models))
-                    
-                    for i, model_name in enumerate(importance_models):
-                        with cols[i]:
-                            importance = pd.DataFrame({
-                                'Característica': feature_columns,
-                                'Importancia': models[model_name].feature_importances_
-                            }).sort_values('Importancia', ascending=False)
-                            
-                            # Mostrar gráfica de importancia
-                            st.plotly_chart(plot_feature_importance(importance, model_name))
-                            
-                            # Mostrar tabla de importancia
-                            st.dataframe(importance, use_container_width=True)
-                
-                # Guardar modelos en la sesión
-                st.session_state['models'] = models
-                st.session_state['feature_columns'] = feature_columns
-                st.session_state['results'] = results
+        # Claves del registro para reutilizar modelos ya entrenados con los mismos datos
+        registry_keys = {}
+        if table_version is not None:
+            for model_name in selected_models:
+                registry_keys[model_name] = get_registry_key(
+                    get_model(model_name, model_type), model_name,
+                    table_version, target_column, feature_columns,
+                    large_data=uses_large_data_variant(model_name, len(X_train), thresholds),
+                    sampling=sampling_settings
+                )
+        all_cached = bool(selected_models) and len(registry_keys) == len(selected_models) and all(
+            has_entry(key) and (
+                importance_settings is None
+                or (load_metadata(key) or {}).get('permutation_importance') == importance_settings
+            )
+            for key in registry_keys.values()
+        )
+        
+        show_registry_panel()
+        if use_dask():
+            cluster = get_cluster_info()
+            st.caption(
+                f"🖧 Entrenamiento distribuido con Dask: {cluster['workers']} trabajadores, "
+                f"{cluster['threads']} hilos · {cluster['dashboard']}"
+            )
+        
+        if all_cached:
+            st.info("⚡ Todos los modelos seleccionados están en el registro. Resultados cargados sin reentrenar.")
+        
+        # Entrenamiento en segundo plano: el trabajo sobrevive a los reruns de la página
+        spec = {
+            'selected_models': selected_models,
+            'model_type': model_type,
+            'X_train': X_train,
+            'X_test': X_test,
+            'y_train': y_train,
+            'y_test': y_test,
+            'table_version': table_version,
+            'selected_table': selected_table,
+            'target_column': target_column,
+            'feature_columns': feature_columns,
+            'thresholds': thresholds,
+            'registry_keys': registry_keys,
+            'importance_settings': importance_settings,
+            'sampling_settings': sampling_settings,
+            'n_rows': len(df),
+            'distributed': use_dask()
+        }
+        
+        job_id = st.session_state.get('training_job_id')
+        if job_id is not None:
+            job = watch_job(job_id, key_prefix="training")
+            if job is None:
+                # El servidor se reinició o el trabajo fue descartado
+                del st.session_state['training_job_id']
+            elif job.status in (DONE, CANCELLED):
+                # La sesión recoge el resultado una sola vez y el trabajo deja de retenerlo
+                run = job.take_result()
+                if run is not None and run['results']:
+                    run['cancelled'] = job.status == CANCELLED
+                    store_object('training_run', run)
+                    del st.session_state['training_job_id']
+        
+        if all_cached:
+            # Los modelos del registro se cargan una sola vez por selección, no en cada rerun
+            run = get_object('training_run')
+            if run is None or run.get('registry_keys') != registry_keys \
+                    or run.get('importance_settings') != importance_settings:
+                with st.spinner("Cargando modelos del registro..."):
+                    store_object('training_run', train_selected_models(None, spec))
+        elif st.button("Entrenar Modelos") and selected_models:
+            st.session_state['training_job_id'] = get_job_manager().submit(
+                f"Entrenamiento: {selected_table} → {target_column}",
+                get_session_id(), selected_models, train_selected_models, spec
+            )
+            # Volver a ejecutar la página para mostrar el estado del trabajo recién encolado
+            st.rerun()
+        
+        run = get_object('training_run')
+        if run is not None:
+            if matches_selection(run, selected_table, target_column, feature_columns, model_type):
+                if run.get('cancelled'):
+                    st.warning("Entrenamiento cancelado: se muestran los modelos que alcanzaron a terminar.")
+                show_training_results(run)
+            else:
+                st.info(
+                    f"El último entrenamiento corresponde a {run['selected_table']} → {run['target_column']} "
+                    "con otras variables o tipo de modelo; vuelve a esa selección para ver sus resultados."
+                )
     
     except Exception as e:
         st.error(f"Error en los modelos: {str(e)}")
@@ -0,0 +1,403 @@
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import xgboost as xgb
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+from pages.model_registry import get_onnx_path, write_atomic, enforce_size_limit
+from pages.preprocessing import make_inference_pipeline, _as_numeric, _as_categories, _to_float32, MISSING_CATEGORY
+
+try:
+    import onnxruntime as ort
+    from skl2onnx import convert_sklearn, update_registered_converter
+    from skl2onnx.common.data_types import FloatTensorType, StringTensorType
+    from skl2onnx.common.shape_calculator import (
+        calculate_linear_classifier_output_shapes, calculate_linear_regressor_output_shapes
+    )
+    from skl2onnx.operator_converters.function_transformer import convert_sklearn_function_transformer
+    from skl2onnx.shape_calculators.function_transformer import (
+        calculate_sklearn_function_transformer_output_shapes
+    )
+    from skl2onnx.operator_converters.one_hot_encoder import convert_sklearn_one_hot_encoder
+    from skl2onnx.shape_calculators.one_hot_encoder import calculate_sklearn_one_hot_encoder_output_shapes
+    from skl2onnx.algebra.onnx_ops import (
+        OnnxEqual, OnnxWhere, OnnxGather, OnnxOneHotEncoder, OnnxReshape, OnnxReduceSumApi11,
+        OnnxSub, OnnxConcat, OnnxShape, OnnxConstantOfShape
+    )
+    from onnx import numpy_helper
+    from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Conversiones de tipo del preprocesamiento: en ONNX se aplican al preparar las entradas
+_INPUT_CONVERSIONS = (_as_numeric, _as_categories, _to_float32)
+
+class _IdentityFunction:
+    func = None
+
+def _as_identity(operator, fn, *args):
+    """Convierte las conversiones de tipo del preprocesamiento como la identidad"""
+    raw_operator = operator.raw_operator
+    if raw_operator.func in _INPUT_CONVERSIONS:
+        operator.raw_operator = _IdentityFunction()
+    try:
+        return fn(*args)
+    finally:
+        operator.raw_operator = raw_operator
+
+def _function_transformer_shape(operator):
+    return _as_identity(operator, calculate_sklearn_function_transformer_output_shapes, operator)
+
+def _function_transformer_converter(scope, operator, container):
+    return _as_identity(operator, convert_sklearn_function_transformer, scope, operator, container)
+
+class SparseZerosAsMissing(BaseEstimator, TransformerMixin):
+    """XGBoost trata las entradas ausentes de una matriz CSR como faltantes, no como ceros.
+
+    Solo se usa al exportar: en el grafo ONNX la matriz es densa y los ceros deben
+    volver a marcarse como faltantes para reproducir las predicciones originales.
+    """
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        X = X.toarray() if sp.issparse(X) else np.array(X, dtype=np.float32)
+        X[X == 0] = np.nan
+        return X
+
+def _zeros_as_missing_shape(operator):
+    operator.outputs[0].type = operator.inputs[0].type.__class__(operator.inputs[0].type.shape)
+
+def _zeros_as_missing_converter(scope, operator, container):
+    opv = container.target_opset
+    is_zero = OnnxEqual(operator.inputs[0], np.array([0], dtype=np.float32), op_version=opv)
+    result = OnnxWhere(
+        is_zero, np.array([np.nan], dtype=np.float32), operator.inputs[0],
+        op_version=opv, output_names=operator.outputs[:1]
+    )
+    result.add_to(scope, container)
+
+def _has_infrequent(encoder):
+    """Indica si el codificador agrupó categorías poco frecuentes en una columna propia"""
+    return getattr(encoder, '_infrequent_enabled', False) and any(
+        infrequent is not None for infrequent in encoder.infrequent_categories_
+    )
+
+def _one_hot_shape(operator):
+    encoder = operator.raw_operator
+    if not _has_infrequent(encoder):
+        return calculate_sklearn_one_hot_encoder_output_shapes(operator)
+    # Una columna por categoría frecuente y una más por variable con categorías agrupadas
+    n_columns = len(encoder.get_feature_names_out())
+    operator.outputs[0].type = FloatTensorType([operator.inputs[0].get_first_dimension(), n_columns])
+
+def _one_hot_converter(scope, operator, container):
+    """One-hot con categorías poco frecuentes (el convertidor de skl2onnx no las admite).
+
+    Cada variable se codifica con sus categorías frecuentes; la columna de poco frecuentes
+    vale 1 cuando ninguna frecuente está activa, lo que con handle_unknown='infrequent_if_exist'
+    incluye también los valores no vistos en el entrenamiento, igual que en scikit-learn.
+    """
+    encoder = operator.raw_operator
+    if not _has_infrequent(encoder) or encoder.handle_unknown != 'infrequent_if_exist' \
+            or len(operator.inputs) != 1 or encoder.drop_idx_ is not None:
+        return convert_sklearn_one_hot_encoder(scope, operator, container)
+    opv = container.target_opset
+    ones = numpy_helper.from_array(np.array([1], dtype=np.float32))
+    blocks = []
+    for index, categories in enumerate(encoder.categories_):
+        column = OnnxGather(operator.inputs[0], np.array([index], dtype=np.int64), axis=1, op_version=opv)
+        infrequent = encoder.infrequent_categories_[index]
+        frequent = [str(c) for c in categories if infrequent is None or c not in set(infrequent)]
+        encoded = None
+        if frequent:
+            encoded = OnnxReshape(
+                OnnxOneHotEncoder(column, cats_strings=frequent, zeros=1, op_version=1),
+                np.array([-1, len(frequent)], dtype=np.int64), op_version=opv
+            )
+            blocks.append(encoded)
+        if infrequent is None:
+            continue
+        if encoded is None:
+            blocks.append(OnnxConstantOfShape(OnnxShape(column, op_version=opv), value=ones, op_version=opv))
+        else:
+            blocks.append(OnnxSub(
+                np.array([1], dtype=np.float32),
+                OnnxReduceSumApi11(encoded, axes=[1], keepdims=1, op_version=opv), op_version=opv
+            ))
+    OnnxConcat(*blocks, axis=1, op_version=opv, output_names=operator.outputs[:1]).add_to(scope, container)
+
+# Convertidores de pasos de scikit-learn que se sustituyen solo en las exportaciones de este
+# módulo (se pasan a convert_sklearn): los registrados en skl2onnx no cambian para el proceso
+_CUSTOM_CONVERTERS = {
+    OneHotEncoder: _one_hot_converter,
+    FunctionTransformer: _function_transformer_converter
+}
+_CUSTOM_SHAPE_CALCULATORS = {
+    OneHotEncoder: _one_hot_shape,
+    FunctionTransformer: _function_transformer_shape
+}
+
+if ONNX_AVAILABLE:
+    update_registered_converter(
+        SparseZerosAsMissing, 'CeroComoFaltante', _zeros_as_missing_shape, _zeros_as_missing_converter
+    )
+    # skl2onnx no incluye los convertidores de XGBoost: se registran los de onnxmltools
+    update_registered_converter(
+        xgb.XGBClassifier, 'XGBoostXGBClassifier',
+        calculate_linear_classifier_output_shapes, convert_xgboost,
+        options={'nocl': [True, False], 'zipmap': [True, False, 'columns']}
+    )
+    update_registered_converter(
+        xgb.XGBRegressor, 'XGBoostXGBRegressor',
+        calculate_linear_regressor_output_shapes, convert_xgboost
+    )
+
+# El dominio ai.onnx.ml 3 es el último soportado por el convertidor de XGBoost
+TARGET_OPSET = {'': 17, 'ai.onnx.ml': 3}
+BENCHMARK_BATCH_SIZES = (1, 100, 10000)
+# Tolerancias de la comprobación de paridad (ONNX calcula en float32)
+PARITY_LABEL_AGREEMENT = 0.999
+PARITY_PROBA_TOLERANCE = 1e-3
+PARITY_REGRESSION_RTOL = 1e-3
+# Filas de prueba por variable con categorías agrupadas, y valor no visto en el entrenamiento
+PROBE_ROWS = 50
+UNSEEN_CATEGORY = '__no_visto__'
+
+def _final_estimator(model):
+    """Último paso del modelo (los modelos de grandes volúmenes son pipelines)"""
+    return model.steps[-1][1] if isinstance(model, Pipeline) else model
+
+def _has_sparse_output(preprocessor):
+    """Indica si el preprocesamiento ajustado produce matrices CSR"""
+    if not isinstance(preprocessor, Pipeline):
+        return False
+    return any(
+        getattr(step, 'sparse_output_', False) or _has_sparse_output(step)
+        for _, step in preprocessor.steps
+    )
+
+def get_input_columns(pipeline):
+    """Columnas de entrada del preprocesamiento: numéricas (float) y categóricas (texto)"""
+    steps = pipeline.steps if isinstance(pipeline, Pipeline) else []
+    for _, step in steps:
+        if isinstance(step, Pipeline):
+            columns = get_input_columns(step)
+            if columns is not None:
+                return columns
+        if isinstance(step, ColumnTransformer):
+            numeric, categorical = [], []
+            for name, _, columns in step.transformers_:
+                if name == 'remainder':
+                    continue
+                (numeric if name == 'numericas' else categorical).extend(columns)
+            return numeric, categorical
+    return None
+
+def export_model_to_onnx(model, preprocessor, model_type, n_features=None):
+    """Convierte el preprocesamiento y el modelo a un único grafo ONNX.
+
+    Cada variable original es una entrada del grafo; sin preprocesamiento la entrada es
+    la matriz float32 de n_features columnas.
+    """
+    if not ONNX_AVAILABLE:
+        raise ImportError("Instala skl2onnx, onnxmltools y onnxruntime para exportar a ONNX")
+    pipeline = make_inference_pipeline(preprocessor, model)
+    if isinstance(_final_estimator(model), (xgb.XGBClassifier, xgb.XGBRegressor)) and _has_sparse_output(preprocessor):
+        pipeline = Pipeline([
+            ('preprocesamiento', preprocessor),
+            ('ceros_como_faltantes', SparseZerosAsMissing()),
+            ('modelo', model)
+        ])
+    columns = get_input_columns(pipeline)
+    if columns is not None:
+        numeric, categorical = columns
+        initial_types = (
+            [(col, FloatTensorType([None, 1])) for col in numeric]
+            + [(col, StringTensorType([None, 1])) for col in categorical]
+        )
+    else:
+        initial_types = [('X', FloatTensorType([None, n_features]))]
+    options = None
+    if model_type == "Clasificación":
+        # Probabilidades como tensor en lugar de una lista de diccionarios
+        options = {id(_final_estimator(model)): {'zipmap': False}}
+    try:
+        onnx_model = convert_sklearn(
+            pipeline, initial_types=initial_types, options=options, target_opset=TARGET_OPSET,
+            custom_conversion_functions=_CUSTOM_CONVERTERS, custom_shape_calculators=_CUSTOM_SHAPE_CALCULATORS
+        )
+    except (NotImplementedError, RuntimeError) as e:
+        # Modelo o paso del preprocesamiento sin convertidor ONNX
+        raise ValueError(f"{type(_final_estimator(model)).__name__} no es exportable a ONNX: {str(e)}") from e
+    return onnx_model.SerializeToString()
+
+def save_onnx_model(key, onnx_bytes):
+    """Guarda el modelo ONNX junto a su entrada del registro"""
+    path = get_onnx_path(key)
+
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            f.write(onnx_bytes)
+
+    write_atomic(path, write)
+    # La exportación cuenta en el tamaño de su entrada
+    enforce_size_limit(keep=key)
+    return path
+
+def _numeric_input(column):
+    """Equivalente vectorizado de _as_numeric para una columna"""
+    if pd.api.types.is_datetime64_any_dtype(column.dtype):
+        values = column.astype('int64').to_numpy()
+    elif pd.api.types.is_bool_dtype(column.dtype) or pd.api.types.is_numeric_dtype(column.dtype):
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64)
+    return values.astype(np.float32).reshape(-1, 1)
+
+def _categorical_input(column):
+    """Equivalente vectorizado de _as_categories para una columna"""
+    values = column.to_numpy(dtype=object).copy()
+    values[pd.isna(values)] = MISSING_CATEGORY
+    return values.astype(str).reshape(-1, 1)
+
+class OnnxPredictor:
+    """Predicción con onnxruntime sobre los datos sin procesar, con la misma interfaz que sklearn"""
+
+    def __init__(self, onnx_bytes, model_type="Clasificación"):
+        if not ONNX_AVAILABLE:
+            raise ImportError("Instala onnxruntime para usar modelos ONNX")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_bytes, options, providers=['CPUExecutionProvider'])
+        self.model_type = model_type
+        self.inputs = {
+            node.name: node.type == 'tensor(string)' for node in self.session.get_inputs()
+        }
+
+    def prepare_inputs(self, X):
+        """Convierte el DataFrame a las entradas del grafo, una por variable"""
+        if list(self.inputs) == ['X']:
+            matrix = X.toarray() if sp.issparse(X) else X
+            return {'X': np.asarray(matrix, dtype=np.float32)}
+        return {
+            name: _categorical_input(X[name]) if is_string else _numeric_input(X[name])
+            for name, is_string in self.inputs.items()
+        }
+
+    def _run(self, X):
+        return self.session.run(None, self.prepare_inputs(X))
+
+    def predict(self, X):
+        outputs = self._run(X)
+        return outputs[0] if self.model_type == "Clasificación" else outputs[0].ravel()
+
+    def predict_proba(self, X):
+        if self.model_type != "Clasificación":
+            raise AttributeError("predict_proba solo está disponible en clasificación")
+        return self._run(X)[1]
+
+def check_parity(original, predictor, X, model_type):
+    """Compara las predicciones del modelo original y del modelo ONNX sobre los mismos datos"""
+    expected = original.predict(X)
+    actual = predictor.predict(X)
+    if model_type == "Clasificación":
+        agreement = float(np.mean(np.asarray(expected).astype(str) == np.asarray(actual).astype(str)))
+        proba_diff = None
+        if hasattr(original, 'predict_proba'):
+            proba_diff = float(np.max(np.abs(original.predict_proba(X) - predictor.predict_proba(X))))
+        passed = agreement >= PARITY_LABEL_AGREEMENT and (
+            proba_diff is None or proba_diff <= PARITY_PROBA_TOLERANCE
+        )
+        return {
+            'rows': len(X),
+            'label_agreement': agreement,
+            'max_proba_diff': proba_diff,
+            'passed': passed
+        }
+    expected = np.asarray(expected, dtype=float)
+    diff = np.abs(expected - np.asarray(actual, dtype=float))
+    scale = max(float(np.max(np.abs(expected))), 1e-12)
+    return {
+        'rows': len(X),
+        'max_abs_diff': float(diff.max()),
+        'max_rel_diff': float(diff.max() / scale),
+        'passed': bool(diff.max() / scale <= PARITY_REGRESSION_RTOL)
+    }
+
+def make_category_probe(preprocessor, X, n_rows=PROBE_ROWS):
+    """Filas de prueba con una categoría poco frecuente y otra no vista en cada variable agrupada.
+
+    El conjunto de prueba puede no contener ninguna; sin estas filas la paridad no
+    cubriría la columna de poco frecuentes del one-hot.
+    """
+    if not isinstance(preprocessor, Pipeline) or 'columnas' not in preprocessor.named_steps:
+        return None
+    base = X.head(n_rows)
+    probes = []
+    for _, transformer, columns in preprocessor.named_steps['columnas'].transformers_:
+        steps = transformer.steps if isinstance(transformer, Pipeline) else []
+        for _, step in steps:
+            if not (isinstance(step, OneHotEncoder) and _has_infrequent(step)):
+                continue
+            for col, infrequent in zip(columns, step.infrequent_categories_):
+                if infrequent is None:
+                    continue
+                for value in (infrequent[0], UNSEEN_CATEGORY):
+                    probe = base.copy()
+                    probe[col] = pd.Series(value, index=probe.index, dtype=object)
+                    probes.append(probe)
+    return pd.concat(probes, ignore_index=True) if probes else None
+
+def _time_call(fn, X, min_time=0.2, max_repeats=200):
+    """Mediana del tiempo de una llamada, repitiendo las llamadas rápidas"""
+    fn(X)  # calentamiento
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_repeats and (len(times) < 3 or time.perf_counter() - start < min_time):
+        call_start = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - call_start)
+    return float(np.median(times))
+
+def benchmark_latency(original, predictor, X, batch_sizes=BENCHMARK_BATCH_SIZES, random_state=42):
+    """Latencia del modelo original frente al ONNX por tamaño de lote (incluye el preprocesamiento)"""
+    rng = np.random.default_rng(random_state)
+    rows = []
+    for batch_size in batch_sizes:
+        # Muestreo con reemplazo cuando el conjunto de prueba es menor que el lote
+        indices = rng.choice(len(X), size=batch_size, replace=batch_size > len(X))
+        batch = X.iloc[indices]
+        original_time = _time_call(original.predict, batch)
+        onnx_time = _time_call(predictor.predict, batch)
+        rows.append({
+            'Tamaño de lote': batch_size,
+            'Original (ms)': original_time * 1000,
+            'ONNX (ms)': onnx_time * 1000,
+            'Aceleración': original_time / onnx_time if onnx_time > 0 else None,
+            'Filas/s ONNX': batch_size / onnx_time if onnx_time > 0 else None
+        })
+    return pd.DataFrame(rows)
+
+def export_and_validate(model, preprocessor, model_type, X_test, registry_key=None):
+    """Exporta el modelo, comprueba la paridad y compara la latencia con el original"""
+    onnx_bytes = export_model_to_onnx(model, preprocessor, model_type)
+    original = make_inference_pipeline(preprocessor, model)
+    predictor = OnnxPredictor(onnx_bytes, model_type)
+    path = save_onnx_model(registry_key, onnx_bytes) if registry_key is not None else None
+    parity = check_parity(original, predictor, X_test, model_type)
+    probe = make_category_probe(preprocessor, X_test)
+    if probe is not None:
+        parity['categorias_agrupadas'] = check_parity(original, predictor, probe, model_type)
+        parity['passed'] = parity['passed'] and parity['categorias_agrupadas']['passed']
+    return {
+        'onnx_bytes': onnx_bytes,
+        'path': path,
+        'parity': parity,
+        'latency': benchmark_latency(original, predictor, X_test)
+    }
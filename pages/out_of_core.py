@@ -0,0 +1,478 @@
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import streamlit as st
+import xgboost as xgb
+import plotly.graph_objects as go
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline
+from sklearn.base import BaseEstimator
+from sklearn.metrics import auc
+from pages.utils import iter_table_chunks, get_distinct_values, get_table_version, count_table_rows
+from pages.preprocessing import build_preprocessor, get_preprocessing_config, make_inference_pipeline
+from pages.model_registry import make_registry_key, load_entry, save_entry
+from pages.profiling import profile_call, get_model_size_bytes, record_run, format_cost_table
+from pages.drift import build_profile
+from pages.memory_governor import store_object
+
+OUT_OF_CORE_MODELS = {
+    "Clasificación": ["SGD (partial_fit)", "XGBoost (memoria externa)"],
+    "Regresión": ["SGD (partial_fit)", "XGBoost (memoria externa)"]
+}
+DEFAULT_CHUNKSIZE = int(os.getenv('OUT_OF_CORE_CHUNKSIZE', '50000'))
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+XGBOOST_ROUNDS = 100
+# Resolución del histograma de probabilidades con el que se aproxima el AUC en streaming
+AUC_BINS = 1000
+HOLDOUT_BUCKETS = 10000
+
+def holdout_mask(chunk, test_size=TEST_SIZE):
+    """Asigna cada fila al conjunto de prueba según un hash de su contenido (independiente del orden de lectura)"""
+    hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    return (hashes % HOLDOUT_BUCKETS) < int(test_size * HOLDOUT_BUCKETS)
+
+def split_chunk(chunk, target_column, feature_columns, holdout, test_size=TEST_SIZE):
+    """Retorna las variables y el objetivo de las filas de entrenamiento (o de prueba) de un bloque"""
+    chunk = chunk[chunk[target_column].notna()]
+    mask = holdout_mask(chunk[feature_columns + [target_column]], test_size)
+    selected = chunk[mask] if holdout else chunk[~mask]
+    return selected[feature_columns], selected[target_column]
+
+class BoosterModel(BaseEstimator):
+    """Adaptador con la interfaz de scikit-learn para un Booster entrenado con memoria externa"""
+
+    def __init__(self, booster, classes=None):
+        self.booster = booster
+        self.classes = classes
+        self.classes_ = classes
+
+    def __sklearn_is_fitted__(self):
+        return True
+
+    def fit(self, X, y=None):
+        raise NotImplementedError("Este modelo se entrena por bloques con train_out_of_core")
+
+    def _raw_predict(self, X):
+        return self.booster.predict(xgb.DMatrix(X))
+
+    def predict(self, X):
+        output = self._raw_predict(X)
+        if self.classes_ is None:
+            return output
+        if output.ndim == 1:
+            return self.classes_[(output >= 0.5).astype(int)]
+        return self.classes_[output.argmax(axis=1)]
+
+    def predict_proba(self, X):
+        output = self._raw_predict(X)
+        if output.ndim == 1:
+            return np.column_stack([1 - output, output])
+        return output
+
+    @property
+    def feature_importances_(self):
+        scores = self.booster.get_score(importance_type='gain')
+        importances = np.array([scores.get(f"f{i}", 0.0) for i in range(self.booster.num_features())])
+        total = importances.sum()
+        return importances / total if total > 0 else importances
+
+class ChunkIterator(xgb.DataIter):
+    """Iterador de bloques para construir un DMatrix de memoria externa"""
+
+    def __init__(self, chunk_source, prepare, cache_prefix):
+        self._chunk_source = chunk_source
+        self._prepare = prepare
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = iter(self._chunk_source())
+        for chunk in self._chunks:
+            X, y = self._prepare(chunk)
+            if len(y) == 0:
+                continue
+            input_data(data=X, label=y)
+            return True
+        return False
+
+    def reset(self):
+        self._chunks = None
+
+def _fit_sgd(model_type, classes, chunk_source, prepare, n_epochs, progress_callback):
+    """Entrena un modelo SGD con partial_fit recorriendo los bloques de entrenamiento"""
+    if model_type == "Clasificación":
+        model = SGDClassifier(loss='log_loss', random_state=RANDOM_STATE)
+    else:
+        model = SGDRegressor(random_state=RANDOM_STATE)
+    # El escalado se actualiza bloque a bloque: SGD es muy sensible a la escala de las variables
+    scaler = StandardScaler(with_mean=False)
+
+    rows = 0
+    for epoch in range(n_epochs):
+        for chunk in chunk_source():
+            X, y = prepare(chunk)
+            if len(y) == 0:
+                continue
+            if epoch == 0:
+                scaler.partial_fit(X)
+            X = scaler.transform(X)
+            if model_type == "Clasificación":
+                model.partial_fit(X, y, classes=classes)
+            else:
+                model.partial_fit(X, y)
+            rows += len(y)
+            if progress_callback is not None:
+                progress_callback("Entrenamiento", rows)
+    return model, scaler
+
+def get_booster_params(model_type, classes=None):
+    """Parámetros de entrenamiento del Booster según el tipo de problema"""
+    params = {'tree_method': 'hist', 'seed': RANDOM_STATE}
+    if model_type == "Clasificación":
+        if len(classes) == 2:
+            params['objective'] = 'binary:logistic'
+        else:
+            params['objective'] = 'multi:softprob'
+            params['num_class'] = len(classes)
+    else:
+        params['objective'] = 'reg:squarederror'
+    return params
+
+def _fit_xgboost(model_type, classes, chunk_source, prepare, progress_callback):
+    """Entrena XGBoost con un DMatrix de memoria externa alimentado por los bloques"""
+    params = get_booster_params(model_type, classes)
+    if model_type == "Clasificación":
+        def prepare_labels(chunk):
+            X, y = prepare(chunk)
+            return X, pd.Categorical(y, categories=classes).codes
+    else:
+        prepare_labels = prepare
+
+    with tempfile.TemporaryDirectory(prefix='xgb_cache_') as cache_dir:
+        iterator = ChunkIterator(chunk_source, prepare_labels, os.path.join(cache_dir, 'cache'))
+        dtrain = xgb.DMatrix(iterator)
+        if progress_callback is not None:
+            progress_callback("Entrenamiento", dtrain.num_row())
+        booster = xgb.train(params, dtrain, num_boost_round=XGBOOST_ROUNDS)
+        # Liberar la caché de memoria externa antes de eliminar el directorio temporal
+        del dtrain, iterator
+    return BoosterModel(booster, classes if model_type == "Clasificación" else None)
+
+def _histogram_auc(positive_hist, negative_hist):
+    """Calcula el AUC a partir de histogramas de probabilidad de las clases positiva y negativa"""
+    # Recorrer los umbrales de mayor a menor probabilidad
+    tp = np.concatenate([[0], np.cumsum(positive_hist[::-1])])
+    fp = np.concatenate([[0], np.cumsum(negative_hist[::-1])])
+    if tp[-1] == 0 or fp[-1] == 0:
+        return None
+    return float(auc(fp / fp[-1], tp / tp[-1]))
+
+def evaluate_streaming(model, preprocessor, model_type, classes, chunk_source, prepare_holdout,
+                       progress_callback=None):
+    """Evalúa el modelo sobre las filas de prueba recorriendo los bloques sin materializarlos"""
+    n = 0
+    if model_type == "Clasificación":
+        confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+        positive_hist = np.zeros(AUC_BINS, dtype=np.int64)
+        negative_hist = np.zeros(AUC_BINS, dtype=np.int64)
+    else:
+        sum_y = sum_y2 = sse = sae = 0.0
+
+    for chunk in chunk_source():
+        X, y = prepare_holdout(chunk)
+        if len(y) == 0:
+            continue
+        X = preprocessor.transform(X)
+        pred = model.predict(X)
+        n += len(y)
+
+        if model_type == "Clasificación":
+            true_codes = pd.Categorical(y, categories=classes).codes
+            pred_codes = pd.Categorical(pred, categories=classes).codes
+            np.add.at(confusion, (true_codes, pred_codes), 1)
+            if len(classes) == 2:
+                proba = model.predict_proba(X)[:, 1]
+                bins = np.minimum((proba * AUC_BINS).astype(int), AUC_BINS - 1)
+                positive_hist += np.bincount(bins[true_codes == 1], minlength=AUC_BINS)
+                negative_hist += np.bincount(bins[true_codes == 0], minlength=AUC_BINS)
+        else:
+            y = np.asarray(y, dtype=np.float64)
+            residuals = y - pred
+            sum_y += y.sum()
+            sum_y2 += (y ** 2).sum()
+            sse += (residuals ** 2).sum()
+            sae += np.abs(residuals).sum()
+
+        if progress_callback is not None:
+            progress_callback("Evaluación", n)
+
+    if n == 0:
+        return None
+
+    if model_type == "Clasificación":
+        accuracy = np.trace(confusion) / n
+        auc_value = _histogram_auc(positive_hist, negative_hist) if len(classes) == 2 else None
+        lines = [f"Filas de prueba: {n}", f"Accuracy: {accuracy:.4f}"]
+        if auc_value is not None:
+            lines.append(f"AUC (aprox.): {auc_value:.4f}")
+        for i, label in enumerate(classes):
+            predicted = confusion[:, i].sum()
+            actual = confusion[i, :].sum()
+            precision = confusion[i, i] / predicted if predicted else 0.0
+            recall = confusion[i, i] / actual if actual else 0.0
+            lines.append(f"{label}: precisión {precision:.4f} · recall {recall:.4f} · soporte {actual}")
+        return {
+            'score': accuracy,
+            'report': "\n".join(lines),
+            'confusion_matrix': confusion,
+            'classes': list(classes),
+            'auc': auc_value,
+            'n_test': n
+        }
+
+    mse = sse / n
+    total_variance = sum_y2 - sum_y ** 2 / n
+    r2 = 1 - sse / total_variance if total_variance > 0 else 0.0
+    return {
+        'score': r2,
+        'report': f"Filas de prueba: {n}\nMSE: {mse:.4f}\nMAE: {sae / n:.4f}",
+        'mse': mse,
+        'n_test': n
+    }
+
+def timed_chunks(chunk_source, stats, name):
+    """Envuelve una fuente de bloques para acumular en stats[name] el tiempo de lectura de la base de datos"""
+    def source():
+        chunks = iter(chunk_source())
+        try:
+            while True:
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                stats[name] = stats.get(name, 0.0) + time.perf_counter() - start
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+    return source
+
+def train_out_of_core(model_name, model_type, target_column, feature_columns, chunk_source,
+                      classes=None, test_size=TEST_SIZE, n_epochs=1, progress_callback=None):
+    """Entrena y evalúa un modelo leyendo los datos por bloques, sin cargar la tabla en memoria"""
+    feature_columns = list(feature_columns)
+
+    def prepare_raw(chunk, holdout=False):
+        return split_chunk(chunk, target_column, feature_columns, holdout, test_size)
+
+    # El preprocesamiento se ajusta sobre el primer bloque de entrenamiento
+    chunks = chunk_source()
+    first_chunk = next(iter(chunks), None)
+    if hasattr(chunks, 'close'):
+        chunks.close()
+    if first_chunk is None:
+        return None
+    X_first, _ = prepare_raw(first_chunk)
+    preprocessor = build_preprocessor(X_first, feature_columns)
+    preprocessor.fit(X_first)
+
+    if model_type == "Clasificación":
+        classes = np.asarray(classes)
+
+    def prepare(chunk):
+        X, y = prepare_raw(chunk)
+        return preprocessor.transform(X), y.to_numpy()
+
+    # La lectura de los bloques se mide aparte y se descuenta del tiempo de entrenamiento
+    # y de evaluación, que así solo reflejan el coste del modelo
+    timings = {'fit_read_time': 0.0, 'predict_read_time': 0.0}
+    with profile_call(timings, 'fit'):
+        fit_source = timed_chunks(chunk_source, timings, 'fit_read_time')
+        if model_name.startswith("SGD"):
+            model, scaler = _fit_sgd(model_type, classes, fit_source, prepare, n_epochs, progress_callback)
+            preprocessor = Pipeline([('preprocesamiento', preprocessor), ('escalado', scaler)])
+        else:
+            model = _fit_xgboost(model_type, classes, fit_source, prepare, progress_callback)
+
+    with profile_call(timings, 'predict'):
+        result = evaluate_streaming(
+            model, preprocessor, model_type, classes, timed_chunks(chunk_source, timings, 'predict_read_time'),
+            lambda chunk: prepare_raw(chunk, holdout=True), progress_callback
+        )
+    timings['fit_time'] -= timings['fit_read_time']
+    timings['predict_time'] -= timings['predict_read_time']
+    timings['model_size_bytes'] = get_model_size_bytes(model)
+    if result is not None:
+        timings['predict_latency_per_row'] = timings['predict_time'] / max(result['n_test'], 1)
+
+    return model, preprocessor, result, timings
+
+def plot_streamed_confusion_matrix(confusion, classes, model_name):
+    """Genera la matriz de confusión acumulada durante la evaluación en streaming"""
+    labels = [str(c) for c in classes]
+    fig = go.Figure(data=go.Heatmap(
+        z=confusion,
+        x=[f"Predicción {label}" for label in labels],
+        y=[f"Real {label}" for label in labels],
+        colorscale='Blues',
+        showscale=True
+    ))
+    fig.update_layout(
+        title=f'Matriz de Confusión - {model_name}',
+        xaxis_title='Predicción',
+        yaxis_title='Valor Real'
+    )
+    return fig
+
+def show_out_of_core_training(selected_table, column_names):
+    """Interfaz de entrenamiento fuera de memoria sobre una tabla de la base de datos"""
+    model_type = st.radio(
+        "Selecciona el tipo de modelo",
+        ["Clasificación", "Regresión"],
+        key="ooc_model_type"
+    )
+    selected_models = st.multiselect(
+        "Selecciona los modelos a entrenar",
+        OUT_OF_CORE_MODELS[model_type],
+        default=OUT_OF_CORE_MODELS[model_type][:1],
+        key="ooc_models"
+    )
+    target_column = st.selectbox("Selecciona la variable objetivo", column_names, key="ooc_target")
+    feature_columns = st.multiselect(
+        "Selecciona las variables predictoras",
+        [col for col in column_names if col != target_column],
+        key="ooc_features"
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        chunksize = st.number_input(
+            "Filas por bloque", min_value=1000, max_value=1000000, value=DEFAULT_CHUNKSIZE, step=1000
+        )
+    with col2:
+        n_epochs = st.number_input("Pasadas sobre los datos (SGD)", min_value=1, max_value=20, value=1)
+
+    if not feature_columns:
+        st.warning("Por favor, selecciona al menos una variable predictora.")
+        return
+
+    if not st.button("Entrenar Modelos", key="ooc_train"):
+        return
+
+    columns = list(feature_columns) + [target_column]
+
+    def chunk_source():
+        return iter_table_chunks(selected_table, columns, int(chunksize))
+
+    classes = get_distinct_values(selected_table, target_column) if model_type == "Clasificación" else None
+    if model_type == "Clasificación" and len(classes) < 2:
+        st.error("La variable objetivo debe tener al menos dos clases.")
+        return
+
+    table_version = get_table_version(selected_table)
+    n_rows = count_table_rows(selected_table)
+    # Perfil de referencia para medir la deriva en actualizaciones incrementales, sobre el primer bloque
+    chunks = chunk_source()
+    first_chunk = next(iter(chunks), None)
+    if hasattr(chunks, 'close'):
+        chunks.close()
+    data_profile = build_profile(first_chunk, columns) if first_chunk is not None else None
+    progress_text = st.empty()
+
+    def report_progress(stage, rows):
+        progress_text.text(f"{stage}: {rows:,} filas procesadas")
+
+    models = {}
+    results = {}
+    all_timings = {}
+    for model_name in selected_models:
+        key = None
+        if table_version is not None:
+            key = make_registry_key(table_version, target_column, feature_columns, model_name, {
+                'mode': 'out_of_core',
+                'model_type': model_type,
+                'n_epochs': int(n_epochs),
+                'xgboost_rounds': XGBOOST_ROUNDS,
+                'test_size': TEST_SIZE,
+                # El preprocesamiento se ajusta sobre el primer bloque: el resultado depende de su tamaño
+                'chunksize': int(chunksize),
+                'preprocessing': get_preprocessing_config()
+            })
+        entry = load_entry(key) if key is not None else None
+
+        if entry is not None:
+            model, preprocessor, result, timings = (
+                entry['model'], entry['preprocessor'], entry['result'], entry['timings']
+            )
+            source = "⚡ Desde el registro"
+        else:
+            with st.spinner(f"Entrenando {model_name} por bloques..."):
+                trained = train_out_of_core(
+                    model_name, model_type, target_column, feature_columns, chunk_source,
+                    classes=classes, n_epochs=int(n_epochs), progress_callback=report_progress
+                )
+            if trained is None or trained[2] is None:
+                st.error(f"No hay suficientes datos para entrenar y evaluar {model_name}.")
+                continue
+            model, preprocessor, result, timings = trained
+            source = "Entrenado ahora"
+            record_run({
+                'model_name': model_name,
+                'model_type': model_type,
+                'variant': "Fuera de memoria",
+                'table_name': selected_table,
+                'target_column': target_column,
+                'n_features': len(feature_columns),
+                'n_test': result['n_test'],
+                'score': result['score']
+            }, timings)
+            if key is not None:
+                save_entry(key, model, result, timings, metadata={
+                    'model_name': model_name,
+                    'model_type': model_type,
+                    'table_name': selected_table,
+                    'table_version': table_version,
+                    'target_column': target_column,
+                    'feature_columns': list(feature_columns),
+                    'n_rows': n_rows,
+                    'data_profile': data_profile
+                }, preprocessor=preprocessor)
+
+        models[model_name] = make_inference_pipeline(preprocessor, model)
+        results[model_name] = result
+        all_timings[model_name] = timings
+
+        st.subheader(model_name)
+        st.metric("Precisión" if model_type == "Clasificación" else "R²", f"{result['score']:.4f}")
+        st.caption(
+            f"{source} · Entrenamiento: {timings['fit_time']:.3f} s · "
+            f"Evaluación: {timings['predict_time']:.3f} s · "
+            f"Lectura de la base de datos: {timings.get('fit_read_time', 0.0) + timings.get('predict_read_time', 0.0):.3f} s"
+        )
+        st.text(result['report'])
+        if model_type == "Clasificación":
+            st.plotly_chart(plot_streamed_confusion_matrix(
+                result['confusion_matrix'], result['classes'], model_name
+            ))
+
+    progress_text.empty()
+    if all_timings:
+        st.header("⏱️ Coste de los Modelos")
+        st.dataframe(format_cost_table(all_timings), use_container_width=True)
+    # Guardar el entrenamiento en la sesión para la predicción por lotes (los modelos ya incluyen su preprocesamiento)
+    store_object('training_run', {
+        'mode': 'out_of_core',
+        'models': models,
+        'preprocessor': None,
+        'results': results,
+        'timings': all_timings,
+        'model_type': model_type,
+        'selected_models': list(models),
+        'selected_table': selected_table,
+        'target_column': target_column,
+        'feature_columns': list(feature_columns)
+    })
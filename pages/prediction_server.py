@@ -0,0 +1,377 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+from pages.model_registry import list_entries, load_entry, load_metadata, get_onnx_path, is_valid_key
+from pages.preprocessing import make_inference_pipeline
+from pages.onnx_export import OnnxPredictor, ONNX_AVAILABLE
+
+# Ventana máxima de espera para agrupar peticiones concurrentes y filas máximas por lote
+MAX_WAIT_MS = float(os.getenv('PREDICTION_MAX_WAIT_MS', '5'))
+MAX_BATCH_ROWS = int(os.getenv('PREDICTION_MAX_BATCH_ROWS', '1024'))
+# Cada cuánto se comprueba si un modelo cargado cambió en el registro
+RELOAD_INTERVAL = float(os.getenv('PREDICTION_RELOAD_INTERVAL', '2'))
+# Latencias recientes conservadas para calcular los percentiles
+LATENCY_WINDOW = 10000
+
+def _to_builtin(values):
+    """Convierte un arreglo de numpy a listas serializables en JSON"""
+    if values is None:
+        return None
+    return np.asarray(values).tolist()
+
+class LatencyTracker:
+    """Latencias recientes con percentiles p50/p99"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._batch_rows = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+
+    def record_request(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self.requests += 1
+
+    def record_batch(self, rows):
+        with self._lock:
+            self._batch_rows.append(rows)
+            self.batches += 1
+
+    def summary(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            batch_rows = np.array(self._batch_rows)
+            requests, batches = self.requests, self.batches
+        if latencies.size == 0:
+            return {'requests': requests, 'batches': batches}
+        return {
+            'requests': requests,
+            'batches': batches,
+            'p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'p99_ms': float(np.percentile(latencies, 99) * 1000),
+            'max_ms': float(latencies.max() * 1000),
+            'mean_batch_rows': float(batch_rows.mean()) if batch_rows.size else None
+        }
+
+class LoadedModel:
+    """Modelo del registro listo para predecir (ONNX si fue exportado, si no el pipeline original)"""
+
+    def __init__(self, key):
+        entry = load_entry(key)
+        if entry is None:
+            raise KeyError(f"No existe el modelo '{key}' en el registro")
+        metadata = entry['metadata']
+        self.key = key
+        self.version = metadata.get('created_at')
+        self.model_name = metadata.get('model_name')
+        self.model_type = metadata.get('model_type')
+        self.feature_columns = list(metadata.get('feature_columns', []))
+        self.runtime = 'sklearn'
+        onnx_path = get_onnx_path(key)
+        self.onnx_mtime = os.path.getmtime(onnx_path) if os.path.exists(onnx_path) else None
+        if self.onnx_mtime is not None and ONNX_AVAILABLE:
+            with open(onnx_path, 'rb') as f:
+                self.predictor = OnnxPredictor(f.read(), self.model_type)
+            self.runtime = 'onnx'
+        else:
+            self.predictor = make_inference_pipeline(entry.get('preprocessor'), entry['model'])
+
+    def check_columns(self, X):
+        """Rechaza las filas a las que les faltan variables predictoras del modelo"""
+        missing = [col for col in self.feature_columns if col not in X.columns]
+        if missing:
+            raise ValueError(f"Faltan variables predictoras: {', '.join(missing)}")
+
+    def predict(self, X):
+        """Predicciones y, en clasificación, probabilidades por clase"""
+        self.check_columns(X)
+        X = X[self.feature_columns]
+        output = {'predictions': self.predictor.predict(X), 'probabilities': None}
+        if self.model_type == "Clasificación" and hasattr(self.predictor, 'predict_proba'):
+            output['probabilities'] = self.predictor.predict_proba(X)
+        return output
+
+    def is_stale(self):
+        """Indica si la entrada del registro o su exportación ONNX cambiaron desde la carga"""
+        metadata = load_metadata(self.key)
+        if metadata is None:
+            return False
+        onnx_path = get_onnx_path(self.key)
+        onnx_mtime = os.path.getmtime(onnx_path) if os.path.exists(onnx_path) else None
+        return metadata.get('created_at') != self.version or onnx_mtime != self.onnx_mtime
+
+class MicroBatcher:
+    """Agrupa las peticiones concurrentes de un modelo en lotes con una ventana de latencia máxima"""
+
+    def __init__(self, model, trackers, max_wait_ms=MAX_WAIT_MS, max_batch_rows=MAX_BATCH_ROWS):
+        self.model = model
+        # Métricas del modelo y totales del servidor
+        self.trackers = trackers
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, X):
+        future = Future()
+        self._queue.put((X, future, time.perf_counter()))
+        return future
+
+    def stop(self):
+        self._queue.put(None)
+
+    def _collect(self):
+        """Espera la primera petición y agrega las que lleguen dentro de la ventana"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        rows = len(first[0])
+        deadline = first[2] + self.max_wait
+        while rows < self.max_batch_rows:
+            # Las peticiones ya encoladas se agregan siempre; la ventana solo limita la espera
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # El modelo se lee en cada lote para que las recargas se apliquen sin reiniciar
+            model = self.model
+            try:
+                X = pd.concat([item[0] for item in batch], ignore_index=True)
+                output = model.predict(X)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    # Una petición con datos inválidos no hace fallar a las demás del lote
+                    self._predict_each(model, batch)
+                continue
+            self._record_batch(len(X))
+            offset = 0
+            for X_item, future, _ in batch:
+                end = offset + len(X_item)
+                future.set_result({
+                    name: values[offset:end] if values is not None else None
+                    for name, values in output.items()
+                })
+                offset = end
+
+    def _record_batch(self, rows):
+        for tracker in self.trackers:
+            tracker.record_batch(rows)
+
+    def _predict_each(self, model, batch):
+        """Predice las peticiones de un lote fallido una a una"""
+        for X_item, future, _ in batch:
+            try:
+                future.set_result(model.predict(X_item))
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self._record_batch(len(X_item))
+
+class ModelServer:
+    """Modelos cargados, sus agrupadores de peticiones y las métricas de latencia"""
+
+    def __init__(self, max_wait_ms=MAX_WAIT_MS, max_batch_rows=MAX_BATCH_ROWS, reload_interval=RELOAD_INTERVAL):
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_rows = max_batch_rows
+        self.reload_interval = reload_interval
+        self.tracker = LatencyTracker()
+        self._batchers = {}
+        self._trackers = {}
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+
+    def _get_batcher(self, key):
+        # La clave llega en la URL: se valida antes de formar rutas del registro con ella
+        if not is_valid_key(key):
+            raise ValueError(f"Clave de modelo no válida: '{key}'")
+        with self._lock:
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                # Primero se carga el modelo: una clave inexistente no deja métricas huérfanas
+                model = LoadedModel(key)
+                self._trackers[key] = LatencyTracker()
+                batcher = MicroBatcher(
+                    model, (self._trackers[key], self.tracker), self.max_wait_ms, self.max_batch_rows
+                )
+                self._batchers[key] = batcher
+            return batcher
+
+    def reload(self, force=False):
+        """Recarga en caliente los modelos que cambiaron en el registro"""
+        reloaded = []
+        with self._lock:
+            batchers = dict(self._batchers)
+        for key, batcher in batchers.items():
+            if force or batcher.model.is_stale():
+                try:
+                    batcher.model = LoadedModel(key)
+                except KeyError:
+                    # La entrada fue expulsada del registro: se sigue sirviendo la versión cargada
+                    continue
+                reloaded.append(key)
+        self._last_check = time.monotonic()
+        return reloaded
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._last_check >= self.reload_interval:
+            self.reload()
+
+    def predict(self, key, rows):
+        """Predice una lista de filas (diccionarios columna -> valor) con el modelo indicado"""
+        start = time.perf_counter()
+        self._maybe_reload()
+        batcher = self._get_batcher(key)
+        X = pd.DataFrame.from_records(rows)
+        # Las filas sin las variables del modelo se rechazan antes de entrar en un lote
+        batcher.model.check_columns(X)
+        output = batcher.submit(X).result()
+        latency = time.perf_counter() - start
+        self.tracker.record_request(latency)
+        self._trackers[key].record_request(latency)
+        return {
+            'model_key': key,
+            'model_name': batcher.model.model_name,
+            'runtime': batcher.model.runtime,
+            'predictions': _to_builtin(output['predictions']),
+            'probabilities': _to_builtin(output['probabilities']),
+            'latency_ms': latency * 1000
+        }
+
+    def stats(self):
+        with self._lock:
+            trackers = dict(self._trackers)
+            batchers = dict(self._batchers)
+        return {
+            'total': self.tracker.summary(),
+            'models': {
+                key: dict(tracker.summary(), runtime=batchers[key].model.runtime)
+                for key, tracker in trackers.items()
+            },
+            'max_wait_ms': self.max_wait_ms,
+            'max_batch_rows': self.max_batch_rows
+        }
+
+class PredictionHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Cola de conexiones amplia para admitir ráfagas de clientes concurrentes
+    request_queue_size = 256
+
+def make_handler(server):
+    """Crea el manejador HTTP que expone el servidor de modelos"""
+
+    class PredictionHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            elif self.path == '/models':
+                self._send_json(200, {'models': [
+                    {k: entry.get(k) for k in ('key', 'model_name', 'model_type', 'table_name', 'feature_columns')}
+                    for entry in list_entries()
+                ]})
+            elif self.path == '/stats':
+                self._send_json(200, server.stats())
+            else:
+                self._send_json(404, {'error': 'Ruta no encontrada'})
+
+        def do_POST(self):
+            try:
+                payload = self._read_json()
+            except ValueError:
+                self._send_json(400, {'error': 'El cuerpo no es JSON válido'})
+                return
+            if self.path == '/reload':
+                self._send_json(200, {'reloaded': server.reload(force=True)})
+                return
+            if not self.path.startswith('/predict/'):
+                self._send_json(404, {'error': 'Ruta no encontrada'})
+                return
+            key = self.path[len('/predict/'):]
+            rows = payload.get('rows')
+            if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+                self._send_json(400, {'error': "Se espera {'rows': [{columna: valor, ...}, ...]}"})
+                return
+            try:
+                self._send_json(200, server.predict(key, rows))
+            except ValueError as e:
+                # Clave mal formada o filas sin las variables del modelo
+                self._send_json(400, {'error': str(e)})
+            except KeyError as e:
+                # Solo LoadedModel lanza KeyError: la clave no existe en el registro
+                self._send_json(404, {'error': e.args[0] if e.args else str(e)})
+            except Exception as e:
+                self._send_json(500, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            # Sin registro por petición: la latencia se consulta en /stats
+            pass
+
+    return PredictionHandler
+
+def run_server(host='127.0.0.1', port=8765, preload=(), max_wait_ms=MAX_WAIT_MS, max_batch_rows=MAX_BATCH_ROWS):
+    """Inicia el servidor HTTP de predicción (bloqueante)"""
+    server = ModelServer(max_wait_ms=max_wait_ms, max_batch_rows=max_batch_rows)
+    for key in preload:
+        server._get_batcher(key)
+    httpd = PredictionHTTPServer((host, port), make_handler(server))
+    print(f"Servidor de predicción en http://{host}:{port} (ventana {max_wait_ms} ms, lote máx. {max_batch_rows} filas)", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+def main():
+    """Punto de entrada para servir los modelos del registro por HTTP"""
+    parser = argparse.ArgumentParser(description="Servidor HTTP de predicción con los modelos del registro")
+    parser.add_argument('--host', default='127.0.0.1', help="Interfaz de escucha (por defecto solo localhost)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--preload', nargs='*', default=[], help="Claves de modelos a cargar al iniciar")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS, help="Ventana de agrupación de peticiones")
+    parser.add_argument('--max-batch-rows', type=int, default=MAX_BATCH_ROWS, help="Filas máximas por lote")
+    args = parser.parse_args()
+    run_server(args.host, args.port, args.preload, args.max_wait_ms, args.max_batch_rows)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+from pages.instrumentation import record_cache
+from pages.memory_governor import get_memory_governor
+
+# A partir de este número de categorías una variable se codifica con one-hot disperso
+HIGH_CARDINALITY_THRESHOLD = int(os.getenv('HIGH_CARDINALITY_THRESHOLD', '50'))
+# Densidad por debajo de la cual la matriz resultante se mantiene en formato CSR
+SPARSE_THRESHOLD = float(os.getenv('SPARSE_THRESHOLD', '0.3'))
+# Frecuencia mínima para que una categoría de alta cardinalidad tenga su propia columna
+MIN_CATEGORY_FREQUENCY = int(os.getenv('MIN_CATEGORY_FREQUENCY', '5'))
+# Número de matrices preprocesadas que se conservan (el gobernador de memoria puede volcarlas a disco)
+CACHE_SIZE = int(os.getenv('PREPROCESSING_CACHE_SIZE', '8'))
+
+MISSING_CATEGORY = '__nulo__'
+# Sesión a la que el gobernador de memoria atribuye la caché compartida entre sesiones
+SHARED_SESSION = 'compartido'
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _as_numeric(X):
+    """Convierte las columnas a valores numéricos (las fechas pasan a nanosegundos)"""
+    frame = pd.DataFrame(X)
+    return frame.apply(lambda col: pd.to_numeric(col, errors='coerce')).to_numpy(dtype=np.float64)
+
+def _as_categories(X):
+    """Convierte las columnas a texto conservando los nulos para la imputación"""
+    frame = pd.DataFrame(X).astype(object)
+    return frame.where(frame.notna(), MISSING_CATEGORY).astype(str).to_numpy()
+
+def _to_float32(X):
+    """Convierte la matriz final a float32 (densa) o CSR float32 (dispersa)"""
+    if sp.issparse(X):
+        return sp.csr_matrix(X, dtype=np.float32)
+    return np.asarray(X, dtype=np.float32)
+
+def split_feature_columns(df, feature_columns):
+    """Clasifica las variables predictoras en numéricas y categóricas de baja o alta cardinalidad"""
+    numeric, low_cardinality, high_cardinality = [], [], []
+    for col in feature_columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype) \
+                or pd.api.types.is_datetime64_any_dtype(dtype):
+            numeric.append(col)
+        elif df[col].nunique(dropna=True) > HIGH_CARDINALITY_THRESHOLD:
+            high_cardinality.append(col)
+        else:
+            low_cardinality.append(col)
+    return numeric, low_cardinality, high_cardinality
+
+def build_preprocessor(df, feature_columns):
+    """Construye el preprocesamiento con imputación y codificación para las variables predictoras"""
+    numeric, low_cardinality, high_cardinality = split_feature_columns(df, feature_columns)
+    transformers = []
+    if numeric:
+        transformers.append(('numericas', Pipeline([
+            ('a_numero', FunctionTransformer(_as_numeric, feature_names_out='one-to-one')),
+            ('imputacion', SimpleImputer(strategy='median', keep_empty_features=True))
+        ]), numeric))
+    if low_cardinality:
+        transformers.append(('categoricas', Pipeline([
+            ('a_texto', FunctionTransformer(_as_categories, feature_names_out='one-to-one')),
+            ('codificacion', OneHotEncoder(
+                handle_unknown='ignore', sparse_output=False, dtype=np.float32
+            ))
+        ]), low_cardinality))
+    if high_cardinality:
+        # Las categorías poco frecuentes se agrupan para acotar el número de columnas
+        transformers.append(('alta_cardinalidad', Pipeline([
+            ('a_texto', FunctionTransformer(_as_categories, feature_names_out='one-to-one')),
+            ('codificacion', OneHotEncoder(
+                handle_unknown='infrequent_if_exist', min_frequency=MIN_CATEGORY_FREQUENCY,
+                sparse_output=True, dtype=np.float32
+            ))
+        ]), high_cardinality))
+
+    return Pipeline([
+        ('columnas', ColumnTransformer(transformers, sparse_threshold=SPARSE_THRESHOLD)),
+        ('float32', FunctionTransformer(_to_float32, accept_sparse=True))
+    ])
+
+def get_feature_names(preprocessor):
+    """Retorna los nombres de las columnas generadas por el preprocesamiento"""
+    return list(preprocessor.named_steps['columnas'].get_feature_names_out())
+
+def get_preprocessing_config():
+    """Parámetros del preprocesamiento que afectan a los modelos entrenados"""
+    return {
+        'high_cardinality_threshold': HIGH_CARDINALITY_THRESHOLD,
+        'sparse_threshold': SPARSE_THRESHOLD,
+        'min_category_frequency': MIN_CATEGORY_FREQUENCY
+    }
+
+def build_feature_matrices(X_train, X_test, cache_key=None):
+    """Ajusta el preprocesamiento sobre entrenamiento y transforma ambos conjuntos, con caché por clave"""
+    if cache_key is not None:
+        with _cache_lock:
+            slot = _cache.get(cache_key)
+            if slot is not None:
+                _cache.move_to_end(cache_key)
+        if slot is not None:
+            record_cache('preprocesamiento', True)
+            return dict(slot.get(), cached=True)
+        record_cache('preprocesamiento', False)
+
+    preprocessor = build_preprocessor(X_train, list(X_train.columns))
+    X_train_matrix = preprocessor.fit_transform(X_train)
+    matrices = {
+        'preprocessor': preprocessor,
+        'X_train': X_train_matrix,
+        'X_test': preprocessor.transform(X_test),
+        'feature_names': get_feature_names(preprocessor)
+    }
+
+    if cache_key is not None:
+        # El gobernador cuenta las matrices en el límite de memoria y vuelca a disco las menos usadas
+        slot = get_memory_governor().track(SHARED_SESSION, 'preprocesamiento', matrices)
+        with _cache_lock:
+            _cache[cache_key] = slot
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return dict(matrices, cached=False)
+
+def make_inference_pipeline(preprocessor, model):
+    """Une el preprocesamiento y el modelo ya ajustados para predecir sobre datos sin procesar"""
+    if preprocessor is None:
+        return model
+    return Pipeline([('preprocesamiento', preprocessor), ('modelo', model)])
+
+def get_matrix_nbytes(X):
+    """Retorna la memoria ocupada por una matriz densa o dispersa"""
+    if sp.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
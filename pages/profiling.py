@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import pickle
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from pages.model_registry import REGISTRY_DIR
+from pages.instrumentation import observe
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Historial de ejecuciones perfiladas para comparar el coste de los modelos entre corridas
+PROFILING_LOG = os.getenv('PROFILING_LOG', os.path.join(REGISTRY_DIR, 'profiling_runs.jsonl'))
+# Intervalo con el que se muestrea la memoria residente mientras se ejecuta el bloque medido
+RSS_SAMPLE_INTERVAL = 0.01
+
+def get_rss_bytes():
+    """Retorna la memoria residente actual del proceso en bytes (None si no está disponible)"""
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class RssSampler:
+    """Muestrea en segundo plano la memoria residente para obtener su pico durante un bloque.
+
+    A diferencia de ru_maxrss (un máximo histórico del proceso que solo sube), el pico se
+    mide desde el inicio del bloque, así que no queda en cero a partir del segundo modelo.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start = get_rss_bytes()
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="muestreo-rss", daemon=True)
+        if self.start is not None:
+            self._thread.start()
+
+    def _sample(self):
+        rss = get_rss_bytes()
+        if rss is not None and rss > self.peak:
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def stop(self):
+        """Detiene el muestreo y retorna el aumento del pico respecto al inicio"""
+        if self.start is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return self.peak - self.start
+
+@contextmanager
+def profile_call(stats, name):
+    """Mide tiempo real, tiempo de CPU y aumento del pico de memoria de un bloque de código.
+
+    El tiempo de CPU es el del hilo que ejecuta el bloque (time.thread_time), así que no
+    incluye el trabajo de otras sesiones; tampoco el de los hilos nativos que abren algunos
+    modelos (XGBoost, KNN con n_jobs). La memoria es la residente del proceso: con varios
+    entrenamientos a la vez, el pico incluye también lo que reservan los demás.
+    """
+    sampler = RssSampler()
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats[f'{name}_time'] = time.perf_counter() - wall_start
+        stats[f'{name}_cpu_time'] = time.thread_time() - cpu_start
+        stats[f'{name}_peak_rss_delta'] = sampler.stop()
+
+def get_model_size_bytes(model):
+    """Retorna el tamaño serializado del modelo en bytes"""
+    try:
+        return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+def record_run(metadata, timings):
+    """Agrega una ejecución perfilada al historial"""
+    if timings.get('fit_time') is not None:
+        observe('app_training_seconds', timings['fit_time'], model=metadata.get('model_name'), variant=metadata.get('variant'))
+    os.makedirs(os.path.dirname(PROFILING_LOG), exist_ok=True)
+    run = dict(metadata)
+    run.update(timings)
+    run['timestamp'] = time.time()
+    with open(PROFILING_LOG, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, default=str) + '\n')
+
+def load_runs(**filters):
+    """Carga el historial de ejecuciones, opcionalmente filtrado por campos de metadatos"""
+    if not os.path.exists(PROFILING_LOG):
+        return pd.DataFrame()
+    runs = []
+    with open(PROFILING_LOG, encoding='utf-8') as f:
+        for line in f:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if all(run.get(field) == value for field, value in filters.items()):
+                runs.append(run)
+    return pd.DataFrame(runs)
+
+def format_cost_table(timings_by_model):
+    """Construye la tabla de costes (tiempos, memoria y tamaño) por modelo"""
+    rows = []
+    for model_name, timings in timings_by_model.items():
+        rss_delta = timings.get('fit_peak_rss_delta')
+        model_size = timings.get('model_size_bytes')
+        latency = timings.get('predict_latency_per_row')
+        row = {
+            'Modelo': model_name,
+            'Entrenamiento (s)': timings.get('fit_time'),
+            'CPU del hilo (s)': timings.get('fit_cpu_time'),
+            'Δ pico RSS del proceso (MB)': rss_delta / 1024 / 1024 if rss_delta is not None else None,
+            'Predicción (s)': timings.get('predict_time'),
+            'predict_proba (s)': timings.get('predict_proba_time'),
+            'Latencia por fila (µs)': latency * 1e6 if latency is not None else None,
+            'Tamaño del modelo (KB)': model_size / 1024 if model_size is not None else None
+        }
+        if 'fit_read_time' in timings:
+            # Modelos entrenados por bloques: lectura de la base de datos, excluida de los tiempos anteriores
+            row['Lectura BD (s)'] = timings['fit_read_time'] + timings.get('predict_read_time', 0.0)
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,66 @@
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+# Módulo ligero: lo importan los procesos de renderizado, sin Streamlit ni scikit-learn
+FIGSIZE = (7, 4.2)
+DPI = 110
+
+def _histogram(ax, data):
+    edges = np.asarray(data['edges'])
+    ax.bar(edges[:-1], data['counts'], width=np.diff(edges), align='edge', color='#3498db', edgecolor='white')
+    ax.set_xlabel(data['column'])
+    ax.set_ylabel('Cantidad')
+
+def _bars(ax, data):
+    labels = [str(label) for label in data['labels']]
+    ax.bar(range(len(labels)), data['values'], color='#3498db')
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=8)
+    ax.set_ylabel('Cantidad')
+
+def _heatmap(ax, data, cmap, vmin=None, vmax=None, fmt='{:.2f}'):
+    matrix = np.asarray(data['matrix'], dtype=float)
+    image = ax.imshow(matrix, cmap=cmap, vmin=vmin, vmax=vmax)
+    ax.set_xticks(range(len(data['x_labels'])))
+    ax.set_xticklabels(data['x_labels'], rotation=45, ha='right', fontsize=8)
+    ax.set_yticks(range(len(data['y_labels'])))
+    ax.set_yticklabels(data['y_labels'], fontsize=8)
+    if matrix.size <= 100:
+        for (i, j), value in np.ndenumerate(matrix):
+            ax.text(j, i, fmt.format(value), ha='center', va='center', fontsize=7)
+    plt.colorbar(image, ax=ax)
+
+def _roc(ax, data):
+    for label, curve in data['curves'].items():
+        ax.plot(curve['fpr'], curve['tpr'], label=f"{label} (AUC = {curve['roc_auc']:.3f})")
+    ax.plot([0, 1], [0, 1], linestyle='--', color='grey')
+    ax.set_xlabel('Tasa de Falsos Positivos')
+    ax.set_ylabel('Tasa de Verdaderos Positivos')
+    ax.legend(fontsize=8)
+
+def render_chart(task):
+    """Dibuja una gráfica del reporte en un PNG y retorna su ruta (se ejecuta en otro proceso)"""
+    fig, ax = plt.subplots(figsize=FIGSIZE)
+    kind, data = task['kind'], task['data']
+    if kind == 'histogram':
+        _histogram(ax, data)
+    elif kind == 'bars':
+        _bars(ax, data)
+    elif kind == 'correlation':
+        _heatmap(ax, data, 'RdBu', vmin=-1, vmax=1)
+    elif kind == 'confusion':
+        _heatmap(ax, data, 'Blues', fmt='{:.0f}')
+        ax.set_xlabel('Predicción')
+        ax.set_ylabel('Valor Real')
+    elif kind == 'roc':
+        _roc(ax, data)
+    else:
+        plt.close(fig)
+        raise ValueError(f"Tipo de gráfica desconocido: {kind}")
+    ax.set_title(task['title'])
+    fig.tight_layout()
+    fig.savefig(task['path'], dpi=DPI)
+    plt.close(fig)
+    return task['path']
@@ -0,0 +1,439 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import streamlit as st
+import fpdf
+from fpdf import FPDF
+from pages.utils import load_from_db, get_table_version
+from pages.distributed import use_dask, get_client, read_table
+from pages.instrumentation import record_cache
+from pages.model_registry import list_entries, load_entry
+from pages.jobs import get_job_manager, get_session_id, watch_job, RUNNING, DONE, CANCELLED
+
+# Directorio de los reportes generados y procesos dedicados a dibujar las gráficas
+REPORTS_DIR = os.getenv(
+    'REPORTS_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.reports')
+)
+REPORT_RENDER_WORKERS = int(os.getenv('REPORT_RENDER_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+# Número de estadísticas de tablas que se mantienen en memoria
+STATS_CACHE_SIZE = int(os.getenv('STATS_CACHE_SIZE', '8'))
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DejaVuSans.ttf')
+# Firmas de un archivo TrueType/OpenType válido
+TRUETYPE_MAGIC = (b'\x00\x01\x00\x00', b'true', b'OTTO')
+HISTOGRAM_BINS = 30
+MAX_HISTOGRAMS = 12
+MAX_CATEGORICAL = 6
+MAX_CATEGORIES = 20
+MAX_CORRELATION_COLUMNS = 25
+
+STAGES = ["Estadísticas", "Gráficas", "PDF"]
+
+# Sin caché de métricas de la fuente en disco: fpdf la escribiría junto al archivo .ttf
+fpdf.fpdf.FPDF_CACHE_MODE = 1
+
+_stats_cache = OrderedDict()
+_stats_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+def _is_font(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(4) in TRUETYPE_MAGIC
+    except OSError:
+        return False
+
+def get_font_path():
+    """Fuente DejaVu del proyecto o, si el archivo no es una fuente válida, la incluida en matplotlib"""
+    if _is_font(FONT_PATH):
+        return FONT_PATH
+    # Importación diferida: matplotlib solo se carga si la fuente del proyecto no sirve
+    import matplotlib
+    path = os.path.join(matplotlib.get_data_path(), 'fonts', 'ttf', 'DejaVuSans.ttf')
+    if _is_font(path):
+        return path
+    raise ValueError("No se encontró una fuente DejaVuSans.ttf válida para el reporte.")
+
+def compute_table_stats(df):
+    """Estadísticas del perfil de una tabla en una sola pasada por columna"""
+    numeric_columns = list(df.select_dtypes(include=['int64', 'float64']).columns)
+    categorical_columns = list(df.select_dtypes(include=['object', 'category']).columns)
+    histograms = {}
+    for col in numeric_columns[:MAX_HISTOGRAMS]:
+        values = df[col].dropna().to_numpy(dtype=np.float64)
+        if len(values):
+            counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+            histograms[col] = {'counts': counts, 'edges': edges}
+    return {
+        'n_rows': len(df),
+        'n_columns': len(df.columns),
+        'memory_bytes': int(df.memory_usage(deep=True).sum()),
+        'nulls': df.isna().sum(),
+        'describe': df[numeric_columns].describe().T if numeric_columns else None,
+        'histograms': histograms,
+        'correlation': (
+            df[numeric_columns[:MAX_CORRELATION_COLUMNS]].corr() if len(numeric_columns) > 1 else None
+        ),
+        'value_counts': {
+            col: df[col].value_counts().head(MAX_CATEGORIES)
+            for col in categorical_columns[:MAX_CATEGORICAL]
+        },
+        'computed_at': time.time()
+    }
+
+def compute_distributed_stats(ddf):
+    """Las mismas estadísticas calculadas en el clúster Dask, sin traer la tabla al proceso.
+
+    Los cuantiles de la descripción son aproximados (se estiman por particiones).
+    """
+    import dask
+    import dask.array as da
+
+    get_client()
+    numeric_columns = list(ddf.select_dtypes(include=['int64', 'float64']).columns)
+    # Dask convierte el texto a string de pyarrow: se incluye junto a object
+    categorical_columns = list(ddf.select_dtypes(include=['object', 'string', 'category']).columns)
+    histogram_columns = numeric_columns[:MAX_HISTOGRAMS]
+    stats, = dask.compute({
+        'n_rows': ddf.shape[0],
+        'memory_bytes': ddf.memory_usage(deep=True).sum(),
+        'nulls': ddf.isna().sum(),
+        'describe': ddf[numeric_columns].describe() if numeric_columns else None,
+        'ranges': {col: (ddf[col].min(), ddf[col].max()) for col in histogram_columns},
+        'correlation': (
+            ddf[numeric_columns[:MAX_CORRELATION_COLUMNS]].corr() if len(numeric_columns) > 1 else None
+        ),
+        'value_counts': {
+            col: ddf[col].value_counts().nlargest(MAX_CATEGORIES)
+            for col in categorical_columns[:MAX_CATEGORICAL]
+        }
+    })
+
+    # Los histogramas necesitan el rango de cada columna: se calculan en una segunda pasada
+    histograms = {}
+    for col, (low, high) in stats.pop('ranges').items():
+        if pd.isna(low):
+            continue
+        low, high = float(low), float(high)
+        if low == high:
+            # Mismo criterio que np.histogram para una columna constante
+            low, high = low - 0.5, high + 0.5
+        histograms[col] = da.histogram(
+            ddf[col].dropna().to_dask_array().astype(np.float64), bins=HISTOGRAM_BINS, range=(low, high)
+        )
+    histograms, = dask.compute(histograms)
+
+    stats.update({
+        'n_rows': int(stats['n_rows']),
+        'n_columns': len(ddf.columns),
+        'memory_bytes': int(stats['memory_bytes']),
+        'describe': stats['describe'].T if stats['describe'] is not None else None,
+        'histograms': {
+            col: {'counts': counts, 'edges': np.asarray(edges)} for col, (counts, edges) in histograms.items()
+        },
+        'computed_at': time.time()
+    })
+    return stats
+
+def get_table_stats(table_name, table_version, df=None):
+    """Estadísticas de la tabla, calculadas una vez por versión y reutilizadas después.
+
+    Si la página ya tiene los datos cargados se pasan en df para no volver a leer la tabla.
+    """
+    key = (table_name, table_version)
+    if table_version is not None:
+        with _stats_lock:
+            if key in _stats_cache:
+                _stats_cache.move_to_end(key)
+                record_cache('estadisticas_reporte', True)
+                return _stats_cache[key], True
+        record_cache('estadisticas_reporte', False)
+    if df is None and use_dask():
+        # Con Dask las estadísticas se calculan por particiones en el clúster
+        stats = compute_distributed_stats(read_table(table_name))
+    else:
+        if df is None:
+            df = load_from_db(table_name)
+            if df is None:
+                raise ValueError("No se pudieron cargar los datos de la tabla.")
+        stats = compute_table_stats(df)
+    if table_version is not None:
+        with _stats_lock:
+            _stats_cache[key] = stats
+            while len(_stats_cache) > STATS_CACHE_SIZE:
+                _stats_cache.popitem(last=False)
+    return stats, False
+
+def get_model_results(table_name, table_version):
+    """Métricas de los modelos del registro entrenados con esta versión de la tabla.
+
+    Se leen de los metadatos; solo las entradas guardadas antes de que incluyeran las
+    métricas obligan a cargar el modelo completo.
+    """
+    models = []
+    for metadata in list_entries():
+        if metadata.get('table_name') != table_name or metadata.get('table_version') != table_version:
+            continue
+        result = metadata.get('result')
+        if result is None:
+            entry = load_entry(metadata['key'])
+            if entry is None:
+                continue
+            result = entry['result']
+        models.append({
+            'key': metadata['key'],
+            'model_name': metadata.get('model_name'),
+            'model_type': metadata.get('model_type'),
+            'target_column': metadata.get('target_column'),
+            'variant': result.get('variant'),
+            'score': result['score'],
+            'report': result.get('report', ''),
+            'metrics': result.get('metrics')
+        })
+    return models
+
+def _get_pool():
+    """Procesos de renderizado compartidos; se inician con spawn para no heredar los hilos del servidor"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=REPORT_RENDER_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+def build_chart_tasks(stats, models, chart_dir):
+    """Lista de gráficas a dibujar, con los datos ya agregados (no la tabla completa)"""
+    tasks = []
+
+    def add(kind, title, data, section):
+        tasks.append({
+            'kind': kind, 'title': title, 'data': data, 'section': section,
+            'path': os.path.join(chart_dir, f"{len(tasks):03d}_{kind}.png")
+        })
+
+    for col, histogram in stats['histograms'].items():
+        add('histogram', f"Distribución de {col}", dict(histogram, column=col), 'histogramas')
+    if stats['correlation'] is not None:
+        corr = stats['correlation']
+        add('correlation', "Matriz de Correlación", {
+            'matrix': corr.to_numpy(), 'x_labels': list(corr.columns), 'y_labels': list(corr.index)
+        }, 'correlacion')
+    for col, counts in stats['value_counts'].items():
+        add('bars', f"Distribución de {col}", {
+            'labels': list(counts.index), 'values': counts.to_numpy()
+        }, 'categoricas')
+    for i, model in enumerate(models):
+        metrics = model['metrics']
+        if not metrics or model['model_type'] != "Clasificación":
+            continue
+        add('confusion', f"Matriz de Confusión - {model['model_name']}", {
+            'matrix': metrics['confusion_matrix'],
+            'x_labels': metrics['classes'], 'y_labels': metrics['classes']
+        }, f"modelo_{i}")
+        if metrics.get('curves'):
+            add('roc', f"Curva ROC - {model['model_name']}", {'curves': metrics['curves']}, f"modelo_{i}")
+    return tasks
+
+def render_charts(tasks, job=None):
+    """Dibuja las gráficas en paralelo en el grupo de procesos"""
+    # Importación diferida: matplotlib solo se carga cuando se genera un reporte
+    from pages.report_charts import render_chart
+    
+    pool = _get_pool()
+    futures = {pool.submit(render_chart, task): task for task in tasks}
+    for future in as_completed(futures):
+        if job is not None and job.is_cancelled():
+            for pending in futures:
+                pending.cancel()
+            return False
+        future.result()
+    return True
+
+class ReportPDF(FPDF):
+    """PDF del reporte con la fuente DejaVu (admite acentos y caracteres no latinos)"""
+
+    def __init__(self, title):
+        super().__init__()
+        self.report_title = title
+        self.add_font('DejaVu', '', get_font_path(), uni=True)
+        self.set_auto_page_break(True, margin=15)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font('DejaVu', '', 8)
+        self.cell(0, 8, f"{self.report_title} · Página {self.page_no()}", align='C')
+
+    def heading(self, text, size=14):
+        self.set_font('DejaVu', '', size)
+        self.cell(0, 10, text, ln=True)
+        self.set_font('DejaVu', '', 10)
+
+    def table(self, header, rows, widths):
+        self.set_font('DejaVu', '', 8)
+        for col, width in zip(header, widths):
+            self.cell(width, 6, str(col), border=1)
+        self.ln()
+        for row in rows:
+            for value, width in zip(row, widths):
+                text = f"{value:.4g}" if isinstance(value, (float, np.floating)) else str(value)
+                self.cell(width, 6, text[:int(width / 1.6)], border=1)
+            self.ln()
+        self.set_font('DejaVu', '', 10)
+
+    def chart(self, path):
+        # Dos gráficas por página: nueva página si no cabe la siguiente
+        if self.get_y() > self.h / 2:
+            self.add_page()
+        self.image(path, w=self.w - self.l_margin - self.r_margin)
+        self.ln(2)
+
+def assemble_pdf(path, table_name, table_version, stats, models, tasks):
+    """Une las estadísticas, métricas y gráficas ya dibujadas en el PDF del reporte"""
+    by_section = {}
+    for task in tasks:
+        by_section.setdefault(task['section'], []).append(task['path'])
+
+    pdf = ReportPDF(f"Reporte de {table_name}")
+    pdf.add_page()
+    pdf.heading(f"Reporte de la tabla {table_name}", size=18)
+    pdf.multi_cell(0, 6, (
+        f"Generado: {time.strftime('%Y-%m-%d %H:%M')}\n"
+        f"Versión de la tabla: {table_version}\n"
+        f"Filas: {stats['n_rows']:,} · Columnas: {stats['n_columns']} · "
+        f"Memoria: {stats['memory_bytes'] / 1024 / 1024:.2f} MB\n"
+        f"Valores nulos: {int(stats['nulls'].sum()):,}"
+    ))
+    pdf.ln(4)
+
+    if stats['describe'] is not None:
+        pdf.heading("Estadísticas descriptivas")
+        describe = stats['describe']
+        pdf.table(
+            ['Variable'] + list(describe.columns),
+            [[index] + list(row) for index, row in zip(describe.index, describe.to_numpy())],
+            [40] + [18] * len(describe.columns)
+        )
+        pdf.ln(4)
+
+    for section, title in (
+        ('histogramas', "Distribución de variables numéricas"),
+        ('correlacion', "Correlaciones"),
+        ('categoricas', "Variables categóricas")
+    ):
+        if section not in by_section:
+            continue
+        pdf.add_page()
+        pdf.heading(title)
+        for chart_path in by_section[section]:
+            pdf.chart(chart_path)
+
+    if models:
+        pdf.add_page()
+        pdf.heading("Resultados de los modelos")
+        pdf.table(
+            ['Modelo', 'Tipo', 'Objetivo', 'Variante', 'Puntuación'],
+            [[m['model_name'], m['model_type'], m['target_column'], m['variant'] or '-', m['score']] for m in models],
+            [40, 28, 35, 60, 25]
+        )
+        for i, model in enumerate(models):
+            pdf.add_page()
+            pdf.heading(f"{model['model_name']} → {model['target_column']}")
+            pdf.set_font('Courier', '', 8)
+            # Fuente monoespaciada para conservar la alineación del reporte (solo latin-1)
+            pdf.multi_cell(0, 4, model['report'].encode('latin-1', 'replace').decode('latin-1'))
+            pdf.set_font('DejaVu', '', 10)
+            pdf.ln(2)
+            for chart_path in by_section.get(f"modelo_{i}", []):
+                pdf.chart(chart_path)
+
+    # Nombre temporal único: dos trabajos que generan el mismo reporte no se pisan el archivo
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        pdf.output(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def get_report_path(table_name, table_version, models):
+    """Ruta del reporte: cambia con la versión de la tabla y los modelos incluidos"""
+    digest = hashlib.sha256(
+        repr((table_name, table_version, sorted(m['key'] for m in models))).encode('utf-8')
+    ).hexdigest()[:16]
+    return os.path.join(REPORTS_DIR, f"reporte-{digest}.pdf")
+
+def generate_report(job, table_name, table_version, df=None):
+    """Genera el reporte PDF de una tabla (se ejecuta como trabajo en segundo plano)"""
+    def stage(name, status):
+        if job is not None:
+            job.set_task_status(name, status)
+
+    models = get_model_results(table_name, table_version)
+    path = get_report_path(table_name, table_version, models)
+    if table_version is not None and os.path.exists(path):
+        # Mismo contenido que un reporte ya generado
+        for name in STAGES:
+            stage(name, DONE)
+        return {'path': path, 'cached': True, 'n_charts': 0, 'stats_cached': True}
+
+    stage(STAGES[0], RUNNING)
+    stats, stats_cached = get_table_stats(table_name, table_version, df)
+    stage(STAGES[0], DONE)
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='reporte_') as chart_dir:
+        stage(STAGES[1], RUNNING)
+        tasks = build_chart_tasks(stats, models, chart_dir)
+        if not render_charts(tasks, job):
+            stage(STAGES[1], CANCELLED)
+            stage(STAGES[2], CANCELLED)
+            return None
+        stage(STAGES[1], DONE)
+
+        stage(STAGES[2], RUNNING)
+        assemble_pdf(path, table_name, table_version, stats, models, tasks)
+        stage(STAGES[2], DONE)
+    return {'path': path, 'cached': False, 'n_charts': len(tasks), 'stats_cached': stats_cached}
+
+def show_report_export(selected_table, df=None):
+    """Sección para generar y descargar el reporte de la tabla en segundo plano"""
+    st.header("📄 Reporte de la Tabla")
+    st.caption("Perfil de la tabla y resultados de los modelos registrados, en PDF.")
+    if st.button("Generar reporte PDF", key="generate_report"):
+        table_version = get_table_version(selected_table)
+        st.session_state['report_job_id'] = get_job_manager().submit(
+            f"Reporte: {selected_table}", get_session_id(), STAGES,
+            generate_report, selected_table, table_version, df
+        )
+
+    job_id = st.session_state.get('report_job_id')
+    if job_id is None:
+        return
+    job = watch_job(job_id, key_prefix="report")
+    if job is None:
+        del st.session_state['report_job_id']
+    elif job.status == DONE and job.result:
+        with open(job.result['path'], 'rb') as report_file:
+            st.download_button(
+                "📥 Descargar reporte", report_file,
+                file_name=f"reporte_{selected_table}.pdf", mime="application/pdf"
+            )
+        if job.result['cached']:
+            st.caption("Reporte reutilizado: la tabla y los modelos no han cambiado.")
+        else:
+            st.caption(
+                f"{job.result['n_charts']} gráficas dibujadas en {REPORT_RENDER_WORKERS} procesos · "
+                f"Estadísticas {'reutilizadas de la caché' if job.result['stats_cached'] else 'calculadas'}"
+            )
@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+
+# Módulo de cada página de la navegación: se importa la primera vez que se abre
+PAGE_MODULES = OrderedDict([
+    ("Cargar Datos", "pages.data_upload"),
+    ("Dashboard", "pages.dashboard"),
+    ("Modelos", "pages.models"),
+    ("Predicción por Lotes", "pages.batch_scoring"),
+    ("Visualizaciones", "pages.visualizations"),
+    ("Documentación", "pages.documentation")
+])
+# Dependencias pesadas que se miden por separado (en este orden) durante la precarga
+HEAVY_DEPENDENCIES = [
+    "numpy", "pandas", "plotly.express", "scipy.stats", "sklearn.ensemble",
+    "xgboost", "matplotlib", "fpdf", "psycopg2"
+]
+# Precargar en segundo plano todas las páginas tras la primera ejecución de la app
+PRELOAD_PAGES = os.getenv('PRELOAD_PAGES', '1') == '1'
+
+_import_times = OrderedDict()
+_import_lock = threading.Lock()
+_script_times = {}
+
+def timed_import(module_name, kind, origin):
+    """Importa un módulo y registra cuánto tardó la primera importación"""
+    module = sys.modules.get(module_name)
+    # Un módulo que otro hilo (otra sesión o la precarga) está importando todavía está a
+    # medias: import_module espera a que termine en lugar de retornarlo incompleto
+    if module is not None and not getattr(getattr(module, '__spec__', None), '_initializing', False):
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    with _import_lock:
+        # Con la precarga y la navegación en paralelo solo cuenta la primera medición
+        _import_times.setdefault(module_name, {
+            'Módulo': module_name,
+            'Tipo': kind,
+            'Origen': origin,
+            'Tiempo (s)': elapsed
+        })
+    return module
+
+def load_page(label):
+    """Retorna el módulo de una página, importándolo (con sus dependencias) si hace falta"""
+    return timed_import(PAGE_MODULES[label], "Página", "Navegación")
+
+def preload(origin="Precarga"):
+    """Importa las dependencias pesadas y luego todas las páginas.
+
+    Cada dependencia se mide sin las que le siguen en la lista, así que el tiempo de una
+    página es solo lo que añade sobre las dependencias ya cargadas.
+    """
+    for module_name in HEAVY_DEPENDENCIES:
+        try:
+            timed_import(module_name, "Dependencia", origin)
+        except ImportError:
+            continue
+    for module_name in PAGE_MODULES.values():
+        timed_import(module_name, "Página", origin)
+
+@st.cache_resource
+def start_warm_up():
+    """Inicia la precarga en un hilo en segundo plano, una sola vez por proceso del servidor"""
+    thread = threading.Thread(target=preload, name="precarga", daemon=True)
+    thread.start()
+    return thread
+
+def record_script_time(page, elapsed):
+    """Guarda la duración de la última ejecución del script para cada página"""
+    _script_times[page] = elapsed
+
+def get_import_report():
+    """Tiempos de importación registrados, del más lento al más rápido"""
+    with _import_lock:
+        rows = list(_import_times.values())
+    if not rows:
+        return pd.DataFrame(columns=['Módulo', 'Tipo', 'Origen', 'Tiempo (s)'])
+    return pd.DataFrame(rows).sort_values('Tiempo (s)', ascending=False).reset_index(drop=True)
+
+def show_startup_report():
+    """Muestra a dónde se va el tiempo de arranque de la aplicación"""
+    with st.expander("⏱️ Tiempos de arranque"):
+        report = get_import_report()
+        loaded = [label for label, module_name in PAGE_MODULES.items() if module_name in sys.modules]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Páginas cargadas", f"{len(loaded)} de {len(PAGE_MODULES)}")
+        with col2:
+            st.metric("Tiempo total de importación", f"{report['Tiempo (s)'].sum():.2f} s")
+        with col3:
+            warm_up = start_warm_up() if PRELOAD_PAGES else None
+            st.metric("Precarga", "En curso" if warm_up is not None and warm_up.is_alive() else (
+                "Completada" if warm_up is not None else "Desactivada"
+            ))
+        if _script_times:
+            st.caption(" · ".join(f"{page}: {elapsed:.2f} s" for page, elapsed in _script_times.items()))
+        st.dataframe(report, use_container_width=True)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mide en un proceso nuevo el tiempo de importación de las dependencias y las páginas"
+    )
+    parser.parse_args()
+    start = time.perf_counter()
+    preload(origin="CLI")
+    report = get_import_report()
+    print(report.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+    print(f"\nTotal: {time.perf_counter() - start:.3f} s")
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,55 @@ import pandas as pd
 import psycopg2
 from dotenv import load_dotenv
 import os
+import io
+from pages.distributed import use_dask, load_table
+from pages.instrumentation import instrument_db
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Tabla con la versión explícita de cada tabla de datos. La mantienen triggers por
+# sentencia dentro de la misma transacción que modifica los datos, así que (a diferencia
+# de las estadísticas de pg_stat_user_tables) no se retrasa ni se reinicia
+VERSION_TABLE = '_app_table_versions'
+VERSION_FUNCTION = '_app_bump_table_version'
+VERSION_TRIGGERS = {
+    '_app_version_ins': 'AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows',
+    '_app_version_upd': 'AFTER UPDATE ON {table} REFERENCING NEW TABLE AS new_rows',
+    '_app_version_del': 'AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows',
+    '_app_version_trunc': 'AFTER TRUNCATE ON {table}'
+}
+VERSION_SETUP_SQL = f"""
+    CREATE TABLE IF NOT EXISTS "{VERSION_TABLE}" (
+        relid OID PRIMARY KEY,
+        token TEXT NOT NULL,
+        inserted BIGINT NOT NULL DEFAULT 0,
+        updated BIGINT NOT NULL DEFAULT 0,
+        deleted BIGINT NOT NULL DEFAULT 0
+    );
+    GRANT SELECT ON "{VERSION_TABLE}" TO PUBLIC;
+    CREATE OR REPLACE FUNCTION "{VERSION_FUNCTION}"() RETURNS trigger
+    LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+    DECLARE
+        n BIGINT;
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            n := 1;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT count(*) INTO n FROM old_rows;
+        ELSE
+            SELECT count(*) INTO n FROM new_rows;
+        END IF;
+        UPDATE "{VERSION_TABLE}" SET
+            inserted = inserted + CASE WHEN TG_OP = 'INSERT' THEN n ELSE 0 END,
+            updated = updated + CASE WHEN TG_OP = 'UPDATE' THEN n ELSE 0 END,
+            deleted = deleted + CASE WHEN TG_OP IN ('DELETE', 'TRUNCATE') THEN n ELSE 0 END
+        WHERE relid = TG_RELID;
+        RETURN NULL;
+    END $$;
+"""
+
+@instrument_db
 def get_db_connection():
     """Establece conexión con la base de datos PostgreSQL"""
     try:
@@ -27,6 +72,12 @@ def clean_column_name(col_name):
 def get_postgres_type(dtype):
     """Convierte el tipo de dato de pandas a PostgreSQL"""
     if pd.api.types.is_integer_dtype(dtype):
+        # INTEGER solo admite enteros de 32 bits con signo: int64 y uint32 necesitan BIGINT
+        # y uint64 no cabe ni en BIGINT
+        if dtype.kind == 'u' and dtype.itemsize >= 8:
+            return 'NUMERIC(20)'
+        if dtype.itemsize > 4 or (dtype.kind == 'u' and dtype.itemsize == 4):
+            return 'BIGINT'
         return 'INTEGER'
     elif pd.api.types.is_float_dtype(dtype):
         return 'DOUBLE PRECISION'
@@ -35,8 +86,13 @@ def get_postgres_type(dtype):
     else:
         return 'TEXT'
 
-def upload_to_db(df, table_name):
-    """Carga un DataFrame a la base de datos PostgreSQL"""
+@instrument_db(writes=True)
+def upload_to_db(df, table_name, append=False):
+    """Carga un DataFrame a la base de datos PostgreSQL.
+    
+    Con append=True las filas se añaden a la tabla existente sin recrearla, de modo que
+    los modelos entrenados con ella pueden actualizarse solo con las filas nuevas.
+    """
     conn = get_db_connection()
     if conn is not None:
         try:
@@ -51,12 +107,16 @@ def upload_to_db(df, table_name):
                 col_type = get_postgres_type(df[col].dtype)
                 columns.append(f'"{col}" {col_type}')
             
-            # Eliminar la tabla si existe
-            cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
-            
-            # Crear la tabla nueva
-            create_table_query = f'CREATE TABLE "{table_name}" ({", ".join(columns)})'
-            cursor.execute(create_table_query)
+            if append:
+                # Añadir a la tabla existente (se crea si todavía no existe)
+                cursor.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" ({", ".join(columns)})')
+            else:
+                # Eliminar la tabla si existe
+                cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+                
+                # Crear la tabla nueva
+                create_table_query = f'CREATE TABLE "{table_name}" ({", ".join(columns)})'
+                cursor.execute(create_table_query)
             
             # Preparar los datos para inserción en lotes
             batch_size = 1000
@@ -80,7 +140,8 @@ def upload_to_db(df, table_name):
                     values_list.append(f"({', '.join(values)})")
                 
                 if values_list:
-                    insert_query = f'INSERT INTO "{table_name}" VALUES {", ".join(values_list)}'
+                    column_list = ', '.join(f'"{col}"' for col in df.columns)
+                    insert_query = f'INSERT INTO "{table_name}" ({column_list}) VALUES {", ".join(values_list)}'
                     cursor.execute(insert_query)
                     conn.commit()
             
@@ -91,8 +152,16 @@ def upload_to_db(df, table_name):
         finally:
             conn.close()
 
+@instrument_db
 def load_from_db(table_name):
     """Carga datos desde la base de datos PostgreSQL"""
+    if use_dask():
+        # Lectura por particiones en paralelo en el clúster Dask
+        try:
+            return load_table(table_name)
+        except Exception as e:
+            st.error(f"Error al cargar datos: {str(e)}")
+            return None
     conn = get_db_connection()
     if conn is not None:
         try:
@@ -105,6 +174,64 @@ def load_from_db(table_name):
             conn.close()
     return None
 
+@instrument_db
+def load_columns(table_name, columns):
+    """Carga solo algunas columnas de una tabla, con las filas en su orden físico (ctid).
+
+    Con el mismo orden en todas las lecturas, columnas leídas por separado se pueden
+    unir fila a fila mientras la tabla no cambie.
+    """
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            column_list = ', '.join(f'"{col}"' for col in columns)
+            return pd.read_sql(f'SELECT {column_list} FROM "{table_name}" ORDER BY ctid', conn)
+        except Exception as e:
+            st.error(f"Error al cargar datos: {str(e)}")
+            return None
+        finally:
+            conn.close()
+    return None
+
+@instrument_db
+def load_rows_since(table_name, offset, columns=None):
+    """Carga las filas añadidas a una tabla después de las primeras `offset` filas.
+    
+    Las filas se ordenan por su posición física (ctid): en una tabla a la que solo se
+    le han añadido filas, las nuevas quedan siempre después de las existentes.
+    """
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            column_list = ', '.join(f'"{col}"' for col in columns) if columns else '*'
+            return pd.read_sql(
+                f'SELECT {column_list} FROM "{table_name}" ORDER BY ctid OFFSET %s',
+                conn, params=(int(offset),)
+            )
+        except Exception as e:
+            st.error(f"Error al cargar las filas nuevas: {str(e)}")
+            return None
+        finally:
+            conn.close()
+    return None
+
+@instrument_db
+def count_table_rows(table_name):
+    """Cuenta las filas de una tabla"""
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"')
+            return cursor.fetchone()[0]
+        except Exception as e:
+            st.error(f"Error al contar las filas: {str(e)}")
+            return None
+        finally:
+            conn.close()
+    return None
+
+@instrument_db
 def get_available_tables():
     """Obtiene la lista de tablas disponibles en la base de datos"""
     conn = get_db_connection()
@@ -114,9 +241,9 @@ def get_available_tables():
             cursor.execute("""
                 SELECT table_name 
                 FROM information_schema.tables 
-                WHERE table_schema = 'public'
+                WHERE table_schema = 'public' AND table_name <> %s
                 ORDER BY table_name
-            """)
+            """, (VERSION_TABLE,))
             tables = [table[0] for table in cursor.fetchall()]
             return tables
         except Exception as e:
@@ -126,6 +253,7 @@ def get_available_tables():
             conn.close()
     return []
 
+@instrument_db
 def delete_table(table_name):
     """Elimina una tabla de la base de datos"""
     conn = get_db_connection()
@@ -141,4 +269,154 @@ def delete_table(table_name):
             return False
         finally:
             conn.close()
-    return False 
\ No newline at end of file
+    return False
+
+def _read_table_version(cursor, table_name):
+    """OID de la tabla y (token, inserciones, actualizaciones, eliminaciones) si tiene los triggers"""
+    cursor.execute("SELECT to_regclass(%s)::oid, to_regclass(%s) IS NOT NULL", (f'"{table_name}"', f'"{VERSION_TABLE}"'))
+    oid, tracked = cursor.fetchone()
+    if oid is None or not tracked:
+        return oid, None
+    cursor.execute(f"""
+        SELECT v.token, v.inserted, v.updated, v.deleted
+        FROM "{VERSION_TABLE}" v
+        WHERE v.relid = %s
+          AND (SELECT count(*) FROM pg_trigger t WHERE t.tgrelid = v.relid AND t.tgname = ANY(%s)) = %s
+    """, (oid, list(VERSION_TRIGGERS), len(VERSION_TRIGGERS)))
+    return oid, cursor.fetchone()
+
+def _install_version_tracking(cursor, table_name):
+    """Crea los triggers que mantienen la versión de la tabla (requiere ser su propietario).
+
+    Cada instalación genera un token nuevo: si PostgreSQL reutiliza el OID de una tabla
+    eliminada, la versión de la tabla nueva no coincide con la de la anterior.
+    """
+    cursor.execute(VERSION_SETUP_SQL)
+    cursor.execute(f'LOCK TABLE "{table_name}" IN SHARE ROW EXCLUSIVE MODE')
+    oid, row = _read_table_version(cursor, table_name)
+    if row is not None:
+        # Otra sesión los instaló mientras se esperaba el bloqueo
+        return
+    cursor.execute(f"""
+        INSERT INTO "{VERSION_TABLE}" (relid, token)
+        VALUES (%s, md5(random()::text || clock_timestamp()::text))
+        ON CONFLICT (relid) DO UPDATE SET token = EXCLUDED.token, inserted = 0, updated = 0, deleted = 0
+    """, (oid,))
+    quoted = f'"{table_name}"'
+    for name, event in VERSION_TRIGGERS.items():
+        cursor.execute(f'DROP TRIGGER IF EXISTS "{name}" ON "{table_name}"')
+        cursor.execute(
+            f'CREATE TRIGGER "{name}" {event.format(table=quoted)} '
+            f'FOR EACH STATEMENT EXECUTE PROCEDURE "{VERSION_FUNCTION}"()'
+        )
+
+def _table_checksum(cursor, table_name):
+    """Suma de comprobación del contenido, para tablas en las que no se pueden crear triggers"""
+    cursor.execute(f"""
+        SELECT md5(count(*)::text || COALESCE(string_agg(h, '' ORDER BY h), ''))
+        FROM (SELECT md5(t::text) AS h FROM "{table_name}" t) s
+    """)
+    return cursor.fetchone()[0]
+
+@instrument_db
+def get_table_version(table_name):
+    """Obtiene un identificador de versión de la tabla.
+
+    Tiene la forma OID-token-inserciones-actualizaciones-eliminaciones, con contadores de
+    filas que mantienen triggers transaccionales (se instalan la primera vez que se pide la
+    versión). Si no se pueden instalar, la versión es OID-suma de comprobación del contenido.
+    """
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            cursor = conn.cursor()
+            oid, row = _read_table_version(cursor, table_name)
+            if oid is None:
+                return None
+            if row is None:
+                try:
+                    _install_version_tracking(cursor, table_name)
+                    conn.commit()
+                    oid, row = _read_table_version(cursor, table_name)
+                except psycopg2.Error:
+                    # Sin permisos para crear triggers en la tabla
+                    conn.rollback()
+            if row is None:
+                return f"{oid}-{_table_checksum(cursor, table_name)}"
+            return '-'.join(str(value) for value in (oid,) + tuple(row))
+        except Exception as e:
+            st.error(f"Error al obtener la versión de la tabla: {str(e)}")
+            return None
+        finally:
+            conn.close()
+    return None
+
+@instrument_db
+def iter_table_chunks(table_name, columns=None, chunksize=50000):
+    """Lee una tabla por bloques con un cursor del lado del servidor, sin cargarla completa en memoria"""
+    conn = get_db_connection()
+    if conn is None:
+        return
+    try:
+        column_list = ', '.join(f'"{col}"' for col in columns) if columns else '*'
+        # Un cursor con nombre mantiene el resultado en el servidor y solo transfiere cada bloque
+        cursor = conn.cursor(name="stream_cursor")
+        cursor.itersize = chunksize
+        cursor.execute(f'SELECT {column_list} FROM "{table_name}"')
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=[desc[0] for desc in cursor.description])
+        cursor.close()
+    finally:
+        conn.close()
+
+@instrument_db(writes=True)
+def copy_dataframe_to_table(conn, df, table_name):
+    """Inserta un DataFrame en una tabla existente mediante COPY en formato CSV"""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    column_list = ', '.join(f'"{col}"' for col in df.columns)
+    cursor = conn.cursor()
+    cursor.copy_expert(f'COPY "{table_name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+@instrument_db
+def get_table_columns(table_name):
+    """Obtiene los nombres y tipos de las columnas de una tabla sin leer sus datos"""
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT column_name, data_type
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = %s
+                ORDER BY ordinal_position
+            """, (table_name,))
+            return cursor.fetchall()
+        except Exception as e:
+            st.error(f"Error al obtener las columnas: {str(e)}")
+            return []
+        finally:
+            conn.close()
+    return []
+
+@instrument_db
+def get_distinct_values(table_name, column):
+    """Obtiene los valores distintos (no nulos) de una columna"""
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f'SELECT DISTINCT "{column}" FROM "{table_name}" WHERE "{column}" IS NOT NULL ORDER BY 1'
+            )
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            st.error(f"Error al obtener los valores de la columna: {str(e)}")
+            return []
+        finally:
+            conn.close()
+    return []
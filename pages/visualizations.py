@@ -2,27 +2,21 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from pages.utils import load_from_db, get_available_tables
+from pages.datasets import select_table, get_dataframe
 
 def show():
     st.title("📈 Visualizaciones Avanzadas")
     
     try:
-        # Obtener lista de tablas disponibles
-        tables = get_available_tables()
+        # Seleccionar tabla (la tabla activa se comparte entre todas las páginas)
+        selected_table = select_table("Selecciona la tabla a visualizar")
         
-        if not tables:
+        if selected_table is None:
             st.warning("Por favor, carga los datos en la sección 'Cargar Datos'")
             return
-            
-        # Seleccionar tabla
-        selected_table = st.selectbox(
-            "Selecciona la tabla a visualizar",
-            tables
-        )
         
         # Cargar datos
-        df = load_from_db(selected_table)
+        df = get_dataframe(selected_table)
         
         if df is None or df.empty:
             st.error("No se pudieron cargar los datos. Por favor, verifica la conexión a la base de datos.")